@@ -0,0 +1,92 @@
+#
+# TrekList - catalog build benchmark
+#
+# Builds a catalog against a local mock OMDb server with injected latency
+# and failures, once per worker count, and checks that every record made
+# it into the database. Then re-syncs the last catalog, unchanged and
+# after adding a season, to time incremental updates.
+#
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+bench_dir = os.path.dirname(os.path.realpath(__file__))
+repo_dir  = os.path.dirname(bench_dir)
+sys.path.insert(0, bench_dir)
+sys.path.insert(0, repo_dir)
+
+from   builder   import omdbClient, catalogBuilder
+from   mock_omdb import mockOmdb
+
+def runBuild(mock, db_file, series, movies, workers, posters):
+    """
+    Sync one catalog
+
+    Returns
+    -------
+    res : dict of timings, request counts and row counts
+    """
+    conn    = sqlite3.connect(db_file)
+    client  = omdbClient("mock", mock.url, rate=1000., burst=workers,
+                         workers=workers, backoff=0.05)
+    builder = catalogBuilder(conn, client, workers=workers, log=lambda msg: None)
+    t0 = time.perf_counter()
+    builder.build(series, movies, extras=dict(), posters=posters)
+    res = dict(workers=workers, build_s=time.perf_counter() - t0,
+               requests=client.n_requests, retries=client.n_retries,
+               failed=len(builder.failed))
+    res["episodes"] = conn.execute("SELECT COUNT(*) FROM episodes").fetchone()[0]
+    res["movies"]   = conn.execute("SELECT COUNT(*) FROM mov").fetchone()[0]
+    if posters:
+        res["missing_posters"] = sum(conn.execute(f"SELECT COUNT(*) FROM {table} " +
+            "WHERE imdb_id NOT IN (SELECT imdb_id FROM posters)").fetchone()[0]
+            for table in ["series", "episodes", "mov"])
+    conn.close()
+    return res
+
+def main():
+    parser = argparse.ArgumentParser(description="TrekList catalog build benchmark")
+    parser.add_argument("--series",    type=int,   default=4)
+    parser.add_argument("--seasons",   type=int,   default=3)
+    parser.add_argument("--episodes",  type=int,   default=10)
+    parser.add_argument("--movies",    type=int,   default=5)
+    parser.add_argument("--latency",   type=float, default=0.02,
+                        help="seconds per mock request")
+    parser.add_argument("--fail-rate", type=float, default=0.05)
+    parser.add_argument("--workers",   type=int,   nargs="+", default=[1, 8])
+    parser.add_argument("--no-posters", action="store_true")
+    args = parser.parse_args()
+
+    series = {f"s{i:02d}": f"tt70{i:05d}" for i in range(args.series)}
+    movies = {f"M{i:02d}": f"tt71{i:05d}" for i in range(args.movies)}
+    mock   = mockOmdb(series, movies, args.seasons, args.episodes,
+                      args.latency, args.fail_rate).start()
+    expected = dict(episodes=args.series * args.seasons * args.episodes,
+                    movies=args.movies)
+    report = dict(expected=expected, runs=[])
+    tmp_dir = tempfile.TemporaryDirectory()
+    for workers in args.workers:
+        db_file = os.path.join(tmp_dir.name, f"treklist{workers}.db")
+        res = runBuild(mock, db_file, series, movies, workers, not args.no_posters)
+        res["complete"] = res["episodes"] == expected["episodes"] and \
+                          res["movies"] == expected["movies"] and \
+                          not res.get("missing_posters")
+        report["runs"].append(res)
+
+    # incremental sync: nothing new, then one new season
+    report["resync"] = runBuild(mock, db_file, series, movies, workers,
+                                not args.no_posters)
+    mock.addSeason(list(series)[-1], args.episodes)
+    res = runBuild(mock, db_file, series, movies, workers, not args.no_posters)
+    res["complete"] = res["episodes"] == expected["episodes"] + args.episodes
+    report["new_season"] = res
+    mock.stop()
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
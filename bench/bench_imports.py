@@ -0,0 +1,136 @@
+#
+# TrekList - import time benchmark
+#
+# Profiles the imports made on the way to the first window, with
+# `python -X importtime` for the script and, for a PyInstaller bundle
+# built from treklist.spec with TREKLIST_PROFILE_BUILD=1, through
+# bench/importtime_hook.py. Reports the median total and the slowest
+# direct imports of treklist.py over a few runs, and whether any of the
+# modules it should not load at startup were loaded.
+#
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+bench_dir = os.path.dirname(os.path.realpath(__file__))
+repo_dir  = os.path.dirname(bench_dir)
+
+# modules that have no business in the boot path
+heavy_mods = ["pandas", "numpy", "PIL", "requests", "omdb"]
+
+def parseImportTime(lines):
+    """
+    Parse `-X importtime` output
+
+    Returns
+    -------
+    entries : list of (name, depth, self_us, cumulative_us), in output order
+    """
+    entries = []
+    for line in lines:
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+        name  = name[1:].rstrip("\n")
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cum_us)))
+    return entries
+
+def importTree(entries, root=None):
+    """
+    Total and direct imports of `root`, or of everything at the top level
+
+    Children are printed before their parent, so the direct imports of a
+    module are the entries one level down since the previous entry at its
+    own level. A bundle runs treklist.py as its main script rather than
+    importing it, so there its imports are the top level.
+    """
+    if root is None:
+        top = [(name, cum) for name, depth, _, cum in entries if depth == 0]
+        return sum(cum for _, cum in top), top
+    children = []
+    for name, depth, _, cum in entries:
+        if depth == 0:
+            if name == root:
+                return cum, children
+            children = []
+        elif depth == 1:
+            children.append((name, cum))
+    raise ValueError(f"{root} was not imported")
+
+def runScript():
+    """
+    Import treklist once under `-X importtime`
+    """
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                          "import treklist"], cwd=repo_dir, check=True,
+                         capture_output=True, text=True).stderr
+    entries = parseImportTime(out.splitlines())
+    return importTree(entries, "treklist"), entries
+
+def runBundle(exe, wait):
+    """
+    Start a bundle once, with the import time hook writing to a temp file
+
+    The app does not exit on its own, so it is stopped after `wait`
+    seconds, by which time it has long finished its startup imports.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        out_file = os.path.join(tmp_dir, "importtime.txt")
+        env  = dict(os.environ, TREKLIST_IMPORTTIME=out_file,
+                    XDG_DATA_HOME=os.path.join(tmp_dir, "data"))
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+        proc = subprocess.Popen([exe], env=env, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL)
+        time.sleep(wait)
+        proc.terminate()
+        proc.wait()
+        if not os.path.exists(out_file):
+            raise RuntimeError(f"{exe} wrote no import times; was it built " +
+                               "with TREKLIST_PROFILE_BUILD=1?")
+        with open(out_file) as f:
+            entries = parseImportTime(f.readlines())
+    return importTree(entries), entries
+
+def summarize(runs, top):
+    """
+    Median total and per-module cumulative times over several runs
+    """
+    mods = dict()
+    for (_, children), _ in runs:
+        for name, cum in children:
+            mods.setdefault(name, []).append(cum)
+    slowest = sorted(((statistics.median(cums), name)
+                      for name, cums in mods.items()), reverse=True)[:top]
+    loaded  = {name for _, entries in runs for name, _, _, _ in entries}
+    return dict(total_ms=statistics.median(total for (total, _), _ in runs) / 1000,
+                slowest=[dict(module=name, cumulative_ms=us / 1000)
+                         for us, name in slowest],
+                heavy_loaded=sorted(mod for mod in heavy_mods if mod in loaded))
+
+def main():
+    parser = argparse.ArgumentParser(description="TrekList import time benchmark")
+    parser.add_argument("--runs",   type=int,   default=5)
+    parser.add_argument("--top",    type=int,   default=10,
+                        help="number of slowest imports to list")
+    parser.add_argument("--bundle", help="also profile this PyInstaller " +
+                        "executable, e.g. dist/TrekList")
+    parser.add_argument("--wait",   type=float, default=10.,
+                        help="seconds to let the bundle start")
+    args = parser.parse_args()
+
+    report = dict(script=summarize([runScript() for _ in range(args.runs)],
+                                   args.top))
+    if args.bundle:
+        report["bundle"] = summarize([runBundle(args.bundle, args.wait)
+                                      for _ in range(args.runs)], args.top)
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
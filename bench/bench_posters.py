@@ -0,0 +1,109 @@
+#
+# TrekList - poster time-to-interactive benchmark
+#
+# Starts trekListApp on a synthetic catalog with large episode stills
+# and reports when the event loop first becomes responsive, and when all
+# posters of the visible rows have been decoded in the background. Then
+# compares reading every poster's raw data from the posters table and
+# from a poster pack.
+#
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+from   harness import makeDbs, runChild, startApp
+
+def runInteractive(db_dir):
+    """
+    Start the app once and print one JSON result line
+    """
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore    import QTimer
+    app = QApplication([])
+    res = dict()
+    t0  = time.perf_counter()
+    _, ex = startApp(db_dir)
+    cache = ex.poster_cache
+
+    def interactive():
+        res["interactive_s"] = time.perf_counter() - t0
+        res["pending_at_interactive"] = len(cache.pending)
+        poll()
+
+    def poll():
+        if cache.seq == 0 or cache.pending:
+            QTimer.singleShot(5, poll)
+            return
+        res["posters_done_s"] = time.perf_counter() - t0
+        app.quit()
+
+    QTimer.singleShot(0, interactive)
+    app.exec()
+    res["cache"] = cache.stats()
+    print(json.dumps(res))
+
+def readAll(db_file, pack_file, ids):
+    """
+    Time reading every poster from the posters table and from a pack
+    """
+    from posterpack import posterPack
+    res  = dict()
+    conn = sqlite3.connect(db_file)
+    t0   = time.perf_counter()
+    for imdb_id in ids:
+        conn.execute("SELECT poster FROM posters WHERE imdb_id = ?",
+                     (imdb_id,)).fetchone()
+    res["table_s"] = time.perf_counter() - t0
+    res["table_bytes"] = conn.execute("SELECT TOTAL(LENGTH(poster)) " +
+                                      "FROM posters").fetchone()[0]
+    conn.close()
+    pack = posterPack(pack_file)
+    t0   = time.perf_counter()
+    for imdb_id in ids:
+        img_data = pack.get(imdb_id)
+        if img_data is not None:
+            img_data.release()
+    res["pack_s"] = time.perf_counter() - t0
+    res["pack_bytes"] = os.path.getsize(pack_file)
+    pack.close()
+    return res
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="TrekList poster time-to-interactive benchmark")
+    parser.add_argument("--episodes", type=int, default=3000)
+    parser.add_argument("--poster",   type=int, nargs=2, default=[1920, 1080])
+    parser.add_argument("--child",    help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        runInteractive(args.child)
+        return
+
+    # build synthetic databases
+    tmp_dir = tempfile.TemporaryDirectory()
+    ids = makeDbs(tmp_dir.name, n_episodes=args.episodes, poster_size=args.poster,
+                  n_posters=16, compress=True)
+
+    # cold thumbnail cache, then warm
+    report = dict(episodes=args.episodes, poster=args.poster)
+    for run in ("cold", "warm"):
+        report[run] = runChild(__file__, ["--child", tmp_dir.name],
+                               os.path.join(tmp_dir.name, "data"))
+
+    # raw reads, table vs pack
+    from posterpack import packCatalog
+    db_file   = os.path.join(tmp_dir.name, "treklist.db")
+    pack_file = os.path.join(tmp_dir.name, "posters.pack")
+    conn = sqlite3.connect(db_file)
+    packCatalog(conn, pack_file)
+    conn.close()
+    report["raw_read"] = readAll(db_file, pack_file, ids)
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
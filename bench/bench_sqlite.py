@@ -0,0 +1,137 @@
+#
+# TrekList - SQLite connection profile benchmark
+#
+# Times catalog reads (a table page joined with the user log, as the
+# table models query them, and poster lookups) and user log writes (one
+# edit per transaction, as a lone click is flushed) with default
+# connections and with the profiles in dbconn.py. Page reads are also
+# timed while another connection keeps committing to the log, as the
+# write-behind writer does.
+#
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+bench_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, bench_dir)
+sys.path.insert(0, os.path.dirname(bench_dir))
+
+import synth
+from   dbconn  import openCatalog, openLog
+from   userlog import prepareLog, upsertLog
+
+# catalog open arguments, user log open arguments
+profiles = {"default": (dict(readonly=False, pragmas={}), dict(pragmas={})),
+            "tuned":   (dict(),                           dict()),
+           }
+
+page_sql = "SELECT c.title, c.released, c.imdb_rating, c.imdb_id, l.watched, " + \
+           "l.last_watched, c.season, c.episode, c.rowid FROM episodes c " + \
+           "LEFT JOIN usr.log l USING (imdb_id) WHERE c.series_abb = ? AND " + \
+           "(c.season, c.episode, c.rowid) > (?, ?, ?) " + \
+           "ORDER BY c.season, c.episode, c.rowid LIMIT 100"
+
+def timed(func, n):
+    """
+    Median and 95th percentile latency of `n` calls, in ms
+    """
+    times = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    return dict(p50_ms=round(statistics.median(times), 4),
+                p95_ms=round(times[int(0.95 * (n - 1))], 4))
+
+def runProfile(name, db_file, log_file, ids, abbs, n):
+    """
+    Time reads and writes with one connection profile
+    """
+    cat_args, log_args = profiles[name]
+    rng  = random.Random(0)
+    cat  = openCatalog(db_file, timeout=1., **cat_args)
+    cat.execute("ATTACH DATABASE ? AS usr", (log_file,))
+    log  = openLog(log_file, **log_args)
+    prepareLog(log)
+    seasons = {abb: cat.execute("SELECT MAX(season) FROM episodes WHERE " +
+                                "series_abb = ?", (abb,)).fetchone()[0]
+               for abb in abbs}
+
+    locked = [0]
+    def page():
+        abb = rng.choice(abbs)
+        key = (rng.randint(1, seasons[abb]), rng.randint(1, 25), 0)
+        try:
+            cat.execute(page_sql, (abb,) + key).fetchall()
+        except sqlite3.OperationalError: # locked by a writer for over 1 s
+            locked[0] += 1
+
+    def poster():
+        cat.execute("SELECT poster FROM posters WHERE imdb_id = ?",
+                    (rng.choice(ids),)).fetchone()
+
+    def write():
+        upsertLog(log, {rng.choice(ids): {"watched": rng.randint(0, 1)}})
+
+    timed(page, n // 10) # warm up
+    res = dict(page=timed(page, n), poster=timed(poster, n),
+               write=timed(write, n))
+
+    # page reads while another connection commits to the log
+    stop   = threading.Event()
+    writes = [0]
+    def writer():
+        conn = openLog(log_file, **log_args)
+        wrng = random.Random(1)
+        while not stop.is_set():
+            upsertLog(conn, {wrng.choice(ids): {"watched": wrng.randint(0, 1)}})
+            writes[0] += 1
+        conn.close()
+    thread = threading.Thread(target=writer)
+    thread.start()
+    t0 = time.perf_counter()
+    res["page_while_writing"] = timed(page, n)
+    stop.set()
+    thread.join()
+    res["concurrent_writes_per_s"] = round(writes[0] / (time.perf_counter() - t0))
+    res["pages_locked_out"] = locked[0]
+    cat.close()
+    log.close()
+    return res
+
+def main():
+    parser = argparse.ArgumentParser(description="TrekList SQLite profile benchmark")
+    parser.add_argument("--episodes", type=int, default=30000)
+    parser.add_argument("--n",        type=int, default=500,
+                        help="operations timed per measurement")
+    args = parser.parse_args()
+
+    tmp_dir  = tempfile.TemporaryDirectory()
+    db_file  = os.path.join(tmp_dir.name, "treklist.db")
+    ids      = synth.makeCatalog(db_file, n_episodes=args.episodes)
+    tmpl_log = os.path.join(tmp_dir.name, "template.db")
+    synth.makeUserLog(tmpl_log, ids)
+    conn = sqlite3.connect(db_file)
+    abbs = [row[0] for row in conn.execute("SELECT abb FROM series")]
+    conn.close()
+
+    report = dict(episodes=args.episodes)
+    for name in profiles:
+        # journal_mode sticks to the file, so each profile gets a fresh log
+        log_file = os.path.join(tmp_dir.name, f"user_{name}.db")
+        shutil.copyfile(tmpl_log, log_file)
+        report[name] = runProfile(name, db_file, log_file, ids, abbs, args.n)
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#
+# TrekList - startup benchmark
+#
+# Measures time-to-first-window, peak RSS and live widget count of
+# trekListApp against a synthetic treklist.db. With --scroll, every tab
+# is then built and every row of every table read, as if scrolled through
+# to the end. Each run is a fresh subprocess so that peak RSS is not
+# polluted by earlier runs.
+#
+
+import argparse
+import json
+import os
+import resource
+import tempfile
+import time
+
+from   harness import makeDbs, medians, runChild, useDbs
+
+def scrollAll(ex):
+    """
+    Build every tab and read every row of every table
+    """
+    for i in range(len(ex.tab_widget.tab_list)):
+        ex.tab_widget.buildTab(i)
+    from PyQt6.QtCore import QModelIndex
+    for model in ex.tbl_models.values():
+        while model.canFetchMore(QModelIndex()):
+            model.fetchMore(QModelIndex())
+        for r in range(model.rowCount()):
+            model.data(model.index(r, 0))
+
+def runStartup(db_dir, scroll=False):
+    """
+    Start the app once and print one JSON result line
+    """
+    t0 = time.perf_counter()
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore    import QTimer
+    treklist = useDbs(db_dir)
+    t_import = time.perf_counter()
+
+    app = QApplication([])
+    res = dict()
+
+    def firstWindow():
+        res["first_window_s"] = time.perf_counter() - t0
+        if scroll:
+            t_scroll = time.perf_counter()
+            scrollAll(ex)
+            res["scroll_s"] = time.perf_counter() - t_scroll
+        app.quit()
+
+    ex = treklist.trekListApp()
+    res["construct_s"] = time.perf_counter() - t_import
+    QTimer.singleShot(0, firstWindow)
+    app.exec()
+    res["import_s"]     = t_import - t0
+    res["widgets"]      = len(app.allWidgets())
+    res["peak_rss_mb"]  = resource.getrusage(
+        resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps(res))
+
+def main():
+    parser = argparse.ArgumentParser(description="TrekList startup benchmark")
+    parser.add_argument("--episodes", type=int, default=12000)
+    parser.add_argument("--poster",   type=int, nargs=2, default=[320, 240])
+    parser.add_argument("--runs",     type=int, default=3)
+    parser.add_argument("--db-dir",   help="reuse an existing synthetic db")
+    parser.add_argument("--scroll",   action="store_true",
+                        help="also read every row of every tab")
+    parser.add_argument("--child",    help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        runStartup(args.child, args.scroll)
+        return
+
+    # build synthetic databases
+    tmp_dir = tempfile.TemporaryDirectory()
+    db_dir  = args.db_dir or tmp_dir.name
+    if not args.db_dir:
+        makeDbs(db_dir, n_episodes=args.episodes, poster_size=args.poster)
+
+    # run app in fresh processes, and report medians
+    runs = [runChild(__file__, ["--child", db_dir] +
+                     (["--scroll"] if args.scroll else []),
+                     os.path.join(tmp_dir.name, "data"))
+            for _ in range(args.runs)]
+    report = medians(runs, 3)
+    report["episodes"] = args.episodes
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
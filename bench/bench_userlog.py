@@ -0,0 +1,69 @@
+#
+# TrekList - user log lookup benchmark
+#
+# Compares the per-row user log lookups done while populating a table:
+# the old boolean-mask scan of a pandas log against userLogStore.
+#
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+bench_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, bench_dir)
+sys.path.insert(0, os.path.dirname(bench_dir))
+
+import synth
+from   userlog import userLogStore
+
+def scanLookup(df, imdb_id, hdr):
+    """
+    User log lookup as the app did before userLogStore
+    """
+    res = df[df["imdb_id"] == imdb_id][hdr]
+    value = res.values[0] if len(res) > 0 else None
+    return False if value != value else value
+
+def main():
+    parser = argparse.ArgumentParser(description="TrekList user log benchmark")
+    parser.add_argument("--log",  type=int, default=50000)
+    parser.add_argument("--rows", type=int, default=2000,
+                        help="table rows to populate")
+    args = parser.parse_args()
+
+    # synthetic log, fully filled
+    tmp_dir = tempfile.TemporaryDirectory()
+    log_fn  = os.path.join(tmp_dir.name, "user.db")
+    ids     = [f"tt{i:07d}" for i in range(args.log)]
+    synth.makeUserLog(log_fn, ids, fill=1.0)
+    conn    = sqlite3.connect(log_fn)
+    rows    = ids[::max(1, args.log // args.rows)][:args.rows]
+    res     = {"log": args.log, "rows": len(rows)}
+
+    # before: pandas scans
+    t0 = time.perf_counter()
+    df = pd.read_sql_query("SELECT * FROM log", conn)
+    for imdb_id in rows:
+        scanLookup(df, imdb_id, "watched")
+        scanLookup(df, imdb_id, "last_watched")
+    res["scan_s"] = round(time.perf_counter() - t0, 4)
+
+    # after: indexed store
+    t0 = time.perf_counter()
+    store = userLogStore(conn)
+    for imdb_id in rows:
+        store.get(imdb_id, "watched")
+        store.get(imdb_id, "last_watched")
+    res["store_s"] = round(time.perf_counter() - t0, 4)
+
+    res["speedup"] = round(res["scan_s"] / res["store_s"], 1)
+    print(json.dumps(res, indent=2))
+
+if __name__ == '__main__':
+    main()
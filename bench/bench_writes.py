@@ -0,0 +1,72 @@
+#
+# TrekList - user log write stress test
+#
+# Fires watched toggles through userLogWriter, closes it, checks that the
+# final state of every imdb_id reached user.db and reports throughput.
+# The old one-commit-per-click path is timed on a smaller sample.
+#
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+bench_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, bench_dir)
+sys.path.insert(0, os.path.dirname(bench_dir))
+
+import synth
+from   userlog import userLogWriter, prepareLog
+
+def main():
+    parser = argparse.ArgumentParser(description="TrekList write stress test")
+    parser.add_argument("--toggles", type=int, default=10000)
+    parser.add_argument("--ids",     type=int, default=2000)
+    parser.add_argument("--sync",    type=int, default=300,
+                        help="toggles to time with one commit each")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.TemporaryDirectory()
+    log_fn  = os.path.join(tmp_dir.name, "user.db")
+    ids     = [f"tt{i:07d}" for i in range(args.ids)]
+    synth.makeUserLog(log_fn, ids, fill=0.5)
+    conn    = sqlite3.connect(log_fn)
+    prepareLog(conn)
+    rng     = random.Random(0)
+    res     = {"toggles": args.toggles, "ids": args.ids}
+
+    # write-behind
+    final  = dict()
+    writer = userLogWriter(log_fn)
+    t0 = time.perf_counter()
+    for _ in range(args.toggles):
+        imdb_id = rng.choice(ids)
+        final[imdb_id] = int(not final.get(imdb_id, 0))
+        writer.put(imdb_id, watched=final[imdb_id])
+    res["put_s"] = round(time.perf_counter() - t0, 4)
+    writer.close()
+    res["total_s"]         = round(time.perf_counter() - t0, 4)
+    res["flushes"]         = writer.n_flushes
+    res["records_written"] = writer.n_written
+    res["flush_rec_per_s"] = round(writer.n_written / writer.flush_time)
+    res["toggles_per_s"]   = round(args.toggles / res["total_s"])
+
+    # durability check
+    stored = dict(conn.execute("SELECT imdb_id, watched FROM log"))
+    res["lost"] = sum(stored.get(k) != v for k, v in final.items())
+
+    # synchronous baseline
+    t0 = time.perf_counter()
+    for _ in range(args.sync):
+        conn.execute("UPDATE log SET watched = 1 WHERE imdb_id = ?",
+                     (rng.choice(ids),))
+        conn.commit()
+    res["sync_toggles_per_s"] = round(args.sync / (time.perf_counter() - t0))
+    print(json.dumps(res, indent=2))
+
+if __name__ == '__main__':
+    main()
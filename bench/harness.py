@@ -0,0 +1,98 @@
+#
+# TrekList - benchmark harness
+#
+# Shared by the benchmarks: puts the repository on the path, builds
+# synthetic databases, starts the app against them, and runs a benchmark
+# script in a fresh headless process (QT_QPA_PLATFORM=offscreen) so that
+# peak RSS and caches are not polluted by earlier runs.
+#
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+bench_dir = os.path.dirname(os.path.realpath(__file__))
+repo_dir  = os.path.dirname(bench_dir)
+for path in (bench_dir, repo_dir):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+def makeDbs(db_dir, n_series=12, n_episodes=12000, poster_size=(320, 240),
+            n_posters=64, compress=False, fill=0.5, pack=False):
+    """
+    Write a synthetic treklist.db and user.db, and optionally a poster
+    pack, into `db_dir`
+
+    Returns
+    -------
+    imdb_ids : list of str
+    """
+    import sqlite3
+    import synth
+    from   posterpack import packCatalog
+    os.makedirs(db_dir, exist_ok=True)
+    db_file = os.path.join(db_dir, "treklist.db")
+    ids = synth.makeCatalog(db_file, n_series, n_episodes,
+                            poster_size=tuple(poster_size), n_posters=n_posters,
+                            compress=compress)
+    synth.makeUserLog(os.path.join(db_dir, "user.db"), ids, fill)
+    if pack:
+        conn = sqlite3.connect(db_file)
+        packCatalog(conn, os.path.join(db_dir, "posters.pack"))
+        conn.close()
+    return ids
+
+def useDbs(db_dir):
+    """
+    Import the app, pointed at the databases in `db_dir`
+
+    Returns
+    -------
+    treklist : module
+    """
+    import treklist
+    treklist.db_file   = os.path.join(db_dir, "treklist.db")
+    treklist.log_file  = os.path.join(db_dir, "user.db")
+    treklist.pack_file = os.path.join(db_dir, "posters.pack")
+    return treklist
+
+def startApp(db_dir):
+    """
+    Construct the app on the databases in `db_dir`
+
+    Returns
+    -------
+    app : QApplication
+    ex : trekListApp
+    """
+    from PyQt6.QtWidgets import QApplication
+    treklist = useDbs(db_dir)
+    app = QApplication.instance() or QApplication([])
+    return app, treklist.trekListApp()
+
+def runChild(script, args, data_dir):
+    """
+    Run `script` headless in a fresh process, with its own app data
+    directory, and read the JSON line it prints last
+
+    Returns
+    -------
+    result : dict
+    """
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", XDG_DATA_HOME=data_dir)
+    out = subprocess.run([sys.executable, script] + [str(arg) for arg in args],
+        env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def medians(runs, digits=4):
+    """
+    Median of every metric over several runs
+
+    Returns
+    -------
+    medians : dict of metric: value
+    """
+    return {key: round(statistics.median(run[key] for run in runs), digits)
+            for key in runs[0]}
@@ -0,0 +1,35 @@
+#
+# TrekList - import time runtime hook
+#
+# PyInstaller runtime hook for treklist.spec. Frozen apps cannot be run
+# with `-X importtime`, so when TREKLIST_IMPORTTIME names a file, every
+# module load is timed here instead and written to it in the same format.
+# Does nothing otherwise.
+#
+
+import os
+
+if os.environ.get("TREKLIST_IMPORTTIME"):
+    import importlib._bootstrap as _bootstrap
+    import time
+
+    _out   = open(os.environ["TREKLIST_IMPORTTIME"], "w", buffering=1)
+    _load  = _bootstrap._find_and_load
+    _stack = [] # time spent in nested loads, per load in progress
+    _out.write("import time: self [us] | cumulative | imported package\n")
+
+    def _timedLoad(name, import_):
+        depth = len(_stack)
+        _stack.append(0)
+        t0 = time.perf_counter_ns()
+        try:
+            return _load(name, import_)
+        finally:
+            cum   = (time.perf_counter_ns() - t0) // 1000
+            child = _stack.pop()
+            if _stack:
+                _stack[-1] += cum
+            _out.write(f"import time: {cum - child:9d} | {cum:10d} | " +
+                       f"{'  ' * depth}{name}\n")
+
+    _bootstrap._find_and_load = _timedLoad
@@ -0,0 +1,138 @@
+#
+# TrekList - mock OMDb server
+#
+# Serves OMDb-style JSON for a synthetic franchise, plus poster images,
+# from a local HTTP server. Requests can be slowed down and made to fail
+# at random, to exercise the builder's concurrency and retries.
+#
+
+from   http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import json
+import random
+import threading
+import time
+from   urllib.parse import urlparse, parse_qs
+
+from   synth import makePoster
+
+class mockOmdb:
+    """
+    Mock OMDb
+
+    `series` maps abbreviations to imdb_ids, as builder.st_series does;
+    each series gets `seasons` seasons of `episodes` episodes. Requests
+    fail with HTTP `fail_status` at random, at `fail_rate`, and always
+    for the first `fail_first` requests. A record replaced by bytes is
+    served as that body instead of JSON.
+    """
+    def __init__(self, series, movies, seasons=3, episodes=10, latency=0.02,
+                 fail_rate=0.05, seed=0, fail_status=503, fail_first=0):
+        self.latency   = latency
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.fail_first  = fail_first
+        self.rng       = random.Random(seed)
+        self.lock      = threading.Lock()
+        self.records   = dict() # imdb_id: record
+        self.seasons   = dict() # (imdb_id, season): record
+        self.n_requests = 0
+        self.n_failed   = 0
+        self.poster    = makePoster(32, 24, seed, compress=True)
+        self.server    = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.url       = f"http://127.0.0.1:{self.server.server_port}/"
+
+        # franchise
+        self.series = list(series.items())
+        for abb, imdb_id in self.series:
+            self.records[imdb_id] = self.record(imdb_id, f"Series {abb}",
+                totalSeasons="0", Type="series")
+            for season in range(seasons):
+                self.addSeason(abb, episodes)
+        for abb, imdb_id in movies.items():
+            self.records[imdb_id] = self.record(imdb_id, f"Movie {abb}",
+                Metascore="60", BoxOffice="N/A", Type="movie")
+
+    def addSeason(self, abb, episodes=10):
+        """
+        Add a season of `episodes` episodes to a series
+        """
+        s, (_, imdb_id) = next((s, item) for s, item in enumerate(self.series)
+                               if item[0] == abb)
+        series = self.records[imdb_id]
+        season = int(series["totalSeasons"]) + 1
+        eps = []
+        for e in range(1, episodes + 1):
+            ep_id = f"tt8{s:02d}{season:02d}{e:03d}"
+            self.records[ep_id] = self.record(ep_id, f"{abb} {season}x{e}",
+                Season=str(season), Episode=str(e), Type="episode")
+            eps.append({"Title": f"{abb} {season}x{e}",
+                        "Released": f"{1966+s}-01-{e % 28 + 1:02d}",
+                        "Episode": str(e), "imdbRating": "7.0",
+                        "imdbID": ep_id})
+        series["totalSeasons"] = str(season)
+        for prev in range(1, season):
+            self.seasons[(imdb_id, prev)]["totalSeasons"] = str(season)
+        self.seasons[(imdb_id, season)] = {"Title": series["Title"],
+            "Season": str(season), "totalSeasons": str(season),
+            "Episodes": eps, "Response": "True"}
+
+    def record(self, imdb_id, title, **extra):
+        return dict({"Title": title, "Year": "1966", "Rated": "TV-PG",
+            "Released": "08 Sep 1966", "Runtime": "50 min",
+            "Director": "Some Director", "Writer": "Some Writer",
+            "Actors": "Some Actor", "Plot": "A mock plot.",
+            "Poster": f"{self.url}posters/{imdb_id}.png",
+            "imdbRating": "7.5", "imdbVotes": "1,234", "imdbID": imdb_id,
+            "Response": "True"}, **extra)
+
+    def handler(self):
+        mock = self
+
+        class handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with mock.lock:
+                    mock.n_requests += 1
+                    fail = mock.rng.random() < mock.fail_rate or \
+                           mock.n_requests <= mock.fail_first
+                    if fail:
+                        mock.n_failed += 1
+                time.sleep(mock.latency)
+                if fail:
+                    self.send_error(mock.fail_status)
+                    return
+                url = urlparse(self.path)
+                if url.path.startswith("/posters/"):
+                    self.reply(mock.poster, "image/png")
+                    return
+                query  = parse_qs(url.query)
+                imdb_id = query.get("i", [""])[0]
+                if "Season" in query:
+                    res = mock.seasons.get((imdb_id, int(query["Season"][0])))
+                else:
+                    res = mock.records.get(imdb_id)
+                if res is None:
+                    res = {"Response": "False", "Error": "Incorrect IMDb ID."}
+                if isinstance(res, bytes): # a broken body, served as is
+                    self.reply(res, "text/html")
+                    return
+                self.reply(json.dumps(res).encode(), "application/json")
+
+            def reply(self, body, content_type):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,200 @@
+#
+# TrekList - benchmark suite
+#
+# Runs the app headless (QT_QPA_PLATFORM=offscreen) against synthetic
+# databases of a configurable scale and times construction, showing
+# every tab, scrolling a series table to the end, resizing the window
+# with its posters, bulk setUserItem writes and loading a user log. Each
+# run is a fresh process with a fresh data directory; medians are
+# compared with the baseline stored in bench/baseline.json, so that
+# regressions show up between versions. Timings depend on the machine,
+# so baselines are kept per machine and config: --save adds or replaces
+# the one for the current pair, and runs without one are not compared.
+#
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from   harness import bench_dir, makeDbs, medians, runChild, startApp
+
+def runScenarios(db_dir, n_writes):
+    """
+    Run every scenario once and print one JSON result line
+    """
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore    import QSize
+    import treklist
+    from   userlog import exportLog, readLog
+    app = QApplication([])
+    res = dict()
+
+    def settle():
+        # let pending events, and background poster decodes, finish
+        app.processEvents()
+        while ex.poster_cache.pending:
+            app.processEvents()
+
+    # construction
+    t0 = time.perf_counter()
+    _, ex = startApp(db_dir)
+    settle()
+    res["construct_s"] = time.perf_counter() - t0
+
+    # show every tab, building it
+    tabs = ex.tab_widget.tabs
+    t0 = time.perf_counter()
+    for i in range(tabs.count()):
+        tabs.setCurrentIndex(i)
+        settle()
+    res["tabs_s"] = time.perf_counter() - t0
+
+    # scroll the first series table to the end, a page at a time
+    tabs.setCurrentIndex(0)
+    settle()
+    tbl   = tabs.widget(0).findChild(treklist.catalogTableWidget)
+    model = tbl.model()
+    bar   = tbl.verticalScrollBar()
+    t0 = time.perf_counter()
+    while bar.value() < bar.maximum() or model.canFetchMore():
+        bar.setValue(bar.value() + bar.pageStep())
+        settle()
+    res["scroll_s"] = time.perf_counter() - t0
+
+    # resize the window, rescaling the posters shown
+    size = ex.size()
+    t0 = time.perf_counter()
+    for step in range(1, 11):
+        ex.resize(QSize(size.width() + 40 * step, size.height() + 30 * step))
+        settle()
+    res["poster_resize_s"] = time.perf_counter() - t0
+
+    # bulk writes, until they are committed
+    ids = [row[0] for row in ex.tl_conn.execute("SELECT imdb_id FROM episodes " +
+                                                "LIMIT ?", (n_writes,))]
+    t0 = time.perf_counter()
+    for imdb_id in ids:
+        ex.setUserItem(imdb_id, watched=not ex.usr_log.get(imdb_id, 'watched'))
+    ex.usr_writer.flush()
+    res["writes_s"] = time.perf_counter() - t0
+
+    # load a user log in place
+    log_copy = os.path.join(db_dir, "user_copy.db")
+    exportLog(os.path.join(db_dir, "user.db"), log_copy)
+    t0 = time.perf_counter()
+    ex.reloadLog(readLog(log_copy))
+    settle()
+    res["load_log_s"] = time.perf_counter() - t0
+
+    ex.close()
+    res["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps(res))
+
+def compare(results, baseline, tolerance):
+    """
+    Metrics more than `tolerance` slower (or bigger) than the baseline
+
+    Returns
+    -------
+    regressions : dict of metric: {"baseline", "current", "ratio"}
+    """
+    regressions = dict()
+    for key, value in results.items():
+        base = baseline.get(key)
+        if base and value > base * (1 + tolerance):
+            regressions[key] = dict(baseline=base, current=value,
+                                    ratio=round(value / base, 2))
+    return regressions
+
+def readBaselines(filename):
+    """
+    Stored baselines, one report per machine and config
+
+    Returns
+    -------
+    baselines : list of {"config", "machine", "results"}
+    """
+    if not os.path.exists(filename):
+        return []
+    with open(filename) as f:
+        baselines = json.load(f)
+    return [baselines] if isinstance(baselines, dict) else baselines
+
+def findBaseline(baselines, report):
+    """
+    The baseline recorded on the same machine with the same config, or None
+    """
+    for baseline in baselines:
+        if baseline["machine"] == report["machine"] and \
+                baseline["config"] == report["config"]:
+            return baseline
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="TrekList benchmark suite")
+    parser.add_argument("--series",    type=int,   default=12)
+    parser.add_argument("--episodes",  type=int,   default=12000)
+    parser.add_argument("--poster",    type=int,   nargs=2, default=[320, 240])
+    parser.add_argument("--fill",      type=float, default=0.5)
+    parser.add_argument("--writes",    type=int,   default=2000,
+                        help="setUserItem calls in the bulk write scenario")
+    parser.add_argument("--pack",      action="store_true",
+                        help="serve posters from a poster pack")
+    parser.add_argument("--runs",      type=int,   default=3)
+    parser.add_argument("--baseline",  default=os.path.join(bench_dir, "baseline.json"))
+    parser.add_argument("--save",      action="store_true",
+                        help="store the results as the baseline for this " +
+                             "machine and config")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown before a metric is flagged")
+    parser.add_argument("--child",     help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        runScenarios(args.child, args.writes)
+        return
+
+    # synthetic databases, copied afresh for every run
+    config  = dict(series=args.series, episodes=args.episodes,
+                   poster=args.poster, fill=args.fill, writes=args.writes,
+                   pack=args.pack)
+    tmp_dir = tempfile.TemporaryDirectory()
+    src_dir = os.path.join(tmp_dir.name, "src")
+    makeDbs(src_dir, args.series, args.episodes, args.poster, compress=True,
+            fill=args.fill, pack=args.pack)
+
+    runs = []
+    for run in range(args.runs):
+        run_dir = os.path.join(tmp_dir.name, f"run{run}")
+        shutil.copytree(src_dir, run_dir)
+        runs.append(runChild(__file__, ["--child", run_dir, "--writes", args.writes],
+                             os.path.join(run_dir, "data")))
+    results = medians(runs)
+    report  = dict(config=config, machine=platform.platform(), results=results)
+
+    # compare with, or replace, the baseline for this machine and config
+    baselines = readBaselines(args.baseline)
+    baseline  = findBaseline(baselines, report)
+    if args.save:
+        if baseline is not None:
+            baselines.remove(baseline)
+        baselines.append(report)
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2)
+            f.write("\n")
+    elif baseline is None:
+        report["baseline"] = "none for this machine and config, record one with --save"
+    else:
+        report["regressions"] = compare(results, baseline["results"], args.tolerance)
+    print(json.dumps(report, indent=2))
+    if report.get("regressions"):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+#
+# TrekList - synthetic database generator
+#
+# Builds treklist.db and user.db files with the same layout as
+# builder.py, at an arbitrary scale, without touching OMDb. Catalogs are
+# written in the legacy one-table-per-series layout and then migrated,
+# unless the legacy layout is asked for.
+#
+
+import argparse
+import math
+import os
+import random
+import sqlite3
+import struct
+import sys
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from   catalog import legacy_series_cols, legacy_episode_cols, legacy_movie_cols
+from   catalog import migrateCatalog
+from   userlog import log_cols
+
+months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+          "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+def makePoster(width, height, seed, compress=False):
+    """
+    Make a PNG of random stripes
+
+    Uncompressed it takes roughly width*height*3 bytes; compressed it is
+    tiny but still costs a full width*height decode.
+
+    Returns
+    -------
+    png : bytes
+    """
+    rng  = random.Random(seed)
+    row  = bytes(rng.getrandbits(8) for _ in range(width * 3))
+    raw  = b"".join(b"\x00" + row for _ in range(height))
+
+    def chunk(tag, data):
+        crc = zlib.crc32(tag + data) & 0xffffffff
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", crc)
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + \
+        chunk(b"IDAT", zlib.compress(raw, 6 if compress else 0)) + \
+        chunk(b"IEND", b"")
+
+def makeCatalog(filename, n_series=12, n_episodes=12000, n_movies=13,
+                poster_size=(320, 240), n_posters=64, compress=False, legacy=False,
+                seed=0):
+    """
+    Write a synthetic treklist.db
+
+    Episodes are spread evenly over `n_series` series of 25-episode
+    seasons. Only `n_posters` distinct images are generated and reused,
+    so big catalogs do not take long to build. With `legacy` the catalog
+    keeps one table per series, as built before the unified layout.
+
+    Returns
+    -------
+    imdb_ids : list of every episode and movie imdb_id
+    """
+    rng = random.Random(seed)
+    if os.path.exists(filename):
+        os.remove(filename)
+    conn = sqlite3.connect(filename)
+    posters = [makePoster(*poster_size, seed=i, compress=compress)
+               for i in range(n_posters)]
+    imdb_ids = []
+    next_id = [1000000]
+
+    def newId():
+        next_id[0] += 1
+        return f"tt{next_id[0]:07d}"
+
+    # series
+    conn.execute(f"CREATE TABLE series ({legacy_series_cols})")
+    per_series = max(1, n_episodes // n_series)
+    for s in range(n_series):
+        abb     = f"s{s:02d}"
+        seasons = max(1, math.ceil(per_series / 25))
+        conn.execute("INSERT INTO series VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [abb, f"Synthetic Series {s}", newId(), f"{1966+s}–{1970+s}",
+             seasons, "N/A", posters[s % n_posters], "TV-PG"])
+
+        # episodes
+        conn.execute(f"CREATE TABLE {abb} ({legacy_episode_cols})")
+        rows = []
+        for e in range(per_series):
+            imdb_id = newId()
+            imdb_ids.append(imdb_id)
+            rows.append([f"Episode {e}", "TV-PG",
+                f"{1966+s}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                e // 25 + 1, e % 25 + 1, f"{rng.randint(20, 60)} min",
+                "Some Director", "Some Writer", "Some Actor, Another Actor",
+                "A synthetic plot. " * 4, "N/A", posters[e % n_posters],
+                round(rng.uniform(5, 9), 1), rng.randint(100, 9000), imdb_id])
+        conn.executemany(f"INSERT INTO {abb} VALUES " +
+            "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    # movies
+    conn.execute(f"CREATE TABLE mov ({legacy_movie_cols})")
+    for m in range(n_movies):
+        imdb_id = newId()
+        imdb_ids.append(imdb_id)
+        conn.execute("INSERT INTO mov VALUES " +
+            "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [f"M{m}", f"Synthetic Movie {m}", f"{1979+m}", "PG",
+             f"{rng.randint(1, 28):02d} {months[m % 12]} {1979+m}",
+             f"{rng.randint(90, 140)} min", "Some Director", "Some Writer",
+             "Some Actor", "A synthetic plot.", "N/A",
+             posters[m % n_posters], 60, 7.0, 100000, "N/A", imdb_id])
+
+    conn.commit()
+    if not legacy:
+        migrateCatalog(conn, log=lambda msg: None, backup=False)
+    conn.close()
+    return imdb_ids
+
+def makeUserLog(filename, imdb_ids, fill=0.5, seed=0):
+    """
+    Write a synthetic user.db with `fill` of the imdb_ids logged
+    """
+    rng = random.Random(seed)
+    if os.path.exists(filename):
+        os.remove(filename)
+    conn = sqlite3.connect(filename)
+    conn.execute(f"CREATE TABLE log ({log_cols})")
+    rows = [[imdb_id, 1, f"2022-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+             None, None, None, None]
+            for imdb_id in imdb_ids if rng.random() < fill]
+    conn.executemany("INSERT INTO log VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic TrekList databases")
+    parser.add_argument("out_dir")
+    parser.add_argument("--series",   type=int,   default=12)
+    parser.add_argument("--episodes", type=int,   default=12000)
+    parser.add_argument("--movies",   type=int,   default=13)
+    parser.add_argument("--poster",   type=int,   nargs=2, default=[320, 240])
+    parser.add_argument("--posters",  type=int,   default=64,
+                        help="distinct poster images")
+    parser.add_argument("--compress", action="store_true",
+                        help="deflate posters, as real images are")
+    parser.add_argument("--fill",     type=float, default=0.5)
+    parser.add_argument("--seed",     type=int,   default=0)
+    parser.add_argument("--legacy",   action="store_true",
+                        help="keep one table per series")
+    args = parser.parse_args()
+    os.makedirs(args.out_dir, exist_ok=True)
+    ids = makeCatalog(os.path.join(args.out_dir, "treklist.db"), args.series,
+                      args.episodes, args.movies, tuple(args.poster),
+                      args.posters, args.compress, args.legacy, args.seed)
+    makeUserLog(os.path.join(args.out_dir, "user.db"), ids, args.fill,
+                args.seed)
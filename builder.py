@@ -0,0 +1,515 @@
+#
+# TrekList - catalog builder
+#
+# Fetches series, episodes, movies and posters from OMDb on a bounded
+# thread pool and streams them into treklist.db in batched transactions.
+# Requests share one pooled HTTP session, a token-bucket rate limiter and
+# exponential-backoff retries, so a single run catches every episode.
+# Runs are incremental: only new seasons and missing or outdated records
+# are fetched, and an interrupted run resumes from its last commit.
+#
+# usage: python builder.py [--db treklist.db] [--key api_key] [--max-age days]
+#
+
+import argparse
+import datetime
+from   concurrent.futures import ThreadPoolExecutor, as_completed
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+import requests
+from   requests.adapters  import HTTPAdapter
+
+from   catalog            import createCatalog, isLegacy, migrateCatalog
+from   catalog            import needsNormalizing, normalizeCatalog, normalizeRow
+from   catalog            import parseRuntime, buildStats, buildSearch
+from   posterpack         import packCatalog
+
+omdb_url = "https://www.omdbapi.com/"
+
+# all series
+st_series = {'tos': 'tt0060028',
+             'tas': 'tt0069637',
+             'tng': 'tt0092455',
+             'ds9': 'tt0106145',
+             'voy': 'tt0112178',
+             'ent': 'tt0244365',
+             'dis': 'tt5171438',
+             'sho': 'tt9059594',
+             'pic': 'tt8806524',
+             'lds': 'tt9184820',
+             'pro': 'tt9795876',
+             'snw': 'tt12327578',
+            }
+
+# episodes missing from the OMDb season lists: (imdb_id, season, episode)
+st_extras = {'tos': [('tt0059753', 1, 0)], # the cage
+            }
+
+# all movies
+st_movies = {'TMP':  'tt0079945',
+             'TWOK': 'tt0084726',
+             'TSFS': 'tt0088170',
+             'TVH':  'tt0092007',
+             'TFF':  'tt0098382',
+             'TUC':  'tt0102975',
+             'GEN':  'tt0111280',
+             'FC':   'tt0117731',
+             'INS':  'tt0120844',
+             'NEM':  'tt0253754',
+             'ST09': 'tt0796366',
+             'STID': 'tt1408101',
+             'STB':  'tt2660888',
+            }
+
+class omdbError(Exception):
+    """
+    OMDb request failed after all retries
+    """
+
+class tokenBucket:
+    """
+    Token Bucket
+
+    Thread-safe rate limiter allowing `rate` requests per second on
+    average, with bursts of up to `burst`.
+    """
+    def __init__(self, rate, burst):
+        self.rate   = rate
+        self.burst  = burst
+        self.tokens = burst
+        self.last   = time.monotonic()
+        self.lock   = threading.Lock()
+
+    def take(self):
+        """
+        Block until a token is available, then use it
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst,
+                                  self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def snakeKey(key):
+    """
+    Convert an OMDb key to the omdb package style, e.g. imdbID -> imdb_id
+    """
+    return re.sub(r"(?<=[a-z0-9])(?=[A-Z])", "_", key).lower()
+
+def snakeKeys(data):
+    if isinstance(data, dict):
+        return {snakeKey(k): snakeKeys(v) for k, v in data.items()}
+    if isinstance(data, list):
+        return [snakeKeys(v) for v in data]
+    return data
+
+class omdbClient:
+    """
+    OMDb Client
+
+    Thread-safe; responses are returned with snake_case keys, like the
+    omdb package. Connection errors, timeouts, 429/5xx responses and
+    OMDb's "Request limit reached!" are retried with exponential backoff
+    and jitter.
+    """
+    retry_status = (429, 500, 502, 503, 504)
+
+    def __init__(self, api_key, url=omdb_url, rate=10., burst=10, workers=8,
+                 retries=5, backoff=0.5, timeout=10.):
+        self.api_key = api_key
+        self.url     = url
+        self.bucket  = tokenBucket(rate, burst)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.n_requests = 0
+        self.n_retries  = 0
+
+        # one pooled session, sized for the worker pool
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount("http://",  adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, url, params=None):
+        """
+        GET with rate limiting and retries
+
+        Returns
+        -------
+        resp : requests.Response
+        """
+        for attempt in range(self.retries + 1):
+            self.bucket.take()
+            with self.bucket.lock: # counters are shared by the workers
+                self.n_requests += 1
+            try:
+                resp = self.session.get(url, params=params, timeout=self.timeout)
+                if resp.status_code in self.retry_status or \
+                        b"Request limit reached" in resp.content[:200]:
+                    err = f"HTTP {resp.status_code}"
+                else:
+                    resp.raise_for_status()
+                    return resp
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                err = str(exc)
+            except requests.HTTPError as exc: # e.g. a bad API key
+                raise omdbError(str(exc))
+            if attempt < self.retries:
+                with self.bucket.lock:
+                    self.n_retries += 1
+                time.sleep(self.backoff * 2**attempt * (1 + random.random()))
+        raise omdbError(f"{url} {params}: {err}")
+
+    def get(self, imdb_id, **params):
+        """
+        Get an OMDb record by imdb_id, e.g. get(imdb_id, season=2)
+
+        Returns
+        -------
+        res : dict, or None if OMDb has no such record
+        """
+        params = {k.capitalize(): v for k, v in params.items()}
+        params.update(apikey=self.api_key, i=imdb_id)
+        data = self.request(self.url, params).json()
+        if data.get("Response") == "False":
+            return None
+        return snakeKeys(data)
+
+    def getImage(self, url):
+        """
+        Download a poster
+
+        Returns
+        -------
+        img_data : bytes
+        """
+        return self.request(url).content
+
+def upsertSql(table, cols):
+    """
+    INSERT that updates the row with the same imdb_id instead
+    """
+    updates = [f"{col} = excluded.{col}" for col in cols if col != "imdb_id"]
+    return f"INSERT INTO {table} ({', '.join(cols)}) " + \
+           f"VALUES ({', '.join('?' * len(cols))}) " + \
+           f"ON CONFLICT (imdb_id) DO UPDATE SET {', '.join(updates)}"
+
+class batchWriter:
+    """
+    Batch Writer
+
+    Commits every `size` statements instead of after each one.
+    """
+    def __init__(self, conn, size=100):
+        self.conn = conn
+        self.size = size
+        self.n    = 0
+
+    def execute(self, sql, params):
+        self.conn.execute(sql, params)
+        self.n += 1
+        if self.n % self.size == 0:
+            self.conn.commit()
+
+    def commit(self):
+        self.conn.commit()
+
+class catalogBuilder:
+    """
+    Catalog Builder
+
+    Syncs treklist.db with OMDb. Every table has a unique index on
+    imdb_id, and the `sync_state` table records when each record and
+    season list was fetched, in the same transactions as the records
+    themselves, so an interrupted run resumes where it stopped.
+
+    On each run the series records are refreshed; season lists are only
+    fetched for new or still-running seasons, and episodes and movies only
+    if they are missing or, with `max_age` (days), older than that.
+    Requests run on a pool of `workers` threads; all database writes
+    happen on the calling thread.
+    """
+    def __init__(self, conn, client, workers=8, batch=100, max_age=None,
+                 log=print):
+        self.conn    = conn
+        self.client  = client
+        self.workers = workers
+        self.writer  = batchWriter(conn, batch)
+        self.max_age = max_age
+        self.log     = log
+        self.failed  = [] # (kind, item, error)
+        self.state   = dict() # key: (fetched, final)
+
+    def fetchAll(self, kind, fn, items):
+        """
+        Run fn(item) for all items on the pool
+
+        `fn` also turns the response into what is stored, so that a body
+        that is not JSON or lacks a field fails its item only.
+
+        Yields
+        ------
+        (item, result) as they complete; failures are recorded, with
+        their `kind` ("series", "season", "episode", "movie" or
+        "poster"), and skipped
+        """
+        with ThreadPoolExecutor(self.workers) as pool:
+            futures = {pool.submit(fn, item): item for item in items}
+            for future in as_completed(futures):
+                item = futures[future]
+                try:
+                    result = future.result()
+                except (omdbError, ValueError, KeyError) as err:
+                    msg = f"no {err} in response" if isinstance(err, KeyError) \
+                          else str(err)
+                    self.failed.append((kind, item, msg))
+                    self.log(f"failed: {kind} {item}: {msg}")
+                    continue
+                yield item, result
+
+    def existingIds(self, table, abb=None):
+        if abb is None:
+            return {row[0] for row in self.conn.execute(f"SELECT imdb_id FROM {table}")}
+        return {row[0] for row in self.conn.execute(
+            f"SELECT imdb_id FROM {table} WHERE series_abb = ?", (abb,))}
+
+    def prepare(self):
+        """
+        Create missing tables, migrating a legacy catalog, and load the
+        sync state
+        """
+        if isLegacy(self.conn):
+            migrateCatalog(self.conn, self.log)
+        createCatalog(self.conn)
+        if needsNormalizing(self.conn):
+            normalizeCatalog(self.conn, self.log)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS sync_state " +
+                          "(key TEXT PRIMARY KEY, fetched TEXT, final INTEGER)")
+        self.conn.commit()
+        self.state = {key: (fetched, final) for key, fetched, final in
+                      self.conn.execute("SELECT * FROM sync_state")}
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.now    = now.isoformat(timespec="seconds")
+        self.cutoff = None if self.max_age is None else \
+            (now - datetime.timedelta(days=self.max_age)).isoformat(timespec="seconds")
+
+    def outdated(self, key):
+        """
+        True if `key` was fetched longer than max_age ago, or at an unknown time
+        """
+        if self.cutoff is None:
+            return False
+        fetched = self.state.get(key, (None, None))[0]
+        return fetched is None or fetched < self.cutoff
+
+    def mark(self, key, final=None):
+        """
+        Record `key` as fetched now, as part of the current batch
+        """
+        self.writer.execute("INSERT INTO sync_state VALUES (?, ?, ?) ON CONFLICT " +
+            "(key) DO UPDATE SET fetched = excluded.fetched, final = excluded.final",
+            [key, self.now, final])
+        self.state[key] = (self.now, final)
+
+    def build(self, series=st_series, movies=st_movies, extras=st_extras,
+              posters=True):
+        """
+        Fetch everything new, missing or outdated
+        """
+        self.prepare()
+        try:
+            self.buildSeries(series)
+            self.buildEpisodes(series, extras)
+            self.buildMovies(movies)
+            if posters:
+                for table in ["series", "episodes", "mov"]:
+                    self.buildPosters(table)
+        finally:
+            self.writer.commit()
+        buildStats(self.conn)
+        buildSearch(self.conn)
+
+    def buildSeries(self, series):
+        """
+        Refresh all series records, which give the number of seasons
+        """
+        cmd = upsertSql("series", ["abb", "title", "imdb_id", "year",
+                                   "total_seasons", "poster_url", "rated"])
+
+        def fetch(abb):
+            res = self.client.get(series[abb])
+            return None if res is None else [abb, res['title'], res['imdb_id'],
+                res['year'], res['total_seasons'], res['poster'], res['rated']]
+
+        for abb, row in self.fetchAll("series", fetch, series):
+            if row is None:
+                continue
+            self.writer.execute(cmd, row)
+            self.mark(row[2])
+        self.writer.commit()
+        self.log(f"series: {len(series)} fetched")
+
+    def buildEpisodes(self, series, extras):
+        """
+        Fetch new season lists, then every missing or outdated episode
+
+        A season list is final once a later season exists; final seasons
+        are not fetched again unless outdated. A season is only marked as
+        fetched once its list and all of its episodes are stored; if OMDb
+        has no record of one, or its lookup fails, the season is fetched
+        again on the next run.
+        """
+        seasons = []
+        for abb in series:
+            res = self.conn.execute("SELECT total_seasons FROM series WHERE abb = ?",
+                                    (abb,)).fetchone()
+            if res is None or not str(res[0]).isdigit():
+                continue
+            n_seasons = int(res[0])
+            for season in range(1, n_seasons + 1):
+                key = f"season:{abb}:{season}"
+                if key not in self.state or not self.state[key][1] or \
+                        self.outdated(key):
+                    seasons.append((abb, season, season < n_seasons))
+
+        # season lists give the episodes and their release dates
+        have  = {abb: self.existingIds("episodes", abb) for abb in series}
+        todo  = []
+        lists = dict() # (abb, season): final
+
+        def fetchList(item):
+            res = self.client.get(series[item[0]], season=item[1])
+            return None if res is None else \
+                [(ep['imdb_id'], ep.get('released')) for ep in res.get('episodes', [])]
+
+        for (abb, season, final), eps in self.fetchAll("season", fetchList, seasons):
+            if eps is None:
+                continue
+            lists[(abb, season)] = final
+            for imdb_id, released in eps:
+                if imdb_id not in have[abb] or self.outdated(imdb_id):
+                    todo.append((abb, imdb_id, season, None, released))
+        for abb, eps in extras.items():
+            for imdb_id, season, episode in eps:
+                if abb in have and (imdb_id not in have[abb] or self.outdated(imdb_id)):
+                    todo.append((abb, imdb_id, season, episode, None))
+
+        # episode details, streamed into the database
+        cols = ["series_abb", "season", "episode", "title", "rated", "released",
+                "runtime", "runtime_min", "director", "writer", "actors", "plot",
+                "poster_url", "imdb_rating", "imdb_votes", "imdb_id"]
+        cmd  = upsertSql("episodes", cols)
+
+        def fetchEpisode(item):
+            abb, imdb_id, season, episode, released = item
+            info = self.client.get(imdb_id)
+            return None if info is None else normalizeRow(cols, [abb, season,
+                info['episode'] if episode is None else episode, info['title'],
+                info['rated'], released or info['released'], info['runtime'],
+                parseRuntime(info['runtime']), info['director'], info['writer'],
+                info['actors'], info['plot'],
+                info['poster'], info['imdb_rating'], info['imdb_votes'],
+                info['imdb_id']])
+
+        stored = set()
+        for item, row in self.fetchAll("episode", fetchEpisode, todo):
+            if row is None:
+                continue
+            self.writer.execute(cmd, row)
+            self.mark(item[1])
+            stored.add(item[1])
+
+        # checkpoint the seasons whose episodes all made it
+        incomplete = {(abb, season) for abb, imdb_id, season, _, _ in todo
+                      if imdb_id not in stored}
+        for (abb, season), final in lists.items():
+            if (abb, season) not in incomplete:
+                self.mark(f"season:{abb}:{season}", int(final))
+        self.writer.commit()
+        self.log(f"episodes: {len(seasons)} seasons, {len(todo)} episodes fetched")
+
+    def buildMovies(self, movies):
+        have = self.existingIds("mov")
+        todo = [abb for abb, imdb_id in movies.items()
+                if imdb_id not in have or self.outdated(imdb_id)]
+        cols = ["abb", "title", "year", "rated", "released", "runtime",
+                "runtime_min", "director", "writer", "actors", "plot", "poster_url",
+                "metascore", "imdb_rating", "imdb_votes", "imdb_id"]
+        cmd  = upsertSql("mov", cols)
+
+        def fetch(abb):
+            res = self.client.get(movies[abb])
+            return None if res is None else normalizeRow(cols, [abb, res['title'],
+                res['year'], res['rated'], res['released'], res['runtime'],
+                parseRuntime(res['runtime']), res['director'], res['writer'],
+                res['actors'], res['plot'], res['poster'], res['metascore'],
+                res['imdb_rating'], res['imdb_votes'], res['imdb_id']])
+
+        for abb, row in self.fetchAll("movie", fetch, todo):
+            if row is None:
+                continue
+            self.writer.execute(cmd, row)
+            self.mark(row[-1])
+        self.writer.commit()
+        self.log(f"movies: {len(todo)} fetched")
+
+    def buildPosters(self, table):
+        """
+        Download the posters of a table that are missing, or whose
+        poster_url changed since they were stored
+        """
+        todo = self.conn.execute(f"SELECT t.imdb_id, t.poster_url FROM {table} t " +
+            "LEFT JOIN posters p USING (imdb_id) WHERE t.poster_url LIKE 'http%' " +
+            "AND p.url IS NOT t.poster_url").fetchall()
+        cmd  = "INSERT OR REPLACE INTO posters VALUES (?, ?, ?)"
+        for (imdb_id, url), img_data in self.fetchAll("poster",
+                lambda item: self.client.getImage(item[1]), todo):
+            self.writer.execute(cmd, [imdb_id, url, sqlite3.Binary(img_data)])
+        self.writer.commit()
+        self.log(f"posters: {table}: {len(todo)} fetched")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the TrekList catalog")
+    parser.add_argument("--db",      default="treklist.db")
+    parser.add_argument("--key",     default="api_key",
+                        help="file holding the OMDb API key")
+    parser.add_argument("--url",     default=omdb_url)
+    parser.add_argument("--workers", type=int,   default=8)
+    parser.add_argument("--rate",    type=float, default=10.,
+                        help="requests per second")
+    parser.add_argument("--max-age", type=float, default=None,
+                        help="refetch records older than this many days")
+    parser.add_argument("--no-posters", action="store_true")
+    parser.add_argument("--pack",    default=None,
+                        help="also write the posters to this poster pack")
+    args = parser.parse_args()
+
+    with open(args.key) as f:
+        api_key = f.readline().strip()
+    client  = omdbClient(api_key, args.url, rate=args.rate, workers=args.workers)
+    conn    = sqlite3.connect(args.db)
+    builder = catalogBuilder(conn, client, workers=args.workers,
+                             max_age=args.max_age)
+    builder.build(posters=not args.no_posters)
+    if args.pack:
+        print(packCatalog(conn, args.pack))
+    conn.close()
+    print(f"{client.n_requests} requests, {client.n_retries} retries, " +
+          f"{len(builder.failed)} failed")
+    sys.exit(1 if builder.failed else 0)
+
+if __name__ == '__main__':
+    main()
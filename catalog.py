@@ -0,0 +1,352 @@
+#
+# TrekList - catalog database helpers
+#
+# Build-time and load-time helpers for treklist.db: the schema, typed
+# values parsed from raw OMDb strings, migration of the older one-table-
+# per-series layout, and the stats and search tables built after a fetch.
+#
+
+from   datetime import datetime
+import sqlite3
+
+# one table for all episodes, keyed by series_abb; posters are kept in a
+# table of their own so that catalog queries never read them
+series_cols  = "abb TEXT, title TEXT, imdb_id TEXT UNIQUE, year TEXT, " + \
+               "total_seasons INTEGER, poster_url TEXT, rated TEXT"
+episode_cols = "series_abb TEXT, season INTEGER, episode INTEGER, title TEXT, " + \
+               "rated TEXT, released DATE, runtime TEXT, runtime_min INTEGER, " + \
+               "director TEXT, writer TEXT, actors TEXT, plot TEXT, " + \
+               "poster_url TEXT, imdb_rating FLOAT, imdb_votes INTEGER, " + \
+               "imdb_id TEXT UNIQUE"
+movie_cols   = "abb TEXT, title TEXT, year TEXT, rated TEXT, released DATE, " + \
+               "runtime TEXT, runtime_min INTEGER, director TEXT, writer TEXT, " + \
+               "actors TEXT, plot TEXT, poster_url TEXT, metascore INTEGER, " + \
+               "imdb_rating FLOAT, imdb_votes INTEGER, box_office TEXT, " + \
+               "imdb_id TEXT UNIQUE"
+poster_cols  = "imdb_id TEXT PRIMARY KEY, url TEXT, poster BLOB"
+
+# catalog format, kept in PRAGMA user_version; 1 has normalized values
+catalog_version = 1
+
+# legacy one-table-per-series layout, as created by build_db.ipynb
+legacy_series_cols  = "abb TEXT, title TEXT, imdb_id TEXT, year TEXT, " + \
+                      "total_seasons INTEGER, poster_url TEXT, poster BLOB, rated TEXT"
+legacy_episode_cols = "title TEXT, rated TEXT, released DATE, season INTEGER, " + \
+                      "episode INTEGER, runtime TEXT, director TEXT, writer TEXT, " + \
+                      "actors TEXT, plot TEXT, poster_url TEXT, poster BLOB, " + \
+                      "imdb_rating FLOAT, imdb_votes INTEGER, imdb_id TEXT"
+legacy_movie_cols   = "abb TEXT, title TEXT, year TEXT, rated TEXT, released DATE, " + \
+                      "runtime TEXT, director TEXT, writer TEXT, actors TEXT, " + \
+                      "plot TEXT, poster_url TEXT, poster BLOB, metascore INTEGER, " + \
+                      "imdb_rating FLOAT, imdb_votes INTEGER, box_office TEXT, " + \
+                      "imdb_id TEXT"
+
+def tableColumns(conn, table):
+    """
+    Column names of a table, in order
+    """
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def tableExists(conn, table):
+    res = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' " +
+                       "AND name = ?", (table,)).fetchone()
+    return res is not None
+
+def parseRuntime(runtime):
+    """
+    Parse an OMDb runtime such as "45 min" into minutes
+
+    Returns
+    -------
+    mins : int, or None for "N/A" and other values without digits
+    """
+    if runtime is None:
+        return None
+    digits = ''.join(filter(str.isdigit, str(runtime)))
+    return int(digits) if digits else None
+
+def parseDate(date):
+    """
+    Parse an OMDb date such as "08 Sep 1966" (or an ISO date) into ISO
+    format
+
+    Returns
+    -------
+    date : str, or None for "N/A" and other unparsable values
+    """
+    if date is None:
+        return None
+    for fmt in ("%Y-%m-%d", "%d %b %Y"):
+        try:
+            return datetime.strptime(str(date).strip(), fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    return None
+
+def parseInt(value):
+    """
+    Parse an OMDb count such as "1,234" into an int, or None
+    """
+    if isinstance(value, int) or value is None:
+        return value
+    try:
+        return int(float(str(value).replace(",", "")))
+    except ValueError:
+        return None
+
+def parseFloat(value):
+    """
+    Parse an OMDb rating such as "7.9" into a float, or None
+    """
+    if isinstance(value, float) or value is None:
+        return value
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+# parsers of the typed catalog columns; other text columns only have
+# OMDb's "N/A" replaced by NULL
+col_parsers = {"season":      parseInt,
+               "episode":     parseInt,
+               "released":    parseDate,
+               "runtime_min": parseInt,
+               "metascore":   parseInt,
+               "imdb_rating": parseFloat,
+               "imdb_votes":  parseInt,
+              }
+
+def normalizeValue(col, value):
+    """
+    A catalog value as stored, given its column
+    """
+    if value == "N/A":
+        return None
+    parser = col_parsers.get(col)
+    return value if parser is None else parser(value)
+
+def normalizeRow(cols, values):
+    return [normalizeValue(col, value) for col, value in zip(cols, values)]
+
+def createCatalog(conn):
+    """
+    Create the catalog tables and indexes, if missing
+    """
+    conn.execute(f"CREATE TABLE IF NOT EXISTS series ({series_cols})")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS episodes ({episode_cols})")
+    conn.execute("CREATE INDEX IF NOT EXISTS episodes_order " +
+                 "ON episodes (series_abb, season, episode)")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS mov ({movie_cols})")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS posters ({poster_cols})")
+
+def needsNormalizing(conn):
+    """
+    True if the catalog values predate `catalog_version`
+    """
+    return tableExists(conn, "episodes") and \
+           conn.execute("PRAGMA user_version").fetchone()[0] < catalog_version
+
+def normalizeCatalog(conn, log=print):
+    """
+    Rewrite the episode and movie values in their typed forms (see
+    `col_parsers`), then rebuild the search index and mark the catalog
+    as normalized. Commits.
+
+    Normalizing is idempotent, so an interrupted run can be repeated.
+    """
+    conn.create_function("normalize", 2, normalizeValue, deterministic=True)
+    conn.create_function("parse_runtime", 1, parseRuntime, deterministic=True)
+    for table in ["episodes", "mov"]:
+        cols = [col for col in tableColumns(conn, table)
+                if col not in ("imdb_id", "series_abb", "abb", "runtime_min")]
+        sets = [f"{col} = normalize('{col}', {col})" for col in cols]
+        conn.execute(f"UPDATE {table} SET {', '.join(sets)}, " +
+                     "runtime_min = parse_runtime(runtime)")
+    conn.execute(f"PRAGMA user_version = {catalog_version}")
+    buildSearch(conn)
+    n_rows = conn.execute("SELECT (SELECT COUNT(*) FROM episodes) + " +
+                          "(SELECT COUNT(*) FROM mov)").fetchone()[0]
+    log(f"normalized {n_rows} episodes and movies")
+
+def isLegacy(conn):
+    """
+    True if the catalog still has one table per series
+    """
+    return tableExists(conn, "series") and not tableExists(conn, "episodes")
+
+def backupCatalog(conn, suffix=".bak"):
+    """
+    Copy a catalog to its file name plus `suffix`, with the backup API
+
+    Returns
+    -------
+    filename : str of the copy, or None for an in-memory catalog
+    """
+    filename = conn.execute("PRAGMA database_list").fetchone()[2]
+    if not filename:
+        return None
+    dest = sqlite3.connect(filename + suffix)
+    conn.backup(dest)
+    dest.close()
+    return filename + suffix
+
+def migrateCatalog(conn, log=print, backup=True):
+    """
+    Convert a legacy catalog to the unified layout, in one transaction
+
+    With `backup`, the catalog is first copied to treklist.db.bak (see
+    `backupCatalog`). Episodes of every series table move into
+    `episodes`, all posters into `posters`, values are normalized, and
+    `runtime_min`, the stats table and the search index are (re)built.
+    Duplicate imdb_ids are dropped, keeping the first. A catalog
+    without a movie table gets an empty one.
+    """
+    if backup:
+        filename = backupCatalog(conn)
+        if filename:
+            log(f"saved a copy of the catalog as {filename}")
+    conn.create_function("parse_runtime", 1, parseRuntime, deterministic=True)
+    abbs = [row[0] for row in conn.execute("SELECT abb FROM series")]
+    movies = tableExists(conn, "mov")
+    conn.execute("BEGIN")
+    conn.execute("ALTER TABLE series RENAME TO legacy_series")
+    if movies:
+        conn.execute("ALTER TABLE mov RENAME TO legacy_mov")
+    createCatalog(conn)
+
+    # posters
+    series = [abb for abb in abbs if tableExists(conn, abb)]
+    tables = ["legacy_series"] + series + (["legacy_mov"] if movies else [])
+    for table in tables:
+        conn.execute("INSERT OR IGNORE INTO posters SELECT imdb_id, poster_url, " +
+                     f"poster FROM {table} WHERE poster IS NOT NULL")
+
+    # records
+    conn.execute("INSERT OR IGNORE INTO series SELECT abb, title, imdb_id, year, " +
+                 "total_seasons, poster_url, rated FROM legacy_series")
+    for abb in series:
+        conn.execute("INSERT OR IGNORE INTO episodes SELECT ?, season, episode, " +
+            "title, rated, released, runtime, parse_runtime(runtime), director, " +
+            "writer, actors, plot, poster_url, imdb_rating, imdb_votes, imdb_id " +
+            f"FROM {abb} ORDER BY season, episode", (abb,))
+    if movies:
+        conn.execute("INSERT OR IGNORE INTO mov SELECT abb, title, year, rated, " +
+            "released, runtime, parse_runtime(runtime), director, writer, actors, " +
+            "plot, poster_url, metascore, imdb_rating, imdb_votes, box_office, " +
+            "imdb_id FROM legacy_mov")
+    for table in tables:
+        conn.execute(f"DROP TABLE {table}")
+    normalizeCatalog(conn, log)
+    buildStats(conn)
+    n_eps = conn.execute("SELECT COUNT(*) FROM episodes").fetchone()[0]
+    log(f"migrated {len(series)} series tables, {n_eps} episodes")
+
+    # reclaim the space of the old tables
+    conn.execute("VACUUM")
+
+def buildStats(conn):
+    """
+    Precompute the per-season `stats` table
+
+    One row per (series_abb, season) with its number of episodes and
+    minutes; movies are stored under series_abb 'mov' with a NULL
+    season. Commits.
+    """
+    conn.execute("DROP TABLE IF EXISTS stats")
+    conn.execute("CREATE TABLE stats (series_abb TEXT, season INTEGER, " +
+                 "n_eps INTEGER, n_mins INTEGER)")
+    conn.execute("INSERT INTO stats SELECT series_abb, season, COUNT(*), " +
+                 "TOTAL(runtime_min) FROM episodes GROUP BY series_abb, season")
+    conn.execute("INSERT INTO stats SELECT 'mov', NULL, COUNT(*), " +
+                 "TOTAL(runtime_min) FROM mov")
+    conn.commit()
+
+def buildSearch(conn, schema="main"):
+    """
+    (Re)build the `search` full-text index of episodes and movies
+
+    Movies are indexed under series_abb 'mov'. Use schema "temp" to
+    index a read-only catalog for the current connection only.
+    """
+    conn.execute(f"DROP TABLE IF EXISTS {schema}.search")
+    conn.execute(f"CREATE VIRTUAL TABLE {schema}.search USING fts5 " +
+                 "(imdb_id UNINDEXED, series_abb UNINDEXED, title, plot, " +
+                 "director, writer, actors)")
+    conn.execute(f"INSERT INTO {schema}.search SELECT imdb_id, series_abb, " +
+                 "title, plot, director, writer, actors FROM episodes")
+    conn.execute(f"INSERT INTO {schema}.search SELECT imdb_id, 'mov', " +
+                 "title, plot, director, writer, actors FROM mov")
+    conn.commit()
+
+def searchQuery(text):
+    """
+    Turn free text into an FTS5 query matching all of its words
+
+    Words are quoted, so FTS5 operators and punctuation are taken
+    literally; the last word also matches as a prefix, for searching as
+    you type.
+
+    Returns
+    -------
+    query : str, or None if there are no words
+    """
+    words = text.split()
+    if not words:
+        return None
+    terms = ['"' + word.replace('"', '""') + '"' for word in words]
+    return " ".join(terms) + "*"
+
+def watchKeys(conn, imdb_ids):
+    """
+    Series, season and runtime of episodes and movies, as keyed in the
+    user log's watch rollups; movies are series 'mov', season 0
+
+    Returns
+    -------
+    keys : {imdb_id: (series_abb, season, mins)}
+    """
+    imdb_ids = list(imdb_ids)
+    keys     = dict()
+    for i in range(0, len(imdb_ids), 500):
+        chunk = imdb_ids[i:i+500]
+        marks = ", ".join("?" * len(chunk))
+        keys.update((row[0], row[1:]) for row in conn.execute(
+            "SELECT imdb_id, series_abb, season, runtime_min FROM episodes " +
+            f"WHERE imdb_id IN ({marks}) UNION ALL SELECT imdb_id, 'mov', 0, " +
+            f"runtime_min FROM mov WHERE imdb_id IN ({marks})", chunk + chunk))
+    return keys
+
+# weights of the search columns when ranking, titles first
+search_weights = "0, 0, 10.0, 1.0, 2.0, 2.0, 2.0"
+
+def readStats(conn):
+    """
+    Read the stats table, if built
+
+    Returns
+    -------
+    stats : {series_abb: {season: (n_eps, n_mins)}}, or None
+    """
+    if not tableExists(conn, "stats"):
+        return None
+    stats = dict()
+    for abb, season, n_eps, n_mins in conn.execute("SELECT * FROM stats"):
+        stats.setdefault(abb, dict())[season] = (n_eps, int(n_mins))
+    return stats
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Migrate a legacy or unnormalized treklist.db")
+    parser.add_argument("db", nargs="?", default="treklist.db")
+    args = parser.parse_args()
+    conn = sqlite3.connect(args.db)
+    if isLegacy(conn):
+        migrateCatalog(conn)
+    elif needsNormalizing(conn):
+        normalizeCatalog(conn)
+    elif not tableExists(conn, "search"):
+        buildSearch(conn)
+    else:
+        print(f"{args.db} is already up to date")
+    conn.close()
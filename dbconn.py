@@ -0,0 +1,60 @@
+#
+# TrekList - database connections
+#
+# Connection profiles for the app's two databases. The catalog is only
+# read by the app, so it is opened read-only and memory-mapped, with a
+# large page cache. The user log takes many small transactions, so it
+# runs in WAL mode with synchronous=NORMAL: commits skip the fsync, and
+# reads of the attached log never wait for the writer.
+#
+
+import os
+from   pathlib import Path
+import sqlite3
+
+catalog_pragmas = {"mmap_size":    256 * 1024**2,
+                   "cache_size":   -64 * 1024,  # KiB
+                   "temp_store":   "MEMORY",
+                  }
+log_pragmas     = {"busy_timeout": 5000,        # ms, set first so the
+                   "journal_mode": "WAL",       # switch to WAL waits too
+                   "synchronous":  "NORMAL",
+                  }
+
+# PRAGMA values cannot be bound as parameters, so only these are allowed
+pragma_words = {"WAL", "DELETE", "TRUNCATE", "MEMORY", "NORMAL", "FULL",
+                "OFF", "FILE", "DEFAULT"}
+
+def applyPragmas(conn, pragmas):
+    """
+    Set {name: value} PRAGMAs on a connection
+    """
+    for name, value in pragmas.items():
+        if not name.isidentifier():
+            raise ValueError(f"bad PRAGMA name: {name}")
+        if isinstance(value, str):
+            if value.upper() not in pragma_words:
+                raise ValueError(f"bad PRAGMA value: {value}")
+        else:
+            value = int(value)
+        conn.execute(f"PRAGMA {name} = {value}").fetchall()
+
+def openCatalog(filename, readonly=True, pragmas=catalog_pragmas, **kwargs):
+    """
+    Open treklist.db, read-only unless it has to be migrated or built
+    """
+    if readonly:
+        uri  = Path(os.path.abspath(filename)).as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, **kwargs)
+    else:
+        conn = sqlite3.connect(filename, **kwargs)
+    applyPragmas(conn, pragmas)
+    return conn
+
+def openLog(filename, pragmas=log_pragmas, **kwargs):
+    """
+    Open user.db for reading and writing
+    """
+    conn = sqlite3.connect(filename, **kwargs)
+    applyPragmas(conn, pragmas)
+    return conn
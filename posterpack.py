@@ -0,0 +1,139 @@
+#
+# TrekList - poster pack
+#
+# An optional, read-only alternative to the posters table: one file of
+# concatenated images, each stored once by content hash, and an index of
+# imdb_id -> (offset, length) sorted for binary search. The file is
+# memory-mapped, so posters are handed out as memoryview slices of the
+# map without being copied.
+#
+
+import hashlib
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+
+magic    = b"TLPACK01"
+header   = struct.Struct("<8sQQ")  # magic, n_entries, index offset
+entry    = struct.Struct("<16sQI") # imdb_id, image offset, image length
+id_bytes = 16
+
+def packKey(imdb_id):
+    """
+    An imdb_id as stored in the index, NUL padded
+    """
+    key = imdb_id.encode("ascii")
+    if len(key) > id_bytes:
+        raise ValueError(f"imdb_id too long for a poster pack: {imdb_id}")
+    return key.ljust(id_bytes, b"\0")
+
+class posterPack:
+    """
+    Poster Pack
+
+    Read access to a pack written by `writePack`. Lookups are a binary
+    search of the mapped index, so opening a pack reads nothing but its
+    header, and it can be shared by any number of threads.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        tag, self.n_entries, self.index = header.unpack_from(self.map, 0)
+        if tag != magic:
+            self.map.close()
+            raise ValueError(f"not a poster pack: {filename}")
+        self.view = memoryview(self.map)
+
+    def __len__(self):
+        return self.n_entries
+
+    def __contains__(self, imdb_id):
+        return self.find(imdb_id) is not None
+
+    def find(self, imdb_id):
+        """
+        Offset and length of a poster, or None
+        """
+        key = packKey(imdb_id)
+        lo, hi = 0, self.n_entries
+        while lo < hi:
+            mid = (lo + hi) // 2
+            pos = self.index + mid * entry.size
+            mid_key = self.map[pos:pos + id_bytes]
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                return entry.unpack_from(self.map, pos)[1:]
+        return None
+
+    def get(self, imdb_id):
+        """
+        A poster's image data, without copying it
+
+        Returns
+        -------
+        img_data : memoryview, or None if there is no poster
+        """
+        found = self.find(imdb_id)
+        if found is None:
+            return None
+        offset, length = found
+        return self.view[offset:offset + length]
+
+    def close(self):
+        """
+        Unmap the pack; slices handed out must have been released
+        """
+        self.view.release()
+        self.map.close()
+
+def writePack(filename, posters):
+    """
+    Write a pack from (imdb_id, img_data) pairs
+
+    Identical images are stored once. The pack is written next to
+    `filename` and moved into place once complete.
+
+    Returns
+    -------
+    stats : dict of entries, distinct images and bytes written
+    """
+    part   = filename + ".part"
+    blobs  = dict() # sha256: (offset, length)
+    index  = dict() # key: (offset, length)
+    with open(part, "wb") as f:
+        f.write(header.pack(magic, 0, 0))
+        for imdb_id, data in posters:
+            if data is None:
+                continue
+            digest = hashlib.sha256(data).digest()
+            if digest not in blobs:
+                blobs[digest] = (f.tell(), len(data))
+                f.write(data)
+            index[packKey(imdb_id)] = blobs[digest]
+        index_offset = f.tell()
+        for key in sorted(index):
+            f.write(entry.pack(key, *index[key]))
+        size = f.tell()
+        f.seek(0)
+        f.write(header.pack(magic, len(index), index_offset))
+    os.replace(part, filename)
+    return dict(entries=len(index), images=len(blobs), bytes=size)
+
+def packCatalog(conn, filename):
+    """
+    Write a pack of every poster in a catalog's posters table
+    """
+    return writePack(filename, conn.execute("SELECT imdb_id, poster FROM posters"))
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit("usage: python posterpack.py treklist.db posters.pack")
+    conn = sqlite3.connect(sys.argv[1])
+    print(packCatalog(conn, sys.argv[2]))
+    conn.close()
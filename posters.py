@@ -0,0 +1,250 @@
+#
+# TrekList - poster cache
+#
+# Decoded, scaled posters are kept in a bounded in-memory LRU, and
+# thumbnails pre-scaled to the table row heights are kept on disk so
+# that the full-size images rarely need decoding. Decoding can run on a
+# thread pool, in which case the cache signals when a poster is ready.
+#
+
+from   collections     import OrderedDict
+import glob
+import os
+from   PyQt6.QtGui     import QImage, QPixmap
+from   PyQt6.QtCore    import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
+import threading
+import zlib
+
+class posterTask(QRunnable):
+    """
+    Poster Task
+
+    Decodes and scales one poster into a QImage on a pool thread.
+    """
+    def __init__(self, cache, key, abb, generation):
+        super(QRunnable, self).__init__()
+        self.cache      = cache
+        self.key        = key
+        self.abb        = abb
+        self.generation = generation
+
+    def run(self):
+        # skip requests cancelled before they started
+        if self.generation != self.cache.generation:
+            self.cache.decoded.emit(self.key, None)
+            return
+        imdb_id, w, h = self.key
+        self.cache.decoded.emit(self.key, self.cache.decode(self.abb, imdb_id, w, h))
+
+class posterCache(QObject):
+    """
+    Poster Cache
+
+    `load(abb, imdb_id)` must return the raw image bytes of a poster, or
+    None; posters queued with `request` are loaded on pool threads. If
+    given, `version(abb, imdb_id)` returns a string that changes whenever
+    the poster does, such as its URL; thumbnails are stored per version,
+    so a replaced poster is never shown from an old thumbnail.
+    Posters are cached per (imdb_id, size bucket); buckets are the target
+    size rounded down to `bucket` pixels, so small resizes reuse the
+    same pixmap.
+    """
+    ready   = pyqtSignal(str)            # imdb_id
+    decoded = pyqtSignal(object, object) # key, QImage or None
+
+    def __init__(self, load, thumb_dir, thumb_hgts, max_bytes=64*1024**2,
+                 bucket=16, threads=None, version=None):
+        super(QObject, self).__init__()
+        self.load       = load
+        self.version    = version
+        self.thumb_dir  = thumb_dir
+        self.thumb_hgts = sorted(set(thumb_hgts))
+        self.max_bytes  = max_bytes
+        self.bucket     = bucket
+        self.lru        = OrderedDict() # (imdb_id, w, h): QPixmap
+        self.n_bytes    = 0
+        self.counters   = {"mem_hits": 0, "mem_misses": 0, "disk_hits": 0,
+                           "disk_misses": 0, "decodes": 0, "evictions": 0}
+        self.lock       = threading.Lock() # counters and thumbnail files
+
+        # decoder pool; newer requests get higher priority, since they
+        # come from the rows currently painted
+        self.pool       = QThreadPool()
+        if threads is not None:
+            self.pool.setMaxThreadCount(threads)
+        self.pending    = set()  # keys being decoded
+        self.seq        = 0      # request counter, used as priority
+        self.generation = 0      # bumped to cancel queued requests
+        self.decoded.connect(self.onDecoded)
+
+    def bucketSize(self, size):
+        """
+        Round a target size down to the bucket grid
+        """
+        b = self.bucket
+        return max(b, size.width() // b * b), max(b, size.height() // b * b)
+
+    def lookup(self, key):
+        pix_map = self.lru.get(key)
+        with self.lock:
+            if pix_map is None:
+                self.counters["mem_misses"] += 1
+            else:
+                self.counters["mem_hits"] += 1
+                self.lru.move_to_end(key)
+        return pix_map
+
+    def get(self, abb, imdb_id, size):
+        """
+        Get a poster scaled to fit `size`, decoding it right away
+
+        Returns
+        -------
+        pix_map : QPixmap (null if there is no poster)
+        """
+        w, h = self.bucketSize(size)
+        key  = (imdb_id, w, h)
+        pix_map = self.lookup(key)
+        if pix_map is None:
+            pix_map = QPixmap.fromImage(self.decode(abb, imdb_id, w, h))
+            self.insert(key, pix_map)
+        return pix_map
+
+    def request(self, abb, imdb_id, size):
+        """
+        Get a poster scaled to fit `size` if cached, else queue it
+
+        `ready` is emitted with the imdb_id once a queued poster is in
+        the cache.
+
+        Returns
+        -------
+        pix_map : QPixmap, or None while it is being decoded
+        """
+        w, h = self.bucketSize(size)
+        key  = (imdb_id, w, h)
+        pix_map = self.lookup(key)
+        if pix_map is None and key not in self.pending:
+            self.pending.add(key)
+            self.seq += 1
+            self.pool.start(posterTask(self, key, abb, self.generation),
+                            self.seq)
+        return pix_map
+
+    def cancelPending(self):
+        """
+        Drop queued requests that have not started yet, e.g. on scrolling
+
+        `ready` is still emitted for each dropped request, so that cells
+        left on screen repaint and request their poster again.
+        """
+        self.generation += 1
+
+    def onDecoded(self, key, img):
+        self.pending.discard(key)
+        if img is not None: # else cancelled
+            self.insert(key, QPixmap.fromImage(img))
+        self.ready.emit(key[0])
+
+    def decode(self, abb, imdb_id, w, h):
+        """
+        Decode from a thumbnail or the full poster, then scale
+
+        Returns
+        -------
+        img : QImage
+        """
+        img = self.loadImage(abb, imdb_id, h)
+        if not img.isNull():
+            img = img.scaled(w, h,
+                aspectRatioMode=Qt.AspectRatioMode.KeepAspectRatio,
+                transformMode=Qt.TransformationMode.SmoothTransformation)
+        return img
+
+    def insert(self, key, pix_map):
+        """
+        Add a pixmap to the LRU, evicting the oldest over budget
+        """
+        with self.lock:
+            if key in self.lru:
+                self.n_bytes -= self.pixmapBytes(self.lru.pop(key))
+            self.lru[key] = pix_map
+            self.n_bytes += self.pixmapBytes(pix_map)
+            while self.n_bytes > self.max_bytes and len(self.lru) > 1:
+                _, old = self.lru.popitem(last=False)
+                self.n_bytes -= self.pixmapBytes(old)
+                self.counters["evictions"] += 1
+
+    def pixmapBytes(self, pix_map):
+        return pix_map.width() * pix_map.height() * pix_map.depth() // 8
+
+    def thumbName(self, abb, imdb_id):
+        """
+        File name of a poster's thumbnails, tagged with a hash of its
+        version
+        """
+        version = None if self.version is None else self.version(abb, imdb_id)
+        if version is None:
+            return f"{imdb_id}.jpg"
+        return f"{imdb_id}-{zlib.crc32(version.encode()):08x}.jpg"
+
+    def thumbPath(self, name, thumb_hgt):
+        return os.path.join(self.thumb_dir, str(thumb_hgt), name)
+
+    def loadImage(self, abb, imdb_id, hgt):
+        """
+        Load the smallest stored image that is at least `hgt` tall
+
+        Thumbnails are written the first time a poster is decoded for a
+        height they cover.
+        """
+        thumb_hgt = next((t for t in self.thumb_hgts if t >= hgt), None)
+        if thumb_hgt is not None:
+            name = self.thumbName(abb, imdb_id)
+            img  = QImage(self.thumbPath(name, thumb_hgt))
+            with self.lock:
+                self.counters["disk_misses" if img.isNull() else "disk_hits"] += 1
+            if not img.isNull():
+                return img
+
+        # decode the full poster
+        img  = QImage()
+        data = self.load(abb, imdb_id)
+        if data is not None:
+            img.loadFromData(data)
+            with self.lock:
+                self.counters["decodes"] += 1
+        if thumb_hgt is not None and not img.isNull():
+            self.saveThumb(img, imdb_id, name, thumb_hgt)
+        return img
+
+    def saveThumb(self, img, imdb_id, name, thumb_hgt):
+        """
+        Store a thumbnail of `img` scaled to `thumb_hgt`, removing those
+        of older versions of the poster
+        """
+        if img.height() > thumb_hgt:
+            img = img.scaledToHeight(thumb_hgt,
+                Qt.TransformationMode.SmoothTransformation)
+        # write aside and rename, so readers never see a partial file
+        path = self.thumbPath(name, thumb_hgt)
+        tmp  = f"{path}.{threading.get_ident()}.tmp"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if img.save(tmp, "JPG", 90):
+            os.replace(tmp, path)
+        stem = glob.escape(imdb_id)
+        for pattern in (f"{stem}.jpg", f"{stem}-*.jpg"):
+            for old in glob.glob(self.thumbPath(pattern, thumb_hgt)):
+                if old != path:
+                    try:
+                        os.remove(old)
+                    except FileNotFoundError: # removed by another thread
+                        pass
+
+    def stats(self):
+        """
+        Cache counters plus current memory use
+        """
+        with self.lock:
+            return dict(self.counters, entries=len(self.lru),
+                        bytes=self.n_bytes, pending=len(self.pending))
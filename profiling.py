@@ -0,0 +1,158 @@
+#
+# TrekList - profiling
+#
+# Opt-in instrumentation for `treklist.py --profile`. Nothing is timed
+# unless a profiler is created and told what to wrap: methods are then
+# replaced by timing wrappers, and connections get an SQLite trace
+# callback. Without --profile the app runs the unwrapped code, so the
+# instrumentation costs nothing.
+#
+
+import functools
+import json
+import re
+import threading
+import time
+
+# literals in traced SQL, so that statements differing only by their
+# values are counted together
+sql_literal = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+class profiler:
+    """
+    Profiler
+
+    Collects timing spans per call path and phase ("startup" until
+    `setPhase` is called, then usually "interaction"). Each thread keeps
+    its own stack of open spans. SQLite only reports when a statement
+    starts, so a statement is timed until the next statement or span
+    boundary on its thread, which includes the time spent stepping
+    through its rows.
+    """
+    def __init__(self):
+        self.t0     = time.perf_counter()
+        self.phase  = "startup"
+        self.phases = {"startup": 0.}  # phase: start, in seconds
+        self.stats  = dict()           # (phase, path): [calls, total_s, max_s]
+        self.lock   = threading.Lock()
+        self.local  = threading.local()
+
+    def stack(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def add(self, path, dt):
+        with self.lock:
+            rec = self.stats.setdefault((self.phase, path), [0, 0., 0.])
+            rec[0] += 1
+            rec[1] += dt
+            rec[2]  = max(rec[2], dt)
+
+    def enter(self, name):
+        self.endStatement()
+        self.stack().append((name, time.perf_counter()))
+
+    def exit(self):
+        self.endStatement()
+        stack = self.stack()
+        name, t0 = stack.pop()
+        self.add(tuple(n for n, _ in stack) + (name,), time.perf_counter() - t0)
+
+    def wrap(self, cls, names):
+        """
+        Time calls to methods of a class, as "cls.name"
+        """
+        for name in names:
+            func = getattr(cls, name)
+            label = f"{cls.__name__}.{name}"
+
+            def timed(*args, _func=func, _label=label, **kwargs):
+                self.enter(_label)
+                try:
+                    return _func(*args, **kwargs)
+                finally:
+                    self.exit()
+
+            setattr(cls, name, functools.wraps(func)(timed))
+
+    def statement(self, sql):
+        """
+        SQLite trace callback
+        """
+        self.endStatement()
+        self.local.sql = ("sql: " + sql_literal.sub("?", " ".join(sql.split())),
+                          time.perf_counter())
+
+    def endStatement(self):
+        sql = getattr(self.local, "sql", None)
+        if sql is not None:
+            self.local.sql = None
+            stack = self.stack()
+            self.add(tuple(n for n, _ in stack) + (sql[0],),
+                     time.perf_counter() - sql[1])
+
+    def traceOpen(self, module, name):
+        """
+        Make a module's connection factory return traced connections
+        """
+        open_conn = getattr(module, name)
+
+        @functools.wraps(open_conn)
+        def traced(*args, **kwargs):
+            conn = open_conn(*args, **kwargs)
+            conn.set_trace_callback(self.statement)
+            return conn
+
+        setattr(module, name, traced)
+
+    def setPhase(self, phase):
+        self.endStatement()
+        self.phases[phase] = time.perf_counter() - self.t0
+        self.phase = phase
+
+    def report(self, counters=None):
+        """
+        Spans per phase, slowest first, with their counters
+
+        Returns
+        -------
+        report : dict
+        """
+        with self.lock:
+            stats = sorted(self.stats.items(), key=lambda item: -item[1][1])
+        report = dict(phases=self.phases, spans={phase: [] for phase in self.phases},
+                      counters=counters or dict())
+        for (phase, path), (calls, total, longest) in stats:
+            report["spans"][phase].append(dict(path=";".join(path), calls=calls,
+                total_ms=round(total * 1000, 3), max_ms=round(longest * 1000, 3)))
+        return report
+
+    def folded(self):
+        """
+        Folded stacks ("phase;outer;inner self_us" lines), as read by
+        flame graph tools
+        """
+        with self.lock:
+            stats = dict(self.stats)
+        children = dict()
+        for (phase, path), rec in stats.items():
+            if len(path) > 1:
+                key = (phase, path[:-1])
+                children[key] = children.get(key, 0.) + rec[1]
+        lines = []
+        for (phase, path), rec in sorted(stats.items()):
+            self_us = round((rec[1] - children.get((phase, path), 0.)) * 1e6)
+            if self_us > 0:
+                lines.append(f"{';'.join((phase,) + path)} {self_us}")
+        return lines
+
+    def dump(self, base, counters=None):
+        """
+        Write `base`.json and `base`.folded
+        """
+        with open(base + ".json", "w") as f:
+            json.dump(self.report(counters), f, indent=2)
+        with open(base + ".folded", "w") as f:
+            f.write("\n".join(self.folded()) + "\n")
@@ -0,0 +1,154 @@
+#
+# TrekList - settings
+#
+# Reads settings.yaml, checks it against the catalog and user log
+# columns, and compiles the table sections into render plans: one entry
+# per column with its renderer, width and position in the query record,
+# so that table models never look settings up while painting. Mistakes
+# such as a `movies:` section or an unknown header are reported when the
+# settings are read, not when a table is first shown.
+#
+
+import difflib
+import yaml
+from   yaml.loader import SafeLoader
+
+from   catalog import episode_cols, movie_cols
+from   userlog import log_hdrs
+
+# expected sections, with their keys
+table_keys = ['hdrs', 'names', 'widths']
+sections   = {"main_window": ['width', 'height'],
+              "series":      table_keys + ['row_hgt', 'sidebar_width'],
+              "movie":       table_keys + ['row_hgt'],
+              "user":        table_keys,
+             }
+flags      = ['prebuild_tabs']
+unused     = ['startup_window'] # accepted, but not read
+
+# headers each table section may show, besides posters
+table_cols = {"series": [col.split()[0] for col in episode_cols.split(", ")],
+              "movie":  [col.split()[0] for col in movie_cols.split(", ")],
+              "user":   log_hdrs,
+             }
+
+# columns every query needs, for row actions
+required   = {"series": ['imdb_id', 'season'],
+              "movie":  ['imdb_id'],
+             }
+
+class settingsError(ValueError):
+    pass
+
+def closest(key, known):
+    """
+    A ", did you mean ...?" hint for a misspelled key, or ""
+    """
+    match = difflib.get_close_matches(key, known, n=1)
+    return f", did you mean '{match[0]}'?" if match else ""
+
+def checkSettings(settings):
+    """
+    Make sure settings have every section and key the app reads, and
+    only headers that exist
+
+    Raises settingsError naming the first problem found.
+    """
+    if not isinstance(settings, dict):
+        raise settingsError("settings must be a mapping")
+    for key in settings:
+        if key not in sections and key not in flags + unused:
+            raise settingsError(f"unknown setting '{key}'" +
+                                closest(key, list(sections) + flags + unused))
+    for key in flags:
+        if key not in settings:
+            raise settingsError(f"missing setting '{key}'")
+    for name, keys in sections.items():
+        section = settings.get(name)
+        if not isinstance(section, dict):
+            raise settingsError(f"missing settings section '{name}'")
+        for key in keys:
+            if key not in section:
+                raise settingsError(f"missing setting '{name}.{key}'")
+        for key in section:
+            if key not in keys:
+                raise settingsError(f"unknown setting '{name}.{key}'" +
+                                    closest(key, keys))
+        if name not in table_cols:
+            continue
+        lens = {key: len(section[key]) for key in table_keys}
+        if len(set(lens.values())) != 1:
+            raise settingsError(f"'{name}' hdrs, names and widths differ " +
+                                f"in length: {lens}")
+        known = table_cols[name] + (["poster"] if name != "user" else [])
+        for hdr in section['hdrs']:
+            if hdr not in known:
+                raise settingsError(f"unknown column '{hdr}' in '{name}.hdrs'" +
+                                    closest(hdr, known))
+
+def readSettings(filename):
+    """
+    Read and check a settings file
+    """
+    with open(filename) as f:
+        settings = yaml.load(f, Loader=SafeLoader)
+    checkSettings(settings)
+    return settings
+
+class columnSpec:
+    """
+    Column Spec
+
+    One column of a table: `kind` selects how it is rendered ("poster",
+    "watched", "watch_date" or "text"), `fmt` formats its display value
+    and `pos` is its position in a query record (None for posters).
+    """
+    __slots__ = ['hdr', 'name', 'width', 'kind', 'fmt', 'pos', 'user']
+
+    def __init__(self, hdr, name, width, kind, fmt, pos, user):
+        self.hdr   = hdr
+        self.name  = name
+        self.width = width
+        self.kind  = kind
+        self.fmt   = fmt
+        self.pos   = pos
+        self.user  = user
+
+class renderPlan:
+    """
+    Render Plan
+
+    The columns of the series or movie tables, compiled from checked
+    settings. `cat_cols` and `usr_cols` are the catalog and user log
+    columns to query, in record order; `pos` maps each to its position.
+    """
+    def __init__(self, settings, key):
+        self.key     = key
+        self.row_hgt = settings[key]['row_hgt']
+        self.cat_cols = list(required[key])
+        for hdr in settings[key]['hdrs']:
+            if hdr != "poster" and hdr not in self.cat_cols:
+                self.cat_cols.append(hdr)
+        self.usr_cols = list(settings['user']['hdrs'])
+        self.pos      = {col: i for i, col in
+                         enumerate(self.cat_cols + self.usr_cols)}
+
+        # one spec per shown column, catalog columns first
+        self.cols = []
+        for section in (key, 'user'):
+            user = section == 'user'
+            for hdr, name, width in zip(*(settings[section][k] for k in table_keys)):
+                if hdr == "poster":
+                    kind, fmt = "poster", None
+                elif user and hdr == "watched":
+                    kind, fmt = "watched", None
+                elif user and hdr == "last_watched":
+                    kind, fmt = "watch_date", None
+                elif hdr in ("season", "episode"):
+                    kind, fmt = "text", int
+                else:
+                    kind, fmt = "text", str
+                pos = None if kind == "poster" else self.pos[hdr]
+                self.cols.append(columnSpec(hdr, name, width, kind, fmt, pos, user))
+        self.n_cat   = sum(not col.user for col in self.cols)
+        self.posters = [c for c, col in enumerate(self.cols) if col.kind == "poster"]
@@ -0,0 +1,7 @@
+import os
+import sys
+
+tests_dir = os.path.dirname(os.path.realpath(__file__))
+repo_dir  = os.path.dirname(tests_dir)
+sys.path.insert(0, os.path.join(repo_dir, "bench"))
+sys.path.insert(0, repo_dir)
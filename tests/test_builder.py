@@ -0,0 +1,153 @@
+#
+# TrekList - catalog builder tests
+#
+# Builds catalogs against the local mock OMDb server in bench/.
+#
+
+import sqlite3
+import time
+from   types import SimpleNamespace
+
+import pytest
+
+import builder
+from   builder   import catalogBuilder, omdbClient, omdbError
+from   mock_omdb import mockOmdb
+
+series = {"s00": "tt7000000", "s01": "tt7000001"}
+movies = {"M00": "tt7100000", "M01": "tt7100001"}
+
+@pytest.fixture
+def mock(request):
+    kwargs = dict(seasons=2, episodes=4, latency=0., fail_rate=0.)
+    kwargs.update(getattr(request, "param", dict()))
+    mock = mockOmdb(series, movies, **kwargs).start()
+    yield mock
+    mock.stop()
+
+def makeClient(mock, **kwargs):
+    kwargs = dict(dict(rate=1000., burst=8, workers=4, backoff=0.001), **kwargs)
+    return omdbClient("mock", mock.url, **kwargs)
+
+def build(conn, client, **kwargs):
+    cat = catalogBuilder(conn, client, workers=4, log=lambda msg: None, **kwargs)
+    cat.build(series, movies, extras=dict())
+    return cat
+
+def fakeSleep(monkeypatch, sleep):
+    """
+    Replace the builder's sleeps only; other threads keep the real one
+    """
+    monkeypatch.setattr(builder, "time", SimpleNamespace(
+        monotonic=time.monotonic, sleep=sleep))
+
+def count(conn, table):
+    return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+@pytest.mark.parametrize("mock", [dict(fail_rate=0.2, seed=1)], indirect=True)
+def test_build_complete_despite_failures(mock, tmp_path):
+    conn   = sqlite3.connect(tmp_path / "treklist.db")
+    client = makeClient(mock)
+    cat    = build(conn, client)
+    assert mock.n_failed > 0
+    assert client.n_retries >= mock.n_failed
+    assert cat.failed == []
+    assert count(conn, "series") == 2
+    assert count(conn, "episodes") == 2 * 2 * 4
+    assert count(conn, "mov") == 2
+    assert conn.execute("SELECT COUNT(*) FROM episodes WHERE imdb_id NOT IN " +
+                        "(SELECT imdb_id FROM posters)").fetchone()[0] == 0
+
+@pytest.mark.parametrize("mock", [dict(fail_status=429, fail_first=3),
+                                  dict(fail_status=503, fail_first=3)],
+                         indirect=True)
+def test_retry_backoff(mock, monkeypatch):
+    sleeps = []
+    fakeSleep(monkeypatch, sleeps.append)
+    client = makeClient(mock, backoff=0.5)
+    assert client.get(series["s00"])["title"] == "Series s00"
+    assert client.n_retries == 3
+
+    # exponential, with up to 100% jitter
+    assert len(sleeps) == 3
+    for attempt, wait in enumerate(sleeps):
+        assert 0.5 * 2**attempt <= wait <= 1.0 * 2**attempt
+
+@pytest.mark.parametrize("mock", [dict(fail_rate=1.)], indirect=True)
+def test_retries_exhausted(mock, monkeypatch):
+    fakeSleep(monkeypatch, lambda s: None)
+    client = makeClient(mock, retries=2)
+    with pytest.raises(omdbError):
+        client.get(series["s00"])
+    assert mock.n_requests == 3
+
+@pytest.mark.parametrize("mock", [dict(fail_rate=0.3, seed=2)], indirect=True)
+def test_failed_episodes_leave_season_open(mock, tmp_path, monkeypatch):
+    fakeSleep(monkeypatch, lambda s: None)
+    conn = sqlite3.connect(tmp_path / "treklist.db")
+    cat  = build(conn, makeClient(mock, retries=0))
+    kinds = {kind for kind, _, _ in cat.failed}
+    assert kinds and kinds <= {"series", "season", "episode", "movie", "poster"}
+    marked = {row[0] for row in conn.execute("SELECT key FROM sync_state")}
+    for kind, item, _ in cat.failed:
+        if kind == "episode":
+            assert f"season:{item[0]}:{item[2]}" not in marked
+
+def test_bad_records_fail_alone(mock, tmp_path):
+    broken  = "tt80001001" # s00 1x1
+    partial = "tt80001002" # s00 1x2
+    mock.records[broken] = b"<html>Service Unavailable</html>"
+    del mock.records[partial]["Title"]
+    conn = sqlite3.connect(tmp_path / "treklist.db")
+    cat  = build(conn, makeClient(mock))
+    assert sorted((kind, item[1]) for kind, item, _ in cat.failed) == \
+        [("episode", broken), ("episode", partial)]
+    assert count(conn, "episodes") == 2 * 2 * 4 - 2
+    assert count(conn, "mov") == 2
+
+def test_missing_episode_keeps_season_open(mock, tmp_path):
+    missing = mock.records.pop("tt80001003") # s00 1x3, Response=False
+    conn = sqlite3.connect(tmp_path / "treklist.db")
+    build(conn, makeClient(mock))
+    marked = {row[0] for row in conn.execute("SELECT key FROM sync_state")}
+    assert "season:s00:1" not in marked
+    assert "season:s00:2" in marked
+
+    # OMDb has it now: the next run fetches it
+    mock.records["tt80001003"] = missing
+    build(conn, makeClient(mock))
+    assert count(conn, "episodes") == 2 * 2 * 4
+    assert conn.execute("SELECT final FROM sync_state WHERE key = 'season:s00:1'"
+                        ).fetchone() == (1,)
+
+def test_incremental_resync(mock, tmp_path):
+    conn = sqlite3.connect(tmp_path / "treklist.db")
+    build(conn, makeClient(mock))
+    n_full = mock.n_requests
+
+    # unchanged: series records and the running seasons only
+    mock.n_requests = 0
+    client = makeClient(mock)
+    build(conn, client)
+    assert mock.n_requests == len(series) + len(series)
+    assert count(conn, "episodes") == 2 * 2 * 4
+
+    # a new season: its list, the now final season and its episodes
+    mock.addSeason("s01", episodes=3)
+    mock.n_requests = 0
+    build(conn, makeClient(mock))
+    assert count(conn, "episodes") == 2 * 2 * 4 + 3
+    assert conn.execute("SELECT COUNT(*) FROM episodes WHERE series_abb = 's01' " +
+                        "AND season = 3").fetchone()[0] == 3
+    assert mock.n_requests < n_full
+
+def test_max_age_refetches(mock, tmp_path):
+    conn = sqlite3.connect(tmp_path / "treklist.db")
+    build(conn, makeClient(mock))
+    conn.execute("UPDATE sync_state SET fetched = '2000-01-01T00:00:00+00:00'")
+    conn.commit()
+    conn.execute("UPDATE episodes SET title = 'stale'")
+    conn.commit()
+    build(conn, makeClient(mock), max_age=30)
+    assert conn.execute("SELECT COUNT(*) FROM episodes WHERE title = 'stale'"
+                        ).fetchone()[0] == 0
@@ -0,0 +1,179 @@
+#
+# TrekList - catalog migration tests
+#
+# Migrates and normalizes catalogs in the legacy one-table-per-series
+# layout, with raw OMDb values, as build_db.ipynb used to write them.
+#
+
+import sqlite3
+
+import pytest
+
+from   catalog import isLegacy, legacy_episode_cols, legacy_movie_cols
+from   catalog import legacy_series_cols, migrateCatalog, needsNormalizing
+from   catalog import normalizeCatalog, normalizeRow, readStats, tableColumns
+from   catalog import tableExists
+import synth
+
+episodes = [
+    # title, rated, released, season, episode, runtime, director, writer,
+    # actors, plot, poster_url, poster, imdb_rating, imdb_votes, imdb_id
+    ["The Man Trap", "TV-PG", "08 Sep 1966", "1", "1", "50 min", "Marc Daniels",
+     "George Clayton Johnson", "William Shatner", "A salt vampire.",
+     "http://img/tt0708469.jpg", b"tos1", "7.2", "3,947", "tt0708469"],
+    ["Charlie X", "TV-PG", "15 Sep 1966", "1", "2", "50 min", "Lawrence Dobkin",
+     "D.C. Fontana", "William Shatner", "A boy with powers.",
+     "N/A", None, "6.9", "3,522", "tt0708424"],
+    ["The Cage", "N/A", "N/A", "N/A", "N/A", "N/A", "Robert Butler",
+     "Gene Roddenberry", "Jeffrey Hunter", "The first pilot.",
+     "N/A", None, "N/A", "N/A", "tt0059753"],
+    ]
+movie = ["tmp", "Star Trek: The Motion Picture", "1979", "PG", "07 Dec 1979",
+         "132 min", "Robert Wise", "Alan Dean Foster", "William Shatner",
+         "V'Ger.", "http://img/tt0079945.jpg", b"tmp", "64", "6.4", "94,041",
+         "N/A", "tt0079945"]
+
+def legacyCatalog(filename, movies=True):
+    """
+    Write a small legacy catalog, optionally without a movie table
+    """
+    conn = sqlite3.connect(filename)
+    conn.execute(f"CREATE TABLE series ({legacy_series_cols})")
+    conn.execute("INSERT INTO series VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        ["tos", "Star Trek", "tt0060028", "1966–1969", "3",
+         "http://img/tt0060028.jpg", b"tos", "TV-PG"])
+    conn.execute(f"CREATE TABLE tos ({legacy_episode_cols})")
+    conn.executemany("INSERT INTO tos VALUES " +
+                     "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", episodes)
+    if movies:
+        conn.execute(f"CREATE TABLE mov ({legacy_movie_cols})")
+        conn.execute("INSERT INTO mov VALUES " +
+                     "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", movie)
+    conn.commit()
+    return conn
+
+def quiet(msg):
+    pass
+
+def row(conn, table, imdb_id, cols):
+    return conn.execute(f"SELECT {', '.join(cols)} FROM {table} WHERE imdb_id = ?",
+                        (imdb_id,)).fetchone()
+
+def test_migrate_legacy(tmp_path):
+    conn = legacyCatalog(tmp_path / "treklist.db")
+    assert isLegacy(conn)
+    migrateCatalog(conn, log=quiet)
+
+    assert not isLegacy(conn) and not needsNormalizing(conn)
+    assert not tableExists(conn, "tos")
+    assert "poster" not in tableColumns(conn, "episodes")
+    assert conn.execute("SELECT COUNT(*) FROM episodes WHERE series_abb = 'tos'"
+                        ).fetchone()[0] == 3
+    assert conn.execute("SELECT COUNT(*) FROM mov").fetchone()[0] == 1
+    assert dict(conn.execute("SELECT imdb_id, poster FROM posters")) == \
+        {"tt0060028": b"tos", "tt0708469": b"tos1", "tt0079945": b"tmp"}
+
+    # typed values, with OMDb's N/A as NULL
+    assert row(conn, "episodes", "tt0708469",
+               ["season", "episode", "released", "runtime_min", "imdb_rating",
+                "imdb_votes"]) == (1, 1, "1966-09-08", 50, 7.2, 3947)
+    assert row(conn, "episodes", "tt0059753",
+               ["season", "episode", "released", "runtime_min", "rated",
+                "imdb_rating", "imdb_votes"]) == (None,) * 7
+    assert row(conn, "mov", "tt0079945",
+               ["released", "runtime_min", "metascore", "imdb_votes", "box_office"]
+               ) == ("1979-12-07", 132, 64, 94041, None)
+
+    # stats and search are built; the seasonless episode has a NULL season
+    assert readStats(conn)["tos"] == {1: (2, 100), None: (1, 0)}
+    assert readStats(conn)["mov"] == {None: (1, 132)}
+    assert conn.execute("SELECT imdb_id FROM search WHERE search MATCH 'vampire'"
+                        ).fetchall() == [("tt0708469",)]
+
+def test_migrate_without_movies(tmp_path):
+    conn = legacyCatalog(tmp_path / "treklist.db", movies=False)
+    migrateCatalog(conn, log=quiet)
+    assert conn.execute("SELECT COUNT(*) FROM episodes").fetchone()[0] == 3
+    assert conn.execute("SELECT COUNT(*) FROM mov").fetchone()[0] == 0
+    assert not tableExists(conn, "legacy_mov")
+
+def test_migrate_drops_duplicates(tmp_path):
+    conn = legacyCatalog(tmp_path / "treklist.db")
+    conn.execute("INSERT INTO tos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                 ["Duplicate"] + episodes[0][1:])
+    conn.commit()
+    migrateCatalog(conn, log=quiet)
+    assert row(conn, "episodes", "tt0708469", ["title"]) == ("The Man Trap",)
+
+def test_normalize_is_idempotent(tmp_path):
+    conn = legacyCatalog(tmp_path / "treklist.db")
+    migrateCatalog(conn, log=quiet)
+    before = conn.execute("SELECT * FROM episodes ORDER BY imdb_id").fetchall()
+    conn.execute("PRAGMA user_version = 0")
+    assert needsNormalizing(conn)
+    normalizeCatalog(conn, log=quiet)
+    assert conn.execute("SELECT * FROM episodes ORDER BY imdb_id").fetchall() == before
+
+@pytest.mark.parametrize("movies", [True, False])
+def test_migrate_reports(tmp_path, movies):
+    msgs = []
+    migrateCatalog(legacyCatalog(tmp_path / "treklist.db", movies), log=msgs.append)
+    assert msgs[-1] == "migrated 1 series tables, 3 episodes"
+
+def dump(conn):
+    """
+    Every table of a catalog, as {table: sorted rows}
+    """
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master " +
+                                             "WHERE type = 'table'")]
+    return {table: sorted(conn.execute(f"SELECT * FROM {table}"), key=repr)
+            for table in tables}
+
+def cols(legacy_cols):
+    """
+    Names of the legacy columns that are kept, i.e. all but the poster
+    """
+    return [col.split()[0] for col in legacy_cols.split(", ")
+            if not col.startswith("poster ")]
+
+def test_migrate_round_trip(tmp_path):
+    """
+    Every legacy record and poster survives migration, normalized, and
+    the catalog as it was is kept in treklist.db.bak
+    """
+    filename = str(tmp_path / "treklist.db")
+    synth.makeCatalog(filename, n_series=3, n_episodes=120, n_movies=4,
+                      poster_size=(4, 4), n_posters=8, legacy=True)
+    conn   = sqlite3.connect(filename)
+    legacy = dump(conn)
+    abbs   = [row[0] for row in legacy["series"]]
+    migrateCatalog(conn, log=quiet)
+
+    # the backup is the legacy catalog
+    bak = sqlite3.connect(filename + ".bak")
+    assert dump(bak) == legacy
+
+    def moved(new_sql, old_sql, cols, params=()):
+        new = conn.execute(new_sql.format(cols=", ".join(cols)), params).fetchall()
+        old = bak.execute(old_sql.format(cols=", ".join(cols))).fetchall()
+        assert [list(row) for row in new] == [normalizeRow(cols, row) for row in old]
+
+    for abb in abbs:
+        moved("SELECT {cols} FROM episodes WHERE series_abb = ? ORDER BY imdb_id",
+              f"SELECT {{cols}} FROM {abb} ORDER BY imdb_id",
+              cols(legacy_episode_cols), (abb,))
+    moved("SELECT {cols} FROM mov ORDER BY imdb_id",
+          "SELECT {cols} FROM mov ORDER BY imdb_id", cols(legacy_movie_cols))
+
+    # series records are copied as they are
+    series = ", ".join(cols(legacy_series_cols))
+    assert conn.execute(f"SELECT {series} FROM series ORDER BY imdb_id").fetchall() \
+        == bak.execute(f"SELECT {series} FROM series ORDER BY imdb_id").fetchall()
+
+    # posters, keyed by imdb_id
+    old = dict()
+    for table in ["series", "mov"] + abbs:
+        old.update(bak.execute(f"SELECT imdb_id, poster FROM {table} " +
+                               "WHERE poster IS NOT NULL"))
+    assert dict(conn.execute("SELECT imdb_id, poster FROM posters")) == old
+    bak.close()
@@ -0,0 +1,72 @@
+#
+# TrekList - command line tests
+#
+# Runs treklist_cli.py commands on a small synthetic catalog and log.
+#
+
+from   datetime import date
+import sqlite3
+
+import pytest
+
+import synth
+import treklist_cli
+
+@pytest.fixture
+def cli(tmp_path, capsys):
+    """
+    Run a command, returning its output lines
+    """
+    db_file, log_file = str(tmp_path / "treklist.db"), str(tmp_path / "user.db")
+    synth.makeCatalog(db_file, n_series=2, n_episodes=60, n_movies=2,
+                      poster_size=(4, 4), n_posters=2)
+    synth.makeUserLog(log_file, [], fill=0)
+
+    def run(*argv):
+        treklist_cli.main(["--db", db_file, "--log", log_file] + list(argv))
+        return capsys.readouterr().out.splitlines()
+
+    run.log_file = log_file
+    return run
+
+def episodes(cli, abb, n):
+    return [line.split("(")[1].split(",")[0] for line in cli("next", abb, "-n", str(n))]
+
+def test_mark_counts_each_id_once(cli):
+    ids = episodes(cli, "s00", 2)
+    assert cli("mark", ids[0], ids[0], ids[1]) == ["marked 2 watched"]
+    assert cli("mark", ids[0], ids[0]) == ["marked 0 watched, 1 already watched"]
+    assert cli("mark", ids[0], "--unwatched") == ["marked 1 unwatched"]
+
+def test_mark_unknown_id(cli):
+    with pytest.raises(SystemExit, match="not in the catalog: tt0000000"):
+        cli("mark", "tt0000000")
+
+def test_mark_season_and_status(cli):
+    assert cli("mark-season", "s00", "1") == ["marked 25 watched"]
+    assert cli("mark-season", "s00", "1") == ["marked 0 watched, 25 already watched"]
+    status = {line.split()[0]: line.split() for line in cli("status")}
+    assert status["s00"][4] == "25/30"
+    assert status["s01"][4] == "0/30"
+    assert status["mov"][2] == "0/2"
+    conn = sqlite3.connect(cli.log_file)
+    assert conn.execute("SELECT COUNT(*) FROM watch_events").fetchone()[0] == 25
+
+def test_most(cli):
+    assert cli("most") == ["nothing watched yet"]
+    ids = episodes(cli, "s01", 2)
+    cli("mark", *ids)
+    cli("mark", ids[1], "--unwatched")
+    cli("mark", ids[1])
+    most = cli("most", "-n", "1")
+    assert len(most) == 1
+    assert most[0].split()[:2] == ["2x", "s01"] and ids[1] in most[0]
+
+def test_most_undated(cli):
+    # a log from before the watch history, with an undated watched row
+    conn = sqlite3.connect(cli.log_file)
+    conn.execute("INSERT INTO log (imdb_id, watched) VALUES ('tt1000002', 1)")
+    conn.commit()
+    conn.close()
+    assert cli("most") == ["  1x s00  Episode 0 (tt1000002, last " +
+                           f"{date.today().isoformat()})"]
@@ -0,0 +1,70 @@
+#
+# TrekList - settings tests
+#
+# Checks of settings.yaml and variations on it with one mistake each,
+# and the render plans compiled from it.
+#
+
+import copy
+import os
+
+import pytest
+
+from   settings import checkSettings, readSettings, renderPlan, settingsError
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+@pytest.fixture
+def settings():
+    return readSettings(os.path.join(repo_dir, "settings.yaml"))
+
+def broken(settings, edit):
+    settings = copy.deepcopy(settings)
+    edit(settings)
+    return settings
+
+@pytest.mark.parametrize("edit, message", [
+    (lambda s: s.update(movies=s.pop("movie")),
+     "unknown setting 'movies', did you mean 'movie'?"),
+    (lambda s: s.pop("prebuild_tabs"), "missing setting 'prebuild_tabs'"),
+    (lambda s: s.pop("user"), "missing settings section 'user'"),
+    (lambda s: s["series"].pop("row_hgt"), "missing setting 'series.row_hgt'"),
+    (lambda s: s["movie"].update(row_height=10),
+     "unknown setting 'movie.row_height', did you mean 'row_hgt'?"),
+    (lambda s: s["user"]["widths"].pop(), "'user' hdrs, names and widths differ"),
+    (lambda s: s["series"]["hdrs"].__setitem__(0, "seasons"),
+     "unknown column 'seasons' in 'series.hdrs', did you mean 'season'?"),
+    (lambda s: s["user"]["hdrs"].__setitem__(0, "poster"),
+     "unknown column 'poster' in 'user.hdrs'"),
+])
+def test_rejects(settings, edit, message):
+    with pytest.raises(settingsError) as err:
+        checkSettings(broken(settings, edit))
+    assert str(err.value).startswith(message)
+
+def test_rejects_non_mapping(tmp_path):
+    filename = tmp_path / "settings.yaml"
+    filename.write_text("- just\n- a list\n")
+    with pytest.raises(settingsError, match="must be a mapping"):
+        readSettings(str(filename))
+
+def test_unused_keys_optional(settings):
+    checkSettings(settings)
+    checkSettings(broken(settings, lambda s: s.pop("startup_window")))
+
+def test_render_plan(settings):
+    plan = renderPlan(settings, "series")
+    assert plan.cat_cols == ["imdb_id", "season", "episode", "title",
+                             "released", "plot", "runtime"]
+    assert plan.usr_cols == ["watched", "last_watched"]
+    assert [col.kind for col in plan.cols] == ["text"] * 3 + ["poster"] + \
+        ["text"] * 3 + ["watched", "watch_date"]
+    assert plan.posters == [3]
+    assert plan.n_cat == 7
+    assert plan.cols[0].fmt is int and plan.cols[0].pos == 1
+    assert plan.cols[-1].pos == plan.pos["last_watched"] == 8
+
+    # movies have no season, but still query imdb_id first
+    plan = renderPlan(settings, "movie")
+    assert plan.cat_cols[0] == "imdb_id"
+    assert plan.posters == [1]
@@ -0,0 +1,172 @@
+#
+# TrekList - user log tests
+#
+# Watch history triggers, rollups and backfill, on in-memory logs, and
+# export round trips and the write-behind writer on files.
+#
+
+import csv
+import json
+import sqlite3
+
+import pytest
+
+from   userlog import backfillHistory, compactRows, exportLog, log_cols
+from   userlog import log_hdrs, mostWatched, needsBackfill, prepareLog
+from   userlog import readLog, upsertLog, userLogWriter, watchEvents
+from   userlog import watchTotals
+
+keys = {"tt01": ("tng", 1, 45), "tt02": ("tng", 2, 44), "tt03": ("mov", 0, 110)}
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(f"CREATE TABLE log ({log_cols})")
+    prepareLog(conn)
+    yield conn
+    conn.close()
+
+def lookup(imdb_ids):
+    return {imdb_id: keys[imdb_id] for imdb_id in imdb_ids if imdb_id in keys}
+
+def test_rollups_follow_events(conn):
+    upsertLog(conn, {"tt01": {"watched": 1}, "tt03": {"watched": 1}},
+              watchEvents(["tt01", "tt03"], keys, ts="2026-03-01T20:00:00"))
+    upsertLog(conn, {}, watchEvents(["tt01"], keys, ts="2026-03-02T21:00:00"))
+    upsertLog(conn, {}, watchEvents(["tt02"], keys, ts="2026-03-02T22:00:00"))
+
+    assert watchTotals(conn) == {"tng": (3, 45 + 45 + 44), "mov": (1, 110)}
+    assert watchTotals(conn, since="2026-03-02") == {"tng": (2, 45 + 44)}
+    assert conn.execute("SELECT n_watches, mins FROM watch_days WHERE " +
+                        "series_abb = 'tng' AND season = 1 AND day = '2026-03-02'"
+                        ).fetchone() == (1, 45)
+    assert mostWatched(conn, 1) == [("tt01", 2, "2026-03-02T21:00:00")]
+
+def test_counts_keep_latest_ts(conn):
+    upsertLog(conn, {}, watchEvents(["tt01"], keys, ts="2026-03-02T21:00:00"))
+    upsertLog(conn, {}, watchEvents(["tt01"], keys, ts="2026-01-01T21:00:00"))
+    assert mostWatched(conn) == [("tt01", 2, "2026-03-02T21:00:00")]
+
+def test_unknown_keys_rolled_up_as_blank(conn):
+    upsertLog(conn, {}, watchEvents(["tt99"], keys, ts="2026-03-01T20:00:00"))
+    assert watchTotals(conn) == {"": (1, 0)}
+
+def test_backfill(conn):
+    conn.executemany("INSERT INTO log (imdb_id, watched, last_watched) " +
+                     "VALUES (?, ?, ?)", [("tt01", 1, "2025-05-04"),
+                                          ("tt02", 1, None),
+                                          ("tt03", 0, "2025-05-05")])
+    conn.commit()
+    assert needsBackfill(conn)
+    assert backfillHistory(conn, lookup) == 2
+    assert not needsBackfill(conn)
+
+    # dated rows count on their day, undated ones on no day
+    assert watchTotals(conn) == {"tng": (2, 45 + 44)}
+    assert watchTotals(conn, since="2000-01-01") == {"tng": (1, 45)}
+    assert all(ts is not None for _, _, ts in mostWatched(conn))
+
+    # rows that already have events are not given more
+    assert backfillHistory(conn, lookup) == 0
+    assert conn.execute("SELECT COUNT(*) FROM watch_events").fetchone()[0] == 2
+
+@pytest.fixture
+def log_file(tmp_path):
+    log_file = str(tmp_path / "user.db")
+    conn = sqlite3.connect(log_file)
+    conn.execute(f"CREATE TABLE log ({log_cols})")
+    conn.executemany("INSERT INTO log VALUES (?, ?, ?, ?, ?, ?, ?)", [
+        ("tt01", 1, "2025-05-04", "with, a comma", 0, 4, None),
+        ("tt02", 0, None, None, 1, None, "\U0001f596"),
+        ("tt03", 0, None, None, 0, None, None),
+        ("tt04", None, None, None, None, None, None)])
+    prepareLog(conn)
+    conn.close()
+    return log_file
+
+def readRows(conn):
+    return conn.execute(f"SELECT imdb_id, {', '.join(log_hdrs)} FROM log " +
+                        "ORDER BY imdb_id").fetchall()
+
+@pytest.mark.parametrize("ext", [".db", ".json", ".csv"])
+def test_export_round_trip(log_file, tmp_path, ext):
+    dest = str(tmp_path / ("export" + ext))
+    exportLog(log_file, dest)
+    assert not (tmp_path / ("export" + ext + ".part")).exists()
+
+    src = sqlite3.connect(log_file)
+    mem = readLog(dest)
+    assert list(compactRows(mem)) == list(compactRows(src))
+    if ext == ".db":
+        assert readRows(mem) == readRows(src)
+    else: # default rows are left out
+        assert [row[0] for row in readRows(mem)] == ["tt01", "tt02"]
+    src.close()
+    mem.close()
+
+def test_export_json_holds_only_changes(log_file, tmp_path):
+    dest = str(tmp_path / "export.json")
+    exportLog(log_file, dest)
+    with open(dest) as f:
+        assert json.load(f) == {"log": {
+            "tt01": {"watched": 1, "last_watched": "2025-05-04",
+                     "notes": "with, a comma", "rating": 4},
+            "tt02": {"favorite": 1, "emoji": "\U0001f596"}}}
+
+def test_export_csv_leaves_defaults_blank(log_file, tmp_path):
+    dest = str(tmp_path / "export.csv")
+    exportLog(log_file, dest)
+    with open(dest, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows == [["imdb_id"] + log_hdrs,
+                    ["tt01", "1", "2025-05-04", "with, a comma", "", "4", ""],
+                    ["tt02", "", "", "", "1", "", "\U0001f596"]]
+
+def test_read_rejects_other_files(tmp_path):
+    bad_json = tmp_path / "bad.json"
+    bad_json.write_text(json.dumps({"rows": []}))
+    with pytest.raises(ValueError, match="not a user log export"):
+        readLog(str(bad_json))
+
+    bad_db = str(tmp_path / "bad.db")
+    conn = sqlite3.connect(bad_db)
+    conn.execute("CREATE TABLE other (imdb_id TEXT)")
+    conn.close()
+    with pytest.raises(ValueError, match="holds no user log"):
+        readLog(bad_db)
+
+def test_writer_flush(log_file):
+    writer = userLogWriter(log_file, interval=60)
+    writer.put("tt05", watched=1)
+    writer.put("tt05", rating=3) # coalesced with the first
+    writer.putEvents(watchEvents(["tt05"], keys, ts="2026-03-01T20:00:00"))
+    assert writer.hasPending()
+    writer.flush()
+    assert not writer.hasPending()
+    assert (writer.n_written, writer.n_flushes) == (1, 1)
+
+    conn = sqlite3.connect(log_file)
+    assert conn.execute("SELECT watched, rating FROM log WHERE " +
+                        "imdb_id = 'tt05'").fetchone() == (1, 3)
+    assert conn.execute("SELECT imdb_id FROM watch_events").fetchall() == \
+        [("tt05",)]
+    conn.close()
+    writer.close()
+
+def test_writer_close_writes_pending(log_file):
+    writer = userLogWriter(log_file, interval=60)
+    writer.put("tt01", notes="first")
+    writer.putMany({"tt01": {"notes": "second"}, "tt06": {"watched": 1}})
+    writer.put("tt01", notes="third") # newest value wins
+    writer.close()
+    writer.close() # closing twice is harmless
+    with pytest.raises(RuntimeError, match="closed"):
+        writer.put("tt07", watched=1)
+    with pytest.raises(RuntimeError, match="closed"):
+        writer.putEvents([])
+
+    conn = sqlite3.connect(log_file)
+    assert conn.execute("SELECT imdb_id, notes, watched FROM log WHERE " +
+                        "imdb_id IN ('tt01', 'tt06') ORDER BY imdb_id"
+                        ).fetchall() == [("tt01", "third", 1), ("tt06", None, 1)]
+    conn.close()
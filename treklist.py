@@ -10,50 +10,69 @@
 #
 
 from   appdirs         import user_data_dir
-from   datetime        import datetime
-from   http.client     import PRECONDITION_REQUIRED
+import argparse
+from   collections     import OrderedDict
 import math
 import os
-import pandas          as     pd
 import platform
 from   PyQt6.QtWidgets import QWidget, QApplication, QLabel, QVBoxLayout
-from   PyQt6.QtWidgets import QMainWindow, QGridLayout, QDialog
-from   PyQt6.QtWidgets import QHBoxLayout, QSizePolicy, QTableWidgetItem
-from   PyQt6.QtWidgets import QTabWidget, QTableWidget
-from   PyQt6.QtWidgets import QCheckBox, QPushButton, QDateEdit
-from   PyQt6.QtWidgets import QMenuBar, QTextBrowser, QFileDialog
-from   PyQt6.QtGui     import QPixmap, QFont, QAction
-from   PyQt6.QtCore    import Qt, QDate
+from   PyQt6.QtWidgets import QMainWindow, QGridLayout
+from   PyQt6.QtWidgets import QHBoxLayout, QSizePolicy, QStyledItemDelegate
+from   PyQt6.QtWidgets import QTabWidget, QTableView
+from   PyQt6.QtWidgets import QPushButton, QDateEdit, QComboBox, QMenu
+from   PyQt6.QtWidgets import QMenuBar, QTextBrowser, QFileDialog, QLineEdit
+from   PyQt6.QtWidgets import QSpinBox, QDoubleSpinBox, QMessageBox
+from   PyQt6.QtWidgets import QProgressDialog
+from   PyQt6.QtGui     import QFont, QAction
+from   PyQt6.QtCore    import Qt, QDate, QAbstractTableModel, QModelIndex
+from   PyQt6.QtCore    import pyqtSignal, QTimer, QObject
 import shutil
-import sqlite3
 import sys
-import yaml
-from   yaml.loader     import SafeLoader
-
-# change working directory
+import threading
+from   catalog         import isLegacy, migrateCatalog, readStats, tableExists
+from   catalog         import needsNormalizing, normalizeCatalog, watchKeys
+from   catalog         import buildSearch, searchQuery, search_weights
+from   dbconn          import openCatalog, openLog
+from   posters         import posterCache
+from   posterpack      import posterPack
+from   settings        import readSettings, renderPlan, settingsError
+from   userlog         import userLogStore, userLogWriter, prepareLog
+from   userlog         import exportLog, readLog, resizePages
+from   userlog         import backfillHistory, needsBackfill, watchEvents
+
+# working directory
 try:                    # bundled path
    wd = sys._MEIPASS
 except AttributeError:  # python script
    wd = os.path.dirname(os.path.realpath(__file__))
 wd = f"{wd}/"
-os.chdir(wd)
 
 # determine operating system
 on_macos = platform.uname().system.startswith('Darw')
 
 # determine data directory - this is where the
 # user sql database will be stored
-data_dir = user_data_dir("TrekList") + "/"
-log_file = data_dir + "user.db"
-set_file = wd       + "settings.yaml"
-
-# make data directory and copy fresh user log
-if not os.path.exists(data_dir):
-    os.makedirs(data_dir)
-if not os.path.exists(log_file):
-    shutil.copyfile(f"{wd}/user.db", log_file)
-if not os.path.exists(set_file):
-    shutil.copyfile(f"{wd}/settings.yaml", set_file)
+data_dir  = user_data_dir("TrekList") + "/"
+log_file  = data_dir + "user.db"
+set_file  = wd       + "settings.yaml"
+db_file   = wd       + "treklist.db"
+pack_file = wd       + "posters.pack"
+
+def prepareFiles():
+    """
+    Change to the working directory, and make the data directory with a
+    fresh user log if needed
+
+    Run by `main` rather than at import, so that importing this module
+    has no side effects on the file system.
+    """
+    os.chdir(wd)
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+    if not os.path.exists(log_file):
+        shutil.copyfile(f"{wd}/user.db", log_file)
+    if not os.path.exists(set_file):
+        shutil.copyfile(f"{wd}/settings.yaml", set_file)
 
 def getMain(widget):
     """
@@ -67,6 +86,35 @@ def getMain(widget):
         return widget
     return getMain(parent) 
 
+class logTask(QObject):
+    """
+    Log Task
+
+    Runs a user log export or import on a worker thread. `func` is
+    called with the arguments and a `progress(done, total)` callback,
+    which is relayed by the `progress` signal; its result, or the
+    exception it raised, is sent by `finished`.
+    """
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(object)
+
+    def __init__(self, func, *args):
+        super(QObject, self).__init__()
+        self.func   = func
+        self.args   = args
+        self.thread = threading.Thread(target=self.run, name="logTask",
+                                       daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        try:
+            res = self.func(*self.args, progress=self.progress.emit)
+        except Exception as err:
+            res = err
+        self.finished.emit(res)
+
 class trekListApp(QMainWindow):
     """
     Main TrekList App Window
@@ -84,17 +132,53 @@ class trekListApp(QMainWindow):
         self.setWindowTitle('TrekList')
 
         # initialize treklist database
-        self.tl_filename = f"{wd}treklist.db"
-        self.tl_conn = sqlite3.connect(self.tl_filename)
-        self.tl_curs = self.tl_conn.cursor()
+        self.tl_filename = db_file
+        self.tl_conn = openCatalog(self.tl_filename)
+        legacy = isLegacy(self.tl_conn)
+        if legacy or needsNormalizing(self.tl_conn):
+            self.tl_conn.close()
+            conn = openCatalog(self.tl_filename, readonly=False, pragmas={})
+            log  = lambda msg: print(f"TrekList: {msg}", file=sys.stderr)
+            if legacy:
+                migrateCatalog(conn, log=log)
+            else:
+                normalizeCatalog(conn, log=log)
+            conn.close()
+            self.tl_conn = openCatalog(self.tl_filename)
 
         # initialize user database
         self.usr_filename = log_file
-        self.usr_conn = sqlite3.connect(self.usr_filename)
-        self.usr_curs = self.usr_conn.cursor()
+        self.usr_conn = openLog(self.usr_filename)
+        prepareLog(self.usr_conn)
+        if needsBackfill(self.usr_conn):
+            backfillHistory(self.usr_conn, self.catalogKeys)
+        self.usr_writer = userLogWriter(self.usr_filename)
+        self.log_task   = None # user log export or import in progress
+
+        # the log is also attached to the catalog, for joined queries
+        self.tl_conn.execute("ATTACH DATABASE ? AS usr", (self.usr_filename,))
+
+        # table filters, and the ranked hits of the current search
+        self.filter = dict(show="all", since=None, search=None, season=0,
+                           rating=0.)
+        self.tl_conn.execute("CREATE TEMP TABLE hits (imdb_id TEXT PRIMARY KEY, " +
+                             "series_abb TEXT, rank REAL)")
+        self.search_ready = tableExists(self.tl_conn, "search")
+
+        # initialize poster cache, with thumbnails for the table rows
+        self.poster_conns = threading.local()
+        self.poster_pack  = None
+        if os.path.exists(pack_file):
+            try:
+                self.poster_pack = posterPack(pack_file)
+            except (OSError, ValueError) as err:
+                print(f"TrekList: ignoring poster pack: {err}", file=sys.stderr)
+        self.poster_cache = posterCache(self.getPosterData, data_dir + "thumbs",
+            [plan.row_hgt for plan in self.plans.values()],
+            version=self.getPosterUrl)
 
         # query databases
-        self.dfs = dict()    # holds all dataframes
+        self.tbl_models = dict() # holds table models by abb
         self.querySeries()
         self.queryEpisodes()
         self.queryMovies()
@@ -108,6 +192,10 @@ class trekListApp(QMainWindow):
         wdw.setLayout(self.layout)
         self.setCentralWidget(wdw)
 
+        # filter bar
+        self.filter_bar = filterBarWidget(self)
+        self.layout.addWidget(self.filter_bar)
+
         # tab widget
         self.tab_widget = seriesTabsWidget(self)
         self.layout.addWidget(self.tab_widget)
@@ -155,45 +243,114 @@ class trekListApp(QMainWindow):
         cp = self.screen().availableGeometry().center()
         qr.moveCenter(cp)
 
-    def restart(self):
-        """
-        Restarts the application
-        """
-
-        # setup modal dialog
-        dlg_wgt = QDialog()
-        ok_btn  = QPushButton("Okay")
-        ok_btn.clicked.connect(dlg_wgt.close)
-        dlg_txt = QLabel()
-        dlg_txt.setText("TrekList will now restart.")
-        layout  = QVBoxLayout()
-        layout.addWidget(dlg_txt)
-        layout.addWidget(ok_btn)
-        dlg_wgt.setLayout(layout)
+    def closeEvent(self, event):
+        self.closeLog()
+        return super().closeEvent(event)
 
-        # execute the dialog widget
-        dlg_wgt.exec()
+    def closeLog(self):
+        """
+        Make sure every edit reaches the user log, and exports finish
 
-        # peform restart
-        python = sys.executable
-        os.execl(python, python, * sys.argv)
+        Run when the window closes and when the app quits, whichever
+        comes first.
+        """
+        if self.log_task is not None:
+            self.log_task.thread.join()
+        self.usr_writer.close()
 
     def saveLog(self):
         """
         Save the User Log to file
+
+        A .json or .csv file gets a compact export of the non-default
+        rows; anything else a full copy of user.db. Runs in the
+        background; user.db is not blocked meanwhile.
         """
-        save_pth = QFileDialog.getSaveFileName(self, 'Save User Log')
+        save_pth = QFileDialog.getSaveFileName(self, 'Save User Log', "",
+            "User Log (*.db);;Compact JSON (*.json);;Compact CSV (*.csv)")
         if save_pth[0]:
-            shutil.copyfile(self.usr_filename, save_pth[0])
+            self.usr_writer.flush()
+            self.runLogTask("Saving User Log", self.savedLog, exportLog,
+                            self.usr_filename, save_pth[0])
+
+    def savedLog(self, res):
+        if isinstance(res, Exception):
+            QMessageBox.warning(self, "Save User Log",
+                                f"Could not save the user log:\n{res}")
 
     def loadLog(self):
         """
         Load the User Log from file
+
+        The file is read and checked in the background, then replaces
+        the log in place (`reloadLog`).
         """
-        load_pth = QFileDialog.getOpenFileName(self, 'Load User Log')
+        load_pth = QFileDialog.getOpenFileName(self, 'Load User Log', "",
+            "User Log (*.db *.json *.csv);;All Files (*)")
         if load_pth[0]:
-            shutil.copyfile(load_pth[0], self.usr_filename)
-            self.restart()
+            self.runLogTask("Loading User Log", self.loadedLog, readLog,
+                            load_pth[0])
+
+    def loadedLog(self, res):
+        if isinstance(res, Exception):
+            QMessageBox.warning(self, "Load User Log",
+                                f"Could not load the user log:\n{res}")
+        else:
+            self.reloadLog(res)
+
+    def runLogTask(self, title, done, func, *args):
+        """
+        Run a user log export or import on a worker thread, with a
+        progress dialog, then call `done` with its result
+        """
+        if self.log_task is not None:
+            QMessageBox.information(self, title, "Please wait for the " +
+                                    "user log to finish saving or loading.")
+            return
+        dlg = QProgressDialog(title + "...", None, 0, 0, self)
+        dlg.setWindowTitle("TrekList")
+        dlg.setMinimumDuration(500)
+        def progress(n_done, total):
+            dlg.setMaximum(total)
+            dlg.setValue(n_done)
+        def finished(res):
+            self.log_task = None
+            dlg.close()
+            done(res)
+        self.log_task = logTask(func, *args)
+        self.log_task.progress.connect(progress)
+        self.log_task.finished.connect(finished)
+        self.log_task.start()
+
+    def reloadLog(self, log):
+        """
+        Replace the User Log with `log`, in place
+
+        `log` is a checked and prepared in-memory log from
+        `userlog.readLog`. It is copied over user.db in one step with the
+        SQLite backup API, so user.db is never left half written. Only
+        the user state is reloaded; the catalog and the poster caches are
+        left alone.
+        """
+        # a backup cannot change the page size of a WAL database
+        page_size = self.usr_conn.execute("PRAGMA page_size").fetchone()[0]
+        try:
+            if needsBackfill(log):
+                backfillHistory(log, self.catalogKeys)
+            log = resizePages(log, page_size)
+            self.usr_writer.close()
+            try:
+                log.backup(self.usr_conn)
+            finally:
+                self.usr_writer = userLogWriter(self.usr_filename)
+        finally:
+            log.close()
+
+        # reload the user state and repaint it
+        self.queryUserLog()
+        self.updateInfoBar()
+        for tbl_model in self.tbl_models.values():
+            tbl_model.reloadUser()
 
     def showGPL(self):
         """
@@ -215,142 +372,345 @@ class trekListApp(QMainWindow):
 
     def readSettings(self):
         """
-        Read the settings file
+        Read the settings file and compile the table render plans
         """
-        with open(set_file) as f:
-            self.set = yaml.load(f, Loader=SafeLoader)    
+        self.set   = readSettings(set_file)
+        self.plans = {key: renderPlan(self.set, key) for key in ("series", "movie")}
 
     def querySeries(self):
         """
         Query the Series SQL Database
         """
-        self.series             = dict()
-        self.dfs["series"]      = pd.read_sql_query("SELECT * FROM series", self.tl_conn)
-        self.series["titles"]   = self.dfs["series"]['title'].tolist()
-        self.series["abbs"]     = self.dfs["series"]['abb'].tolist()
-        self.series["years"]    = self.dfs["series"]['year'].tolist()
-        self.series["imdb_ids"] = self.dfs["series"]['imdb_id'].tolist()
-        self.n_series           = len(self.dfs["series"])
+        rows = self.tl_conn.execute("SELECT abb, title, imdb_id, year, " +
+                                    "total_seasons FROM series").fetchall()
+        self.series                  = dict()
+        self.series["abbs"]          = [row[0] for row in rows]
+        self.series["titles"]        = [row[1] for row in rows]
+        self.series["imdb_ids"]      = [row[2] for row in rows]
+        self.series["years"]         = [row[3] for row in rows]
+        self.series["total_seasons"] = [row[4] for row in rows]
+        self.n_series                = len(rows)
 
     def queryEpisodes(self):
         """
         Query the Episodes SQL Database
-        """
 
-        # initialize vars for info label
+        Only the per-season totals are read here; the rows themselves are
+        queried by each table's model.
+        """
+        self.stats  = readStats(self.tl_conn) or self.queryStats()
         self.n_eps  = 0
         self.n_mins = 0
-
-        # query all
-        for abb in self.dfs["series"]["abb"].tolist():
-
-            # query and determine num eps
-            self.dfs[abb] = pd.read_sql_query(f"SELECT * FROM {abb}",
-                self.tl_conn)
-            self.n_eps += len(self.dfs[abb])
-        
-            # determine num mins total
-            for i, row in self.dfs[abb].iterrows():
-                runtime = row['runtime']
-                if runtime != "N/A":
-                    self.n_mins += int(''.join(list(filter(str.isdigit,
-                        runtime))))
-
-            # sort by season, episode
-            self.dfs[abb].sort_values(by=['season', 'episode'], inplace=True)
+        for abb in self.series["abbs"]:
+            for n_eps, n_mins in self.seriesStats(abb).values():
+                self.n_eps  += n_eps
+                self.n_mins += n_mins
 
     def queryMovies(self):
         """
         Query the Movies SQL Database
         """
+        stats = self.seriesStats("mov").values()
+        self.n_movies = sum(n for n, _ in stats)
+        self.n_mins  += sum(m for _, m in stats)
+
+    def queryStats(self):
+        """
+        Compute the contents of the stats table, for catalogs without one
 
-        # query
-        self.dfs["mov"] = pd.read_sql_query(f"SELECT * FROM mov", self.tl_conn)
-        self.n_movies   = len(self.dfs["mov"])
-        for i, row in self.dfs["mov"].iterrows():
-            runtime = row['runtime']
-            if runtime != "N/A":
-                self.n_mins += int(''.join(list(filter(str.isdigit,
-                        runtime))))
+        Returns
+        -------
+        stats : {series_abb: {season: (n_eps, n_mins)}}
+        """
+        stats = dict()
+        for abb, season, n_eps, n_mins in self.tl_conn.execute(
+                "SELECT series_abb, season, COUNT(*), TOTAL(runtime_min) " +
+                "FROM episodes GROUP BY series_abb, season UNION ALL " +
+                "SELECT 'mov', NULL, COUNT(*), TOTAL(runtime_min) FROM mov"):
+            stats.setdefault(abb, dict())[season] = (n_eps, int(n_mins))
+        return stats
+
+    def seriesStats(self, abb):
+        """
+        Episodes and minutes per season of a series, or of the movies
+
+        Returns
+        -------
+        stats : {season: (n_eps, n_mins)}
+        """
+        return self.stats.get(abb, dict())
 
     def queryUserLog(self):
         """
         Query the User SQL Database
         """
-        self.dfs["usr"] = pd.read_sql_query(f"SELECT * FROM log", self.usr_conn)
+        self.usr_log = userLogStore(self.usr_conn)
 
-    def getUserItem(self, imdb_id, hdr):
+        # watched minutes, kept up to date by trackWatched
+        self.n_watched_mins = int(self.tl_conn.execute(
+            "SELECT TOTAL(runtime_min) FROM (SELECT imdb_id, runtime_min " +
+            "FROM episodes UNION ALL SELECT imdb_id, runtime_min FROM mov) " +
+            "JOIN usr.log USING (imdb_id) WHERE watched").fetchone()[0])
+
+    def catalogMinutes(self, imdb_ids):
+        """
+        Total runtime of some episodes and movies, in minutes
         """
-        Get User Log Item
+        imdb_ids = list(imdb_ids)
+        n_mins   = 0
+        for i in range(0, len(imdb_ids), 500):
+            chunk = imdb_ids[i:i+500]
+            marks = ", ".join("?" * len(chunk))
+            for table in ("episodes", "mov"):
+                n_mins += self.tl_conn.execute("SELECT TOTAL(runtime_min) " +
+                    f"FROM {table} WHERE imdb_id IN ({marks})", chunk).fetchone()[0]
+        return int(n_mins)
+
+    def filterSql(self, key):
         """
+        SQL for the current filter, for a catalog table aliased `c` joined
+        with the user log aliased `l`
 
-        def_values = {"watched": False,
-                      "last_watched": None,
-                     }
-        def_value  = def_values[hdr]
-        res = self.dfs["usr"][self.dfs["usr"]["imdb_id"] == imdb_id][hdr]
-        if len(res) > 0:
-            value = res.values[0]
-        else:
-            value = def_value
-        if value != value: # correct for possible nans
-            value = False
+        Returns
+        -------
+        join : str, joining the search hits (aliased `h`) when searching
+        where : str, to append to a WHERE clause
+        params : list
+        """
+        join, where, params = "", "", []
+        if self.filter["search"] is not None:
+            join = " JOIN temp.hits h USING (imdb_id)"
+        show = self.filter["show"]
+        if show == "unwatched":
+            where += " AND NOT COALESCE(l.watched, 0)"
+        elif show == "watched":
+            where += " AND l.watched"
+        elif show == "since":
+            where += " AND l.watched AND l.last_watched >= ?"
+            params.append(self.filter["since"])
+        if self.filter["season"] and key == "series":
+            where += " AND c.season = ?"
+            params.append(self.filter["season"])
+        if self.filter["rating"]:
+            where += " AND c.imdb_rating >= ?"
+            params.append(self.filter["rating"])
+        return join, where, params
+
+    def setFilter(self, **changes):
+        """
+        Change the table filters and requery the tables
 
-        return value
+        `show` is all, unwatched, watched, or since (the `since` date);
+        `search` is free text; `season` (0 for any) and `rating` (minimum
+        imdb rating, 0 for any) filter columns.
+        """
+        self.filter.update(changes)
+        if "search" in changes:
+            counts = self.searchCatalog(changes["search"])
+            self.tab_widget.showHits(counts)
+        for tbl_model in self.tbl_models.values():
+            tbl_model.select()
+
+        # make sure the current tab shows some of the hits
+        if "search" in changes and counts:
+            abb = self.tab_widget.currentAbb()
+            if not counts.get(abb):
+                self.tab_widget.showTab(self.tl_conn.execute("SELECT series_abb " +
+                    "FROM temp.hits ORDER BY rank LIMIT 1").fetchone()[0])
+
+    def searchCatalog(self, text):
+        """
+        Rank the episodes and movies matching `text` into the hits table
+
+        Returns
+        -------
+        counts : {series_abb: number of hits}, or None without a search
+        """
+        query = searchQuery(text or "")
+        self.filter["search"] = query
+        self.tl_conn.execute("DELETE FROM temp.hits")
+        if query is not None:
+            if not self.search_ready: # catalogs built without the index
+                buildSearch(self.tl_conn, "temp")
+                self.search_ready = True
+            self.tl_conn.execute("INSERT INTO temp.hits SELECT imdb_id, " +
+                f"series_abb, bm25(search, {search_weights}) FROM search " +
+                "WHERE search MATCH ?", (query,))
+        self.tl_conn.commit()
+        if query is None:
+            return None
+        return dict(self.tl_conn.execute("SELECT series_abb, COUNT(*) " +
+                                         "FROM temp.hits GROUP BY series_abb"))
 
     def setUserItem(self, imdb_id, **kwargs):
         """
         Set User Log Item in SQL database
-        """
 
-        # get info
-        df = pd.read_sql_query(f"SELECT * FROM log WHERE imdb_id == '{imdb_id}'", self.usr_conn)
-        key = list(kwargs.keys())[0]
-        val = kwargs[key]
-
-        # update the record
-        if len(df) > 0: # record exists
-            if isinstance(val, int):
-                cmd = f"UPDATE log SET {key} = {int(val)} WHERE imdb_id = '{imdb_id}'"
-            elif val == "NULL":
-                cmd = f"UPDATE log SET {key} = NULL WHERE imdb_id = '{imdb_id}'"
-            else:
-                cmd = f"UPDATE log SET {key} = '{val}' WHERE imdb_id = '{imdb_id}'"
-        else:           # record does not exist
+        The in-memory log is updated at once; the database write is
+        queued on the write-behind writer.
+        """
+        fields = dict()
+        for key, val in kwargs.items():
             if isinstance(val, int):
-                cmd = f"INSERT INTO log (imdb_id, {key}) VALUES('{imdb_id}', {int(val)})"
+                val = int(val)
             elif val == "NULL":
-                cmd = f"INSERT INTO log (imdb_id, {key}) VALUES('{imdb_id}', NULL)"   
-            else:
-                cmd = f"INSERT INTO log (imdb_id, {key}) VALUES('{imdb_id}', '{val}')"   
-        self.usr_conn.execute(cmd)
-        self.usr_conn.commit()
+                val = None
+            fields[key] = val
+            if key == "watched":
+                changed = self.trackWatched([imdb_id], val)
+                if val and changed:
+                    self.logWatches(changed)
+            self.usr_log.set(imdb_id, key, val)
+        self.usr_writer.put(imdb_id, **fields)
+        self.updateInfoBar()
+
+    def trackWatched(self, imdb_ids, watched):
+        """
+        Update the watched minutes for a change of watched state
+
+        Returns
+        -------
+        changed : list of the imdb_ids whose watched state changes
+        """
+        changed = [imdb_id for imdb_id in imdb_ids
+                   if bool(self.usr_log.get(imdb_id, 'watched')) != bool(watched)]
+        if changed:
+            mins = self.catalogMinutes(changed)
+            self.n_watched_mins += mins if watched else -mins
+        return changed
+
+    def markWatched(self, imdb_ids, watched=True):
+        """
+        Mark many episodes or movies watched or unwatched at once
+
+        Only rows whose watched state changes are written: marking
+        watched sets last_watched to today and logs a watch event for
+        each, so rows that were already watched keep their date and are
+        not counted again. All rows are written as one UPSERT
+        transaction, and only the user columns of the affected tables
+        are repainted.
+        """
+        fields = {"watched": int(watched)}
+        if watched:
+            fields["last_watched"] = QDate.currentDate().toString("yyyy-MM-dd")
+        edits = dict()
+        imdb_ids = self.trackWatched(list(imdb_ids), watched)
+        if watched and imdb_ids:
+            self.logWatches(imdb_ids)
+        for imdb_id in imdb_ids:
+            for key, val in fields.items():
+                self.usr_log.set(imdb_id, key, val)
+            edits[imdb_id] = dict(fields)
+        self.usr_writer.putMany(edits)
+        for tbl_model in self.tbl_models.values():
+            tbl_model.refreshUser(edits)
+        self.updateInfoBar()
+
+    def logWatches(self, imdb_ids):
+        """
+        Queue a watch event for each of some episodes or movies, marked
+        watched now
+        """
+        self.usr_writer.putEvents(watchEvents(imdb_ids, self.catalogKeys(imdb_ids)))
+
+    def catalogKeys(self, imdb_ids):
+        """
+        Series, season and minutes of some episodes and movies, for the
+        watch history
+        """
+        return watchKeys(self.tl_conn, imdb_ids)
+
+    def markSeason(self, abb, season, watched=True):
+        """
+        Mark every episode of a season watched or unwatched
+        """
+        self.markWatched([row[0] for row in self.tl_conn.execute("SELECT imdb_id " +
+            "FROM episodes WHERE series_abb = ? AND season = ?", (abb, season))],
+            watched)
+
+    def markSeries(self, abb, watched=True):
+        """
+        Mark every episode of a series (or every movie) watched or unwatched
+        """
+        if abb == "mov":
+            res = self.tl_conn.execute("SELECT imdb_id FROM mov")
+        else:
+            res = self.tl_conn.execute("SELECT imdb_id FROM episodes " +
+                                       "WHERE series_abb = ?", (abb,))
+        self.markWatched([row[0] for row in res], watched)
 
-    def getPoster(self, abb, imdb_id):
+    def getPosterData(self, abb, imdb_id):
         """
-        Retreive poster from database
+        Retreive raw poster image data from the poster pack if there is
+        one, else from the database
 
         Returns
         -------
-        pix_map : QPixMap
+        img_data : bytes or memoryview, or None if there is no poster
         """
-        df = self.dfs[abb]
-        img_data = df[df['imdb_id'] == imdb_id]['poster'].values[0]
-        pix_map  = QPixmap()
-        pix_map.loadFromData(img_data)
-        return pix_map
+        if self.poster_pack is not None:
+            img_data = self.poster_pack.get(imdb_id)
+            if img_data is not None:
+                return img_data
+
+        res = self.posterConn().execute("SELECT poster FROM posters " +
+            "WHERE imdb_id = ?", (imdb_id,)).fetchone()
+        return None if res is None else res[0]
+
+    def getPosterUrl(self, abb, imdb_id):
+        """
+        Retreive the URL a poster was downloaded from, which changes when
+        the builder stores a new poster
+
+        Returns
+        -------
+        url : str, or None if there is no poster
+        """
+        res = self.posterConn().execute("SELECT url FROM posters " +
+            "WHERE imdb_id = ?", (imdb_id,)).fetchone()
+        return None if res is None else res[0]
+
+    def posterConn(self):
+        """
+        Catalog connection of the calling thread; posters are also read
+        from decoding threads, which each need their own connection
+        """
+        conn = getattr(self.poster_conns, "conn", None)
+        if conn is None:
+            conn = self.poster_conns.conn = openCatalog(self.tl_filename)
+        return conn
+
+    def getScaledPoster(self, abb, imdb_id, size, wait=True):
+        """
+        Retreive poster scaled to fit size, through the poster cache
+
+        With `wait` False, the poster is decoded in the background if it
+        is not cached, and None is returned until `poster_cache.ready`.
+
+        Returns
+        -------
+        pix_map : QPixMap or None
+        """
+        if wait:
+            return self.poster_cache.get(abb, imdb_id, size)
+        return self.poster_cache.request(abb, imdb_id, size)
 
     def updateInfoBar(self):
         """
         Updates the info bar with series, eps, mins, etc.
         """
-        days     = math.floor(self.n_mins / 1440)
-        rem_mins = self.n_mins % 1440
-        hours    = math.floor(rem_mins / 60)
-        mins     = self.n_mins - (days*1440) - (hours*60)
+        def dhm(n_mins):
+            days     = math.floor(n_mins / 1440)
+            rem_mins = n_mins % 1440
+            hours    = math.floor(rem_mins / 60)
+            mins     = n_mins - (days*1440) - (hours*60)
+            return f"{days} days {hours} hours {mins} mins"
+
         info_txt = f"{self.n_series} series, {self.n_eps} episodes, " + \
                    f"{self.n_movies} movies, " + \
-                   f"{days} days {hours} hours {mins} mins runtime"
+                   f"{dhm(self.n_mins)} runtime, " + \
+                   f"{dhm(self.n_watched_mins)} watched, " + \
+                   f"{dhm(self.n_mins - self.n_watched_mins)} remaining"
         self.info_bar.setText(info_txt)
 
     def resizeEvent(self, event):
@@ -359,6 +719,9 @@ class trekListApp(QMainWindow):
 class seriesTabsWidget(QWidget):
     """
     Series Tabs Widget
+
+    Tabs are only built when first shown; the rest are optionally built
+    one at a time once the window is up (`prebuild_tabs` setting).
     """
     
     def __init__(self, parent):
@@ -368,46 +731,89 @@ class seriesTabsWidget(QWidget):
         #initialize tab screen
         self.tabs     = QTabWidget()
         self.tab_list = []
-        for i, abb in enumerate(parent.dfs["series"]["abb"]):
+        for i, abb in enumerate(parent.series["abbs"]):
             self.tab_list.append(QWidget())
             self.tabs.addTab(self.tab_list[i], abb.upper())
 
+            # set imdb_id for this tab
+            self.tab_list[i].imdb_id = parent.series["imdb_ids"][i]
+            self.tab_list[i].abb     = abb
+
+        # initialize movies tab
+        movies_tab = QWidget()
+        movies_tab.abb = "mov"
+        self.tab_list.append(movies_tab)
+        self.tabs.addTab(movies_tab, "MOV")
+        for tab in self.tab_list:
+            tab.built = False
+
         # add tabs to widget
         self.layout.addWidget(self.tabs)
         self.setLayout(self.layout)
 
-        # build each series tabs
-        for i, tab in enumerate(self.tab_list):
-
-            # setup layout
-            tab_layout  = QHBoxLayout()
-            tab.setLayout(tab_layout)
+        # build the current tab now, the others on demand
+        self.tabs.currentChanged.connect(self.buildTab)
+        self.buildTab(self.tabs.currentIndex())
+        if parent.set['prebuild_tabs']:
+            QTimer.singleShot(250, self.prebuildTabs)
 
-            # set imdb_id for this tab
-            tab.imdb_id = parent.dfs["series"]["imdb_id"][i]
-            tab.abb = parent.dfs["series"]["abb"][i]
+    def buildTab(self, i):
+        """
+        Build the contents of a tab, if not built yet
+        """
+        tab = self.tab_list[i]
+        if tab.built:
+            return
+        tab.built = True
 
-            # series side bar
-            series_widg = seriesSideBarWidget(tab.abb, tab.imdb_id)
-            tab_layout.addWidget(series_widg)
-            series_widg.populate()
+        # setup layout
+        tab_layout  = QHBoxLayout()
+        tab.setLayout(tab_layout)
 
-            # series table
-            series_tbl = seriesTableWidget(tab.abb)
-            tab_layout.addWidget(series_tbl, stretch=1)
-            series_tbl.populate()
+        # build movies tab
+        if tab.abb == "mov":
+            movies_tbl = moviesTableWidget()
+            tab_layout.addWidget(movies_tbl)
+            movies_tbl.populate()
+            return
+
+        # series side bar
+        series_widg = seriesSideBarWidget(tab.abb, tab.imdb_id)
+        tab_layout.addWidget(series_widg)
+        series_widg.populate()
+
+        # series table
+        series_tbl = seriesTableWidget(tab.abb)
+        tab_layout.addWidget(series_tbl, stretch=1)
+        series_tbl.populate()
+
+    def currentAbb(self):
+        return self.tab_list[self.tabs.currentIndex()].abb
+
+    def showTab(self, abb):
+        for i, tab in enumerate(self.tab_list):
+            if tab.abb == abb:
+                self.tabs.setCurrentIndex(i)
 
-        # initialize movies tab
-        movies_tab = QWidget()
-        self.tab_list.append(movies_tab)
-        self.tabs.addTab(movies_tab, "MOV")
-        tab_layout = QHBoxLayout()
-        movies_tab.setLayout(tab_layout)
+    def showHits(self, counts):
+        """
+        Show the number of search hits on each tab, or None for no search
+        """
+        for i, tab in enumerate(self.tab_list):
+            label = tab.abb.upper()
+            if counts is not None:
+                label += f" ({counts.get(tab.abb, 0)})"
+            self.tabs.setTabText(i, label)
 
-        # build movies tab
-        movies_tbl = moviesTableWidget()
-        tab_layout.addWidget(movies_tbl)
-        movies_tbl.populate()
+    def prebuildTabs(self):
+        """
+        Build the next unbuilt tab, then yield to the event loop
+        """
+        for i, tab in enumerate(self.tab_list):
+            if not tab.built:
+                self.buildTab(i)
+                QTimer.singleShot(0, self.prebuildTabs)
+                return
 
 class seriesSideBarWidget(QWidget):
     """
@@ -429,9 +835,9 @@ class seriesSideBarWidget(QWidget):
         self.setFixedWidth(getMain(self).set['series']['sidebar_width'])
 
         # add series title
-        df = getMain(self).dfs["series"]
-        df = df[df['imdb_id'] == self.imdb_id]
-        title = df['title'].values[0]
+        series = getMain(self).series
+        i = series["imdb_ids"].index(self.imdb_id)
+        title = series["titles"][i]
         title_label = QLabel(title)
         font = QFont()
         font.setBold(True)
@@ -440,14 +846,17 @@ class seriesSideBarWidget(QWidget):
         self.layout.addWidget(title_label)
 
         # add years
-        year = df['year'].values[0]
+        year = series["years"][i]
         year_label = QLabel(year)
         year_label.setAlignment(Qt.AlignmentFlag.AlignHCenter)
         self.layout.addWidget(year_label)
 
         # add seasons
-        seas = df['total_seasons'].values[0]
-        seas_label = QLabel(f"{seas} seasons")
+        seas = series["total_seasons"][i]
+        stats = getMain(self).seriesStats(self.abb).values()
+        hours = round(sum(m for _, m in stats) / 60)
+        seas_label = QLabel(f"{seas} seasons, {sum(n for n, _ in stats)} " +
+                            f"episodes, {hours} hours")
         seas_label.setAlignment(Qt.AlignmentFlag.AlignHCenter)
         self.layout.addWidget(seas_label)
 
@@ -456,109 +865,592 @@ class seriesSideBarWidget(QWidget):
         self.layout.addWidget(self.poster)
         self.poster.setPoster("series", self.imdb_id)
 
-class seriesTableWidget(QTableWidget):
+        # mark season/series buttons
+        mark_layout = QGridLayout()
+        self.layout.addLayout(mark_layout)
+        self.season_box = QComboBox()
+        seasons = [s for s in getMain(self).seriesStats(self.abb) if s is not None]
+        for season in sorted(seasons): # episodes without a season are left out
+            self.season_box.addItem(f"Season {season}", int(season))
+        mark_layout.addWidget(self.season_box, 0, 0, 1, 2)
+        buttons = [("Watched",          1, 0, self.markSeason,   True),
+                   ("Unwatched",        1, 1, self.markSeason,   False),
+                   ("Series Watched",   2, 0, self.markSeries,   True),
+                   ("Series Unwatched", 2, 1, self.markSeries,   False)]
+        for text, row, col, mark, watched in buttons:
+            btn = QPushButton(text)
+            btn.clicked.connect(lambda _, m=mark, w=watched: m(w))
+            mark_layout.addWidget(btn, row, col)
+
+    def markSeason(self, watched):
+        getMain(self).markSeason(self.abb, self.season_box.currentData(), watched)
+
+    def markSeries(self, watched):
+        getMain(self).markSeries(self.abb, watched)
+
+class catalogTableModel(QAbstractTableModel):
     """
-    Series Table Widget
+    Catalog Table Model
+
+    Serves one series (or the movies) plus the user log columns to a
+    table view. Rows come from a single query joining the catalog with
+    the attached user log (and the search hits), so filtering and sorting
+    are evaluated by SQLite.
+
+    Rows are fetched a page at a time as the view scrolls (`fetchMore`),
+    each page continuing from the sort key of the one before, and only
+    the `max_pages` most recently used pages stay in memory; evicted
+    pages are read back by their key range. Nothing is materialized per
+    cell; the delegates paint posters and dates and only create editors
+    on demand.
     """
-    def __init__(self, abb):
-        super(QTableWidget, self).__init__()
+    page_size = 100
+    max_pages = 10
+
+    def __init__(self, main, abb, key):
+        super(QAbstractTableModel, self).__init__()
+        self.main     = main
+        self.abb      = abb
+        self.key      = key
+        self.plan     = main.plans[key]
+        self.specs    = self.plan.cols
+
+        # query columns, by position in each record
+        self.pos      = self.plan.pos
+        self.n_cols   = len(self.pos)
+        self.cols     = [f"c.{col}" for col in self.plan.cat_cols] + \
+                        [f"l.{col}" for col in self.plan.usr_cols]
+        self.table    = "episodes" if key == "series" else "mov"
+        self.where    = "c.series_abb = ?" if key == "series" else "1"
+        self.params   = [abb] if key == "series" else []
+        self.sort_col = -1 # catalog (or search rank) order
+        self.sort_ord = Qt.SortOrder.AscendingOrder
+        self.select()
+
+    def select(self):
+        """
+        (Re)start the query with the current filter and sort order
+        """
+        join, where, params = self.main.filterSql(self.key)
+        self.terms  = self.orderTerms(ranked=bool(join))
+        keys        = ", ".join(term for term, _ in self.terms)
+        self.sql    = f"SELECT {', '.join(self.cols)}, {keys} FROM {self.table} c " + \
+                      f"LEFT JOIN usr.log l USING (imdb_id){join} " + \
+                      f"WHERE {self.where}{where}"
+        self.order  = ", ".join(term + (" DESC" if desc else "")
+                                for term, desc in self.terms)
+        self.fparams = self.params + params
+        self.beginResetModel()
+        self.n_rows = 0
+        self.at_end = False
+        self.bounds = []            # last sort key of each page
+        self.pages  = OrderedDict() # page: records, most recent last
+        self.rows   = dict()        # imdb_id: row, of the resident pages
+        self.endResetModel()
+        self.fetchMore()
+
+    def orderTerms(self, ranked):
+        """
+        Sort terms for the sort column, else the search rank, then the
+        catalog order, ending with the rowid so that keys are unique
+
+        Returns
+        -------
+        terms : list of (SQL expression, descending)
+        """
+        default = ["c.season", "c.episode"] if self.key == "series" else []
+        default = [(term, False) for term in default + ["c.rowid"]]
+        hdr = self.specs[self.sort_col].hdr if self.sort_col >= 0 else "poster"
+        if hdr == "poster":
+            return ([("h.rank", False)] if ranked else []) + default
+
+        # compare numbers as numbers; NULLs sort first, as -inf
+        terms = {"season":       ["c.season", "c.episode"],
+                 "runtime":      ["c.runtime_min"],
+                 "watched":      ["COALESCE(l.watched, 0)"],
+                 "last_watched": ["l.last_watched"],
+                }.get(hdr, [f"c.{hdr}"])
+        desc = self.sort_ord == Qt.SortOrder.DescendingOrder
+        return [(f"COALESCE({term}, -9e999)", desc) for term in terms] + default
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        if (column, order) != (self.sort_col, self.sort_ord):
+            self.sort_col, self.sort_ord = column, order
+            self.select()
+
+    def afterSql(self, key):
+        """
+        WHERE term selecting the rows after `key` in the sort order
+
+        Returns
+        -------
+        where : str
+        params : list
+        """
+        if len({desc for _, desc in self.terms}) == 1:
+            terms = ", ".join(term for term, _ in self.terms)
+            marks = ", ".join("?" * len(key))
+            op    = "<" if self.terms[0][1] else ">"
+            return f"({terms}) {op} ({marks})", list(key)
+
+        # mixed directions
+        ors, params = [], []
+        for i, (term, desc) in enumerate(self.terms):
+            ands = [f"{t} = ?" for t, _ in self.terms[:i]]
+            ands.append(f"{term} {'<' if desc else '>'} ?")
+            ors.append(" AND ".join(ands))
+            params += list(key[:i + 1])
+        return "((" + ") OR (".join(ors) + "))", params
+
+    def query(self, first, last, limit=None):
+        """
+        Records after key `first` up to and including key `last`
+        """
+        sql, params = self.sql, list(self.fparams)
+        if first is not None:
+            where, more = self.afterSql(first)
+            sql    += f" AND {where}"
+            params += more
+        if last is not None:
+            where, more = self.afterSql(last)
+            sql    += f" AND NOT {where}"
+            params += more
+        sql += f" ORDER BY {self.order}"
+        if limit is not None:
+            sql += f" LIMIT {limit}"
+
+        # pending edits are only written first if they can change which
+        # rows match or their order; the user columns themselves are
+        # read from the in-memory log, which is always current
+        if self.usesLog() and self.main.usr_writer.hasPending():
+            self.main.usr_writer.flush()
+        records = [list(row) for row in self.main.tl_conn.execute(sql, params)]
+        store   = self.main.usr_log.records
+        for record in records:
+            log_rec = store.get(record[0])
+            for hdr in self.plan.usr_cols:
+                record[self.pos[hdr]] = None if log_rec is None else \
+                                        getattr(log_rec, hdr)
+        return records
+
+    def usesLog(self):
+        """
+        True if the filter or sort order depends on the user log
+        """
+        return self.main.filter["show"] != "all" or \
+               (self.sort_col >= 0 and self.specs[self.sort_col].user)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.at_end
+
+    def fetchMore(self, parent=QModelIndex()):
+        """
+        Append the next page of rows
+        """
+        first   = self.bounds[-1] if self.bounds else None
+        records = self.query(first, None, self.page_size)
+        self.at_end = len(records) < self.page_size
+        if not records:
+            return
+        self.beginInsertRows(QModelIndex(), self.n_rows,
+                             self.n_rows + len(records) - 1)
+        self.bounds.append(tuple(records[-1][self.n_cols:]))
+        self.keepPage(len(self.bounds) - 1, records)
+        self.n_rows += len(records)
+        self.endInsertRows()
+
+    def keepPage(self, page, records):
+        """
+        Make a page resident, evicting the least recently used
+        """
+        self.pages[page] = records
+        for i, record in enumerate(records):
+            self.rows[record[0]] = page * self.page_size + i
+        while len(self.pages) > self.max_pages:
+            _, old = self.pages.popitem(last=False)
+            for record in old:
+                self.rows.pop(record[0], None)
+
+    def record(self, r):
+        """
+        The record of row `r`, reading its page back if evicted
+
+        Returns
+        -------
+        record : list, or None if the row is no longer in the results
+        """
+        page, i = divmod(r, self.page_size)
+        records = self.pages.get(page)
+        if records is None:
+            first   = self.bounds[page - 1] if page > 0 else None
+            records = self.query(first, self.bounds[page])
+            n_page  = min(self.page_size, self.n_rows - page * self.page_size)
+            if len(records) != n_page:
+                # rows left or joined the results meanwhile, start over
+                QTimer.singleShot(0, self.select)
+            self.keepPage(page, records)
+        else:
+            self.pages.move_to_end(page)
+        return records[i] if i < len(records) else None
+
+    def imdbId(self, r):
+        record = self.record(r)
+        return None if record is None else record[0]
+
+    def value(self, r, col):
+        record = self.record(r)
+        return None if record is None else record[self.pos[col]]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.n_rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.specs)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and \
+                role == Qt.ItemDataRole.DisplayRole:
+            return self.specs[section].name
+        return super().headerData(section, orientation, role)
+
+    def flags(self, index):
+        flags = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+        kind  = self.specs[index.column()].kind
+        if kind == "watched":
+            flags |= Qt.ItemFlag.ItemIsUserCheckable
+        elif kind == "watch_date":
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        spec = self.specs[index.column()]
+
+        # user info
+        if spec.kind == "watched":
+            if role == Qt.ItemDataRole.CheckStateRole:
+                record = self.record(index.row())
+                return Qt.CheckState.Checked if record and record[spec.pos] else \
+                       Qt.CheckState.Unchecked
+            return None
+        if spec.kind == "watch_date":
+            if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+                record = self.record(index.row())
+                return (record and record[spec.pos]) or ""
+            return None
+
+        # catalog info; posters are painted by posterDelegate
+        if role != Qt.ItemDataRole.DisplayRole or spec.kind == "poster":
+            return None
+        record = self.record(index.row())
+        value  = None if record is None else record[spec.pos]
+        return "" if value is None else spec.fmt(value)
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        spec   = self.specs[index.column()]
+        record = self.record(index.row())
+        if record is None:
+            return False
+        if spec.kind == "watched" and role == Qt.ItemDataRole.CheckStateRole:
+            checked = Qt.CheckState(value) == Qt.CheckState.Checked
+            self.main.setUserItem(record[0], watched=checked)
+            record[spec.pos] = int(checked)
+        elif spec.kind == "watch_date" and role == Qt.ItemDataRole.EditRole:
+            self.main.setUserItem(record[0], last_watched=value or "NULL")
+            record[spec.pos] = value or None
+        else:
+            return False
+        self.dataChanged.emit(index, index)
+        return True
+
+    def reloadUser(self):
+        """
+        Re-read the user columns after the whole log changed
+
+        If the filter or sort order depends on the log the query starts
+        over; otherwise the rows stay where they are, and the resident
+        pages are dropped to be read back as they are painted.
+        """
+        if self.usesLog():
+            self.select()
+            return
+        self.pages.clear()
+        self.rows.clear()
+        if self.n_rows:
+            self.dataChanged.emit(self.index(0, self.plan.n_cat),
+                                  self.index(self.n_rows - 1, len(self.specs) - 1))
+
+    def refreshUser(self, edits):
+        """
+        Apply {imdb_id: {hdr: value}} log edits to the resident rows
+        showing them; other rows are read after the edits are written
+        """
+        rows = []
+        for imdb_id, fields in edits.items():
+            r = self.rows.get(imdb_id)
+            if r is None:
+                continue
+            rows.append(r)
+            record = self.record(r)
+            for hdr, val in fields.items():
+                if hdr in self.pos:
+                    record[self.pos[hdr]] = val
+        if not rows:
+            return
+        self.dataChanged.emit(self.index(min(rows), self.plan.n_cat),
+                              self.index(max(rows), len(self.specs) - 1))
+
+class catalogTableWidget(QTableView):
+    """
+    Catalog Table Widget
+
+    Base of the series and movies tables; `key` selects the settings
+    section used for columns.
+    """
+    def __init__(self, abb, key):
+        super(QTableView, self).__init__()
         self.abb = abb
+        self.key = key
         self.setAlternatingRowColors(True)
-        self.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.setEditTriggers(QTableView.EditTrigger.DoubleClicked |
+                             QTableView.EditTrigger.SelectedClicked)
 
     def populate(self):
 
-        # get dataframe
-        self.df      = getMain(self).dfs[self.abb]
-        self.df_hdrs = self.df.keys().values
-        
+        # set up model
+        main = getMain(self)
+        self.tbl_model = catalogTableModel(main, self.abb, self.key)
+        self.setModel(self.tbl_model)
+        main.tbl_models[self.abb] = self.tbl_model
+
+        # swap in posters as they are decoded, visible rows first
+        main.poster_cache.ready.connect(self.posterReady)
+        self.verticalScrollBar().valueChanged.connect(
+            main.poster_cache.cancelPending)
+
         # set up columns/headers
-        self.setColumnCount(len(getMain(self).set['series']['hdrs']) + len(getMain(self).set['user']['hdrs']))
-        self.setHorizontalHeaderLabels(getMain(self).set['series']['names'] + getMain(self).set['user']['names'])
-        for c, hdr_width in enumerate(getMain(self).set['series']['widths'] + getMain(self).set['user']['widths']):
-            self.setColumnWidth(c, hdr_width)
+        plan = self.tbl_model.plan
+        for c, spec in enumerate(plan.cols):
+            self.setColumnWidth(c, spec.width)
         font = QFont()
         font.setBold(True)
         self.horizontalHeader().setFont(font)
-        
-        # append each row from series dataframes
-        for r, row in enumerate(self.df.iterrows()):
-            self.insertRow(r)
-
-            # insert series info
-            for c, hdr in enumerate(getMain(self).set['series']['hdrs']):
-                if hdr == "poster":
-                    self.setImage(r, c)
-                elif hdr in ("season", "episode"):
-                    item = QTableWidgetItem()
-                    item.setData(0, int(self.df[hdr][r]))
-                    self.setItem(r, c, item)
-                else:
-                    self.setItem(r, c, QTableWidgetItem(f"{self.df[hdr][r]}"))
-                    
-            # query user info
-            imdb_id = self.df["imdb_id"][r]
-
-            # insert user info
-            for c, hdr in enumerate(getMain(self).set['user']['hdrs']):
-                c += len(getMain(self).set['series']['hdrs'])
-
-                # watched checckbox
-                if hdr == "watched":
-                    checkbox = watchedCheckboxWidget(imdb_id)
-                    self.setCellWidget(r, c, checkbox)
-                    checkbox.setCheckedState()
-                elif hdr == "last_watched":
-                    date_widg  = watchedDateWidget(imdb_id)
-                    self.setCellWidget(r, c, date_widg)
-                    date_widg.loadWatchedDate()
-
-        self.verticalHeader().setDefaultSectionSize(getMain(self).set['series']['row_hgt'])
-
-        # sort
-        self.sortByColumn(1, Qt.SortOrder.AscendingOrder)
-        self.sortByColumn(0, Qt.SortOrder.AscendingOrder)
-
-    def setImage(self, row, col):
-        img_wdgt = resizingImageWidget()
-        self.setCellWidget(row, col, img_wdgt)
-        img_wdgt.setPoster(self.abb, self.df["imdb_id"][row])
-
-class watchedCheckboxWidget(QCheckBox):
-    """
-    Checkbox table widget
-    """
-
-    def __init__(self, imdb_id):
-        super(QCheckBox, self).__init__()
-        self.imdb_id = imdb_id
 
-        # tie action
-        self.clicked.connect(self.setTo)
+        # delegates
+        self.delegates = []
+        for c, spec in enumerate(plan.cols):
+            if spec.kind == "poster":
+                delegate = posterDelegate(self.abb, self)
+            elif spec.kind == "watch_date":
+                delegate = watchedDateDelegate(self)
+            else:
+                continue
+            self.delegates.append(delegate)
+            self.setItemDelegateForColumn(c, delegate)
+
+        self.verticalHeader().setDefaultSectionSize(plan.row_hgt)
+
+        # sorting is done by the model in SQL; no indicator until clicked
+        self.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.setSortingEnabled(True)
+
+    def posterReady(self, imdb_id):
+        r = self.tbl_model.rows.get(imdb_id)
+        if r is not None:
+            for c in self.tbl_model.plan.posters:
+                self.update(self.tbl_model.index(r, c))
+
+    def contextMenuEvent(self, event):
+        main    = getMain(self)
+        index   = self.indexAt(event.pos())
+        imdb_ids = [self.tbl_model.imdbId(r) for r in
+                    sorted({i.row() for i in self.selectionModel().selectedIndexes()})]
+        imdb_ids = [imdb_id for imdb_id in imdb_ids if imdb_id is not None]
+
+        # selected rows
+        menu = QMenu(self)
+        for text, watched in (("Mark Selected Watched", True),
+                              ("Mark Selected Unwatched", False)):
+            act = menu.addAction(text)
+            act.setEnabled(len(imdb_ids) > 0)
+            act.triggered.connect(lambda _, w=watched: main.markWatched(imdb_ids, w))
+
+        # season of the clicked row, if it has one
+        season = None
+        if self.key == "series" and index.isValid():
+            season = self.tbl_model.value(index.row(), 'season')
+        if season is not None:
+            season = int(season)
+            menu.addSeparator()
+            for text, watched in ((f"Mark Season {season} Watched", True),
+                                  (f"Mark Season {season} Unwatched", False)):
+                act = menu.addAction(text)
+                act.triggered.connect(lambda _, w=watched:
+                    main.markSeason(self.abb, season, w))
+
+        # whole table
+        menu.addSeparator()
+        what = "Series" if self.key == "series" else "All Movies"
+        for text, watched in ((f"Mark {what} Watched", True),
+                              (f"Mark {what} Unwatched", False)):
+            act = menu.addAction(text)
+            act.triggered.connect(lambda _, w=watched: main.markSeries(self.abb, w))
+        menu.exec(event.globalPos())
+
+class seriesTableWidget(catalogTableWidget):
+    """
+    Series Table Widget
+    """
+    def __init__(self, abb):
+        super().__init__(abb, "series")
+
+class moviesTableWidget(catalogTableWidget):
+    """
+    Movies Table Widget
+    """
+    def __init__(self):
+        super().__init__("mov", "movie")
+
+class filterBarWidget(QWidget):
+    """
+    Filter Bar Widget
+
+    Full-text search across all series and movies, plus filters on the
+    watched state, season and rating.
+    """
+    def __init__(self, parent):
+        super(QWidget, self).__init__(parent)
+        layout = QHBoxLayout()
+        layout.setContentsMargins(11, 0, 11, 0)
+        self.setLayout(layout)
+
+        # search, once typing pauses
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Search titles, plots and people")
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.setMinimumWidth(280)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(200)
+        self.search_timer.timeout.connect(self.searchChanged)
+        self.search_box.textChanged.connect(self.search_timer.start)
+        layout.addWidget(self.search_box)
+
+        # watched state
+        layout.addWidget(QLabel("Show"))
+        self.show_box = QComboBox()
+        for text, show in (("All", "all"), ("Unwatched", "unwatched"),
+                           ("Watched", "watched"), ("Watched Since", "since")):
+            self.show_box.addItem(text, show)
+        self.show_box.currentIndexChanged.connect(self.showChanged)
+        layout.addWidget(self.show_box)
+
+        # watched since date
+        self.since_wgt = QDateEdit(QDate.currentDate().addMonths(-1))
+        self.since_wgt.setDisplayFormat("yyyy-MM-dd")
+        self.since_wgt.setCalendarPopup(True)
+        self.since_wgt.setEnabled(False)
+        self.since_wgt.dateChanged.connect(self.showChanged)
+        layout.addWidget(self.since_wgt)
+
+        # season
+        layout.addWidget(QLabel("Season"))
+        self.season_box = QSpinBox()
+        self.season_box.setRange(0, 99)
+        self.season_box.setSpecialValueText("Any")
+        self.season_box.valueChanged.connect(
+            lambda season: getMain(self).setFilter(season=season))
+        layout.addWidget(self.season_box)
+
+        # minimum rating
+        layout.addWidget(QLabel("Rating ≥"))
+        self.rating_box = QDoubleSpinBox()
+        self.rating_box.setRange(0., 10.)
+        self.rating_box.setSingleStep(0.5)
+        self.rating_box.setDecimals(1)
+        self.rating_box.setSpecialValueText("Any")
+        self.rating_box.valueChanged.connect(
+            lambda rating: getMain(self).setFilter(rating=rating))
+        layout.addWidget(self.rating_box)
+        layout.addStretch()
+
+    def searchChanged(self):
+        getMain(self).setFilter(search=self.search_box.text())
+
+    def showChanged(self):
+        show = self.show_box.currentData()
+        self.since_wgt.setEnabled(show == "since")
+        getMain(self).setFilter(show=show,
+            since=self.since_wgt.date().toString("yyyy-MM-dd"))
+
+class posterDelegate(QStyledItemDelegate):
+    """
+    Poster Delegate
+
+    Paints the poster for each visible row, scaled to the cell.
+    """
+    def __init__(self, abb, parent):
+        super(QStyledItemDelegate, self).__init__(parent)
+        self.abb = abb
+
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)
+        imdb_id = index.model().imdbId(index.row())
+        if imdb_id is None:
+            return
+        pix_map = getMain(self.parent()).getScaledPoster(self.abb, imdb_id,
+            option.rect.size(), wait=False)
+
+        # placeholder until decoded
+        if pix_map is None:
+            painter.fillRect(option.rect.adjusted(4, 4, -4, -4),
+                option.palette.midlight())
+            return
+        x = option.rect.x() + (option.rect.width()  - pix_map.width())  // 2
+        y = option.rect.y() + (option.rect.height() - pix_map.height()) // 2
+        painter.drawPixmap(x, y, pix_map)
+
+class watchedDateDelegate(QStyledItemDelegate):
+    """
+    Watched Date Delegate
+
+    Paints the date as text; a watchedDateWidget is only created while
+    the cell is being edited.
+    """
+    def createEditor(self, parent, option, index):
+        editor = watchedDateWidget(parent)
+        editor.edited.connect(lambda: self.commitData.emit(editor))
+        return editor
+
+    def setEditorData(self, editor, index):
+        editor.loadWatchedDate(index.data(Qt.ItemDataRole.EditRole))
 
-    def setCheckedState(self):
-        checked = getMain(self).getUserItem(self.imdb_id, 'watched')
-        self.setChecked(checked)
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.watchedDate(), Qt.ItemDataRole.EditRole)
 
-    def setTo(self):
-        getMain(self).setUserItem(self.imdb_id, watched=self.isChecked())
+    def updateEditorGeometry(self, editor, option, index):
+        editor.setGeometry(option.rect)
 
 class watchedDateWidget(QWidget):
     """
     Watched Date Widget
     """
-    def __init__(self, imdb_id):
-        super(QWidget, self).__init__()
-        self.imdb_id = imdb_id
+    edited = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super(QWidget, self).__init__(parent)
         layout = QGridLayout()
         layout.setHorizontalSpacing(1)
         self.setLayout(layout)
+        self.setAutoFillBackground(True)
 
         # settings
         #self.setCalendarPopup(True)
         self.date_wgt = QDateEdit()
         self.date_wgt.setDisplayFormat("yyyy-MM-dd")
-        self.date_wgt.dateChanged.connect(self.setTo)
+        self.date_wgt.dateChanged.connect(self.edited)
         self.layout().addWidget(self.date_wgt, 0, 0, 1, 2)
 
         # today button
@@ -582,10 +1474,9 @@ class watchedDateWidget(QWidget):
     #    return super().mousePressEvent(event)
 
     # load watched date
-    def loadWatchedDate(self):
+    def loadWatchedDate(self, watched_date):
         self.date_wgt.blockSignals(True)
-        watched_date = getMain(self).getUserItem(self.imdb_id, 'last_watched')
-        if watched_date is None:
+        if not watched_date:
             self.loadNull()
         else:
             self.date_wgt.setDate(QDate.fromString(watched_date, "yyyy-MM-dd"))
@@ -595,13 +1486,21 @@ class watchedDateWidget(QWidget):
         self.date_wgt.setSpecialValueText(" ")
         self.date_wgt.setDate(QDate.fromString("01/01/0001", "dd/MM/yyyy"))
 
+    def watchedDate(self):
+        """
+        Current date string, or None when cleared
+        """
+        if self.date_wgt.date() == self.date_wgt.minimumDate():
+            return None
+        return self.date_wgt.date().toString("yyyy-MM-dd")
+
     # set to Null
     def setToNull(self):
         """
         Clear date value
         """
         self.loadNull()
-        getMain(self).setUserItem(self.imdb_id, last_watched="NULL")
+        self.edited.emit()
 
     def setToToday(self):
         """
@@ -609,72 +1508,6 @@ class watchedDateWidget(QWidget):
         """
         self.date_wgt.setDate(QDate.currentDate())
 
-    def setTo(self):
-        date_str = self.date_wgt.date().toString("yyyy-MM-dd")
-        getMain(self).setUserItem(self.imdb_id, last_watched=date_str)
-
-class moviesTableWidget(QTableWidget):
-    """
-    Movies Table Widget
-    """
-    def __init__(self):
-        super(QTableWidget, self).__init__()
-        self.setAlternatingRowColors(True)
-        self.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
-
-    def populate(self):
-
-        # get dataframe
-        self.df      = getMain(self).dfs["mov"]
-        self.df_hdrs = self.df.keys().values
-        
-        # set up columns/headers
-        self.setColumnCount(len(getMain(self).set['movies']['hdrs'])+len(getMain(self).set['user']['hdrs']))
-        self.setHorizontalHeaderLabels(getMain(self).set['movies']['names'] + getMain(self).set['user']['names'])
-        for c, hdr_width in enumerate(getMain(self).set['movies']['widths'] + getMain(self).set['user']['widths']):
-            self.setColumnWidth(c, hdr_width)
-        font = QFont()
-        font.setBold(True)
-        self.horizontalHeader().setFont(font)
-        
-        # append each row from series dataframes
-        for r, row in enumerate(self.df.iterrows()):
-            self.insertRow(r)
-            for c, hdr in enumerate(getMain(self).set['movies']['hdrs']):
-                # datetime_object = datetime.strptime('Jun 1 2005  1:33PM', '%b %d %Y %I:%M%p')
-                if hdr != "poster":
-                    if hdr == "released":
-                        dt_obj = datetime.strptime(self.df[hdr][r], "%d %b %Y")
-                        self.setItem(r, c, QTableWidgetItem(dt_obj.strftime("%Y-%m-%d")))
-                    else:
-                        self.setItem(r, c, QTableWidgetItem(f"{self.df[hdr][r]}"))
-                else:
-                    self.setImage(r, c)
-
-                        # query user info
-            imdb_id = self.df["imdb_id"][r]
-
-            # insert user info
-            for c, hdr in enumerate(getMain(self).set['user']['hdrs']):
-                c += len(getMain(self).set['movies']['hdrs'])
-
-                # watched checckbox
-                if hdr == "watched":
-                    checkbox = watchedCheckboxWidget(imdb_id)
-                    self.setCellWidget(r, c, checkbox)
-                    checkbox.setCheckedState()
-                elif hdr == "last_watched":
-                    date_widg  = watchedDateWidget(imdb_id)
-                    self.setCellWidget(r, c, date_widg)
-                    date_widg.loadWatchedDate()
-
-        self.verticalHeader().setDefaultSectionSize(getMain(self).set['movies']['row_hgt'])
-
-    def setImage(self, row, col):
-        img_wdgt = resizingImageWidget()
-        self.setCellWidget(row, col, img_wdgt)
-        img_wdgt.setPoster("mov", self.df["imdb_id"][row])
-
 class resizingImageWidget(QLabel):
     """
     Resizing Image Widget
@@ -685,12 +1518,13 @@ class resizingImageWidget(QLabel):
                            QSizePolicy.Policy.Expanding)
         
     def setPoster(self, abb, imdb_id):
-        self.pix_map = getMain(self).getPoster(abb,imdb_id)
+        # posters are only read once the widget is first shown
+        self.abb     = abb
+        self.imdb_id = imdb_id
 
     def resizeEvent(self, event):
-        pix_map = self.pix_map.scaled(self.size().width(), self.size().height(),
-            aspectRatioMode=Qt.AspectRatioMode.KeepAspectRatio,
-            transformMode=Qt.TransformationMode.SmoothTransformation)
+        pix_map = getMain(self).getScaledPoster(self.abb, self.imdb_id,
+            self.size())
         self.setPixmap(pix_map)
         self.adjustSize()
         return super().resizeEvent(event)
@@ -753,11 +1587,55 @@ class aboutWindow(QTextBrowser):
         # scroll to top
         self.verticalScrollBar().setValue(0)
 
+def startProfiler():
+    """
+    Instrument the startup and interaction hot paths, for --profile
+
+    Returns
+    -------
+    prof : profiling.profiler
+    """
+    import profiling
+    import userlog
+    prof = profiling.profiler()
+    prof.wrap(trekListApp, ["__init__", "querySeries", "queryEpisodes",
+        "queryMovies", "queryUserLog", "getPosterData", "getScaledPoster",
+        "setUserItem", "markWatched", "setFilter", "searchCatalog"])
+    prof.wrap(seriesTabsWidget,    ["buildTab"])
+    prof.wrap(seriesSideBarWidget, ["populate"])
+    prof.wrap(catalogTableWidget,  ["populate"])
+    prof.wrap(catalogTableModel,   ["select", "fetchMore", "query", "data"])
+    prof.wrap(resizingImageWidget, ["resizeEvent"])
+    prof.wrap(posterCache,         ["decode", "loadImage"]) # decode - load = scale
+    prof.traceOpen(sys.modules[__name__], "openCatalog")
+    prof.traceOpen(sys.modules[__name__], "openLog")
+    prof.traceOpen(userlog, "openLog")
+    return prof
+
 def main():
-    app = QApplication(sys.argv)
-    ex = trekListApp()
+    parser = argparse.ArgumentParser(description="TrekList")
+    parser.add_argument("--profile", nargs="?", const=data_dir + "profile",
+                        metavar="BASE", help="on exit, write a timing report " +
+                        "to BASE.json and folded stacks to BASE.folded")
+    args, qt_args = parser.parse_known_args()
+    prof = startProfiler() if args.profile else None
+    prepareFiles()
+    app = QApplication(sys.argv[:1] + qt_args)
+    try:
+        ex = trekListApp()
+    except settingsError as e:
+        sys.exit(f"{set_file}: {e}")
+    app.aboutToQuit.connect(ex.closeLog)
     ex.show()
-    sys.exit(app.exec())
+    if prof is not None:
+        QTimer.singleShot(0, lambda: prof.setPhase("interaction"))
+    res = app.exec()
+    if prof is not None:
+        writer = ex.usr_writer
+        prof.dump(args.profile, dict(posters=ex.poster_cache.stats(),
+            log_writer=dict(flushes=writer.n_flushes, written=writer.n_written,
+                            flush_s=round(writer.flush_time, 4))))
+    sys.exit(res)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -1,7 +1,13 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+import os
+
 block_cipher = None
 
+# profiling builds only: set TREKLIST_PROFILE_BUILD=1 to add the import
+# time hook that bench/bench_imports.py --bundle reads
+runtime_hooks = ['bench/importtime_hook.py'] if os.environ.get('TREKLIST_PROFILE_BUILD') else []
+
 a = Analysis(['treklist.py'],
              pathex=['.'],
              binaries=[],
@@ -11,11 +17,11 @@ a = Analysis(['treklist.py'],
                     ('user.db',     '.'),
                     ('settings.yaml', '.'),
                     ('lic/cc_by-nc_4.0','lic'),
-                   ],
+                   ] + ([('posters.pack', '.')] if os.path.exists('posters.pack') else []),
              hiddenimports=[],
              #hookspath=['hooks'],
-             runtime_hooks=[],
-             excludes=[],
+             runtime_hooks=runtime_hooks,
+             excludes=['pandas', 'numpy'],
              win_no_prefer_redirects=False,
              win_private_assemblies=False,
              cipher=block_cipher,
@@ -0,0 +1,232 @@
+#
+# TrekList - command line
+#
+# Check and update watch progress without starting the app: reads and
+# writes the same treklist.db and user.db with plain sqlite3, and never
+# imports Qt, so it starts in a few tens of milliseconds and can be
+# scripted. Changes made while the app is open are picked up when the
+# app next starts or loads the user log.
+#
+# usage: python treklist_cli.py status [--since YYYY-MM-DD]
+#        python treklist_cli.py next <abb> [-n N]
+#        python treklist_cli.py mark <imdb_id>... [--unwatched]
+#        python treklist_cli.py mark-season <abb> <season> [--unwatched]
+#        python treklist_cli.py most [-n N]
+#        python treklist_cli.py export <dest.db|.json|.csv>
+#
+
+from   appdirs  import user_data_dir
+import argparse
+from   datetime import date
+import os
+import shutil
+import sys
+
+from   catalog  import isLegacy, migrateCatalog, needsNormalizing
+from   catalog  import normalizeCatalog, watchKeys
+from   dbconn   import openCatalog, openLog
+from   userlog  import backfillHistory, exportLog, needsBackfill, prepareLog
+from   userlog  import mostWatched, upsertLog, watchEvents, watchTotals
+
+# the app's files
+wd       = os.path.dirname(os.path.realpath(__file__)) + "/"
+data_dir = user_data_dir("TrekList") + "/"
+log_file = data_dir + "user.db"
+db_file  = wd       + "treklist.db"
+
+class trekListCli:
+    """
+    TrekList Command Line
+
+    Holds the catalog, with the user log attached read-only as `usr`
+    for reads, and a log connection for writes.
+    """
+    def __init__(self, db_filename, log_filename):
+        self.log_filename = log_filename
+        if not os.path.exists(log_filename):
+            os.makedirs(os.path.dirname(os.path.abspath(log_filename)), exist_ok=True)
+            shutil.copyfile(wd + "user.db", log_filename)
+
+        # catalog, migrated first if the app has not done so yet
+        self.tl_conn = openCatalog(db_filename)
+        legacy = isLegacy(self.tl_conn)
+        if legacy or needsNormalizing(self.tl_conn):
+            self.tl_conn.close()
+            conn = openCatalog(db_filename, readonly=False, pragmas={})
+            if legacy:
+                migrateCatalog(conn, log=lambda msg: None)
+            else:
+                normalizeCatalog(conn, log=lambda msg: None)
+            conn.close()
+            self.tl_conn = openCatalog(db_filename)
+
+        # user log
+        self.usr_conn = openLog(log_filename)
+        prepareLog(self.usr_conn)
+        if needsBackfill(self.usr_conn):
+            backfillHistory(self.usr_conn, self.catalogKeys)
+        self.tl_conn.execute("ATTACH DATABASE ? AS usr", (log_filename,))
+
+    def close(self):
+        self.tl_conn.close()
+        self.usr_conn.close()
+
+    def catalogKeys(self, imdb_ids):
+        return watchKeys(self.tl_conn, imdb_ids)
+
+    def checkSeries(self, abb):
+        """
+        Exit with an error unless `abb` is a series, or "mov"
+        """
+        if abb != "mov" and self.tl_conn.execute("SELECT 1 FROM series " +
+                "WHERE abb = ?", (abb,)).fetchone() is None:
+            abbs = [row[0] for row in self.tl_conn.execute("SELECT abb FROM series")]
+            sys.exit(f"treklist: unknown series '{abb}' " +
+                     f"(one of {', '.join(abbs + ['mov'])})")
+
+    def status(self, since=None):
+        """
+        Print the episodes (or movies) and hours watched per series
+        """
+        rows = self.tl_conn.execute(
+            "SELECT s.abb, s.title, COUNT(c.imdb_id), TOTAL(l.watched), " +
+            "TOTAL(CASE WHEN l.watched THEN c.runtime_min END) FROM series s " +
+            "LEFT JOIN episodes c ON c.series_abb = s.abb " +
+            "LEFT JOIN usr.log l ON l.imdb_id = c.imdb_id " +
+            "GROUP BY s.abb ORDER BY s.rowid").fetchall()
+        rows += self.tl_conn.execute(
+            "SELECT 'mov', 'Movies', COUNT(*), TOTAL(l.watched), " +
+            "TOTAL(CASE WHEN l.watched THEN c.runtime_min END) FROM mov c " +
+            "LEFT JOIN usr.log l USING (imdb_id)").fetchall()
+        recent = watchTotals(self.usr_conn, since) if since else None
+        width  = max(len(title) for _, title, _, _, _ in rows)
+        for abb, title, n_eps, n_watched, n_mins in rows:
+            pct  = 100 * n_watched / n_eps if n_eps else 0
+            line = f"{abb:4} {title:{width}} {int(n_watched):5}/{n_eps:<5} " + \
+                   f"{pct:5.1f}% {n_mins / 60:7.1f} h"
+            if recent is not None:
+                line += f" {recent.get(abb, (0, 0))[1] / 60:7.1f} h since {since}"
+            print(line)
+
+    def next(self, abb, n=1):
+        """
+        Print the next `n` unwatched episodes (or movies) of a series
+        """
+        self.checkSeries(abb)
+        if abb == "mov":
+            rows = self.tl_conn.execute("SELECT abb, title, imdb_id, released " +
+                "FROM mov c LEFT JOIN usr.log l USING (imdb_id) " +
+                "WHERE NOT COALESCE(l.watched, 0) ORDER BY c.rowid LIMIT ?", (n,))
+        else:
+            rows = self.tl_conn.execute("SELECT printf('S%02dE%02d', season, " +
+                "episode), title, imdb_id, released FROM episodes c " +
+                "LEFT JOIN usr.log l USING (imdb_id) WHERE c.series_abb = ? " +
+                "AND NOT COALESCE(l.watched, 0) ORDER BY season, episode LIMIT ?",
+                (abb, n))
+        rows = rows.fetchall()
+        if not rows:
+            print(f"{abb}: all watched")
+        for code, title, imdb_id, released in rows:
+            print(f"{abb} {code} {title} ({imdb_id}, {released or 'unreleased'})")
+
+    def mark(self, imdb_ids, watched=True):
+        """
+        Mark episodes or movies watched (today) or unwatched, as the
+        app's bulk marking does: rows already in that state are skipped
+        """
+        imdb_ids = list(dict.fromkeys(imdb_ids)) # each counted once
+        keys    = self.catalogKeys(imdb_ids)
+        unknown = [imdb_id for imdb_id in imdb_ids if imdb_id not in keys]
+        if unknown:
+            sys.exit(f"treklist: not in the catalog: {', '.join(unknown)}")
+        seen = {row[0] for row in self.usr_conn.execute(
+            "SELECT imdb_id FROM log WHERE watched AND imdb_id IN " +
+            f"({', '.join('?' * len(imdb_ids))})", imdb_ids)}
+        changed = [imdb_id for imdb_id in imdb_ids if (imdb_id in seen) != watched]
+        fields = {"watched": int(watched)}
+        if watched:
+            fields["last_watched"] = date.today().isoformat()
+        events = watchEvents(changed, keys) if watched else []
+        upsertLog(self.usr_conn, {imdb_id: dict(fields) for imdb_id in changed},
+                  events)
+        state = 'watched' if watched else 'unwatched'
+        print(f"marked {len(changed)} {state}" +
+              (f", {len(imdb_ids) - len(changed)} already {state}"
+               if len(changed) < len(imdb_ids) else ""))
+
+    def markSeason(self, abb, season, watched=True):
+        """
+        Mark every episode of a season watched or unwatched
+        """
+        self.checkSeries(abb)
+        imdb_ids = [row[0] for row in self.tl_conn.execute("SELECT imdb_id " +
+            "FROM episodes WHERE series_abb = ? AND season = ?", (abb, season))]
+        if not imdb_ids:
+            sys.exit(f"treklist: {abb} has no season {season}")
+        self.mark(imdb_ids, watched)
+
+    def most(self, n=10):
+        """
+        Print the `n` most watched episodes and movies
+        """
+        rows = mostWatched(self.usr_conn, n)
+        if not rows:
+            print("nothing watched yet")
+            return
+        ids    = [imdb_id for imdb_id, _, _ in rows]
+        keys   = self.catalogKeys(ids)
+        marks  = ", ".join("?" * len(ids))
+        titles = dict(self.tl_conn.execute("SELECT imdb_id, title FROM episodes " +
+            f"WHERE imdb_id IN ({marks}) UNION ALL SELECT imdb_id, title FROM mov " +
+            f"WHERE imdb_id IN ({marks})", ids + ids).fetchall())
+        for imdb_id, n_watches, last_ts in rows:
+            abb = keys[imdb_id][0] if imdb_id in keys else "?"
+            last = last_ts[:10] if last_ts else "undated"
+            print(f"{n_watches:3}x {abb:4} {titles.get(imdb_id, imdb_id)} " +
+                  f"({imdb_id}, last {last})")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="treklist",
+        description="Check and update TrekList progress without the app")
+    parser.add_argument("--db",  default=db_file,  help="catalog (treklist.db)")
+    parser.add_argument("--log", default=log_file, help="user log (user.db)")
+    cmds = parser.add_subparsers(dest="cmd", required=True)
+    cmd  = cmds.add_parser("status", help="progress per series")
+    cmd.add_argument("--since", metavar="YYYY-MM-DD",
+                     help="also show the hours watched since a day")
+    cmd  = cmds.add_parser("next", help="next unwatched episodes of a series")
+    cmd.add_argument("abb", help="series, e.g. tng, or mov for the movies")
+    cmd.add_argument("-n", type=int, default=1)
+    cmd  = cmds.add_parser("mark", help="mark episodes or movies watched")
+    cmd.add_argument("imdb_ids", nargs="+", metavar="imdb_id")
+    cmd.add_argument("--unwatched", action="store_true")
+    cmd  = cmds.add_parser("mark-season", help="mark a season watched")
+    cmd.add_argument("abb")
+    cmd.add_argument("season", type=int)
+    cmd.add_argument("--unwatched", action="store_true")
+    cmd  = cmds.add_parser("most", help="most watched episodes and movies")
+    cmd.add_argument("-n", type=int, default=10)
+    cmd  = cmds.add_parser("export", help="save the user log")
+    cmd.add_argument("dest", help="a .db copy, or a compact .json or .csv export")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "export":
+        exportLog(args.log, args.dest)
+        return
+    cli = trekListCli(args.db, args.log)
+    try:
+        if args.cmd == "status":
+            cli.status(args.since)
+        elif args.cmd == "next":
+            cli.next(args.abb, args.n)
+        elif args.cmd == "mark":
+            cli.mark(args.imdb_ids, not args.unwatched)
+        elif args.cmd == "mark-season":
+            cli.markSeason(args.abb, args.season, not args.unwatched)
+        elif args.cmd == "most":
+            cli.most(args.n)
+    finally:
+        cli.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,506 @@
+#
+# TrekList - user log
+#
+# In-memory access to, and write-behind for, the `log` table of user.db,
+# its append-only watch history, and its export and import.
+#
+
+import csv
+from   datetime import datetime
+from   dbconn  import openLog
+import json
+import os
+from   pathlib import Path
+import sqlite3
+import sys
+import threading
+import time
+
+# columns of the log table, besides imdb_id
+log_hdrs   = ['watched', 'last_watched', 'notes', 'favorite', 'rating', 'emoji']
+def_values = {"watched":      False,
+              "last_watched": None,
+              "notes":        None,
+              "favorite":     False,
+              "rating":       None,
+              "emoji":        None,
+             }
+log_cols   = "imdb_id TEXT, watched BOOLEAN, last_watched DATE, notes TEXT, " + \
+             "favorite BOOLEAN, rating INTEGER, emoji TEXT"
+int_hdrs   = ['watched', 'favorite', 'rating'] # as read back from CSV
+
+# compact export formats, by file extension
+compact_fmts = [".json", ".csv"]
+
+# append-only watch history: one event per time an episode or movie is
+# marked watched, with its series, season and minutes copied from the
+# catalog. A trigger keeps two rollups up to date, watches and minutes
+# per (series_abb, season, day) and watches per imdb_id. Movies are
+# series 'mov', season 0; unknown keys are rolled up as '' or 0.
+event_cols  = "imdb_id TEXT NOT NULL, ts TEXT, day DATE, series_abb TEXT, " + \
+              "season INTEGER, mins INTEGER"
+history_sql = [
+    f"CREATE TABLE IF NOT EXISTS watch_events ({event_cols})",
+    "CREATE INDEX IF NOT EXISTS watch_events_id_ts ON watch_events (imdb_id, ts)",
+    "CREATE TABLE IF NOT EXISTS watch_days (series_abb TEXT, season INTEGER, " +
+    "day TEXT, n_watches INTEGER, mins INTEGER, " +
+    "PRIMARY KEY (series_abb, season, day)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS watch_counts (imdb_id TEXT PRIMARY KEY, " +
+    "n_watches INTEGER, last_ts TEXT) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS watch_counts_n ON watch_counts (n_watches)",
+    "CREATE TRIGGER IF NOT EXISTS watch_rollup AFTER INSERT ON watch_events " +
+    "BEGIN " +
+    "INSERT INTO watch_days VALUES (COALESCE(NEW.series_abb, ''), " +
+    "COALESCE(NEW.season, 0), COALESCE(NEW.day, ''), 1, COALESCE(NEW.mins, 0)) " +
+    "ON CONFLICT (series_abb, season, day) DO UPDATE SET n_watches = n_watches + 1, " +
+    "mins = mins + excluded.mins; " +
+    "INSERT INTO watch_counts VALUES (NEW.imdb_id, 1, NEW.ts) " +
+    "ON CONFLICT (imdb_id) DO UPDATE SET n_watches = n_watches + 1, " +
+    "last_ts = COALESCE(MAX(last_ts, excluded.last_ts), last_ts, excluded.last_ts); " +
+    "END",
+    ]
+
+# PRAGMA user_version of logs whose history has been backfilled
+history_version = 1
+
+class userLogRecord:
+    """
+    User Log Record
+
+    One row of the log table, without its imdb_id.
+    """
+    __slots__ = log_hdrs
+
+    def __init__(self, *values):
+        for hdr in log_hdrs:
+            setattr(self, hdr, None)
+        for hdr, value in zip(log_hdrs, values):
+            setattr(self, hdr, value)
+
+class userLogStore:
+    """
+    User Log Store
+
+    Holds the whole log table keyed by imdb_id for O(1) lookups. Every
+    write to the database must also go through `set` so that the two
+    stay consistent.
+    """
+    def __init__(self, conn):
+        self.load(conn)
+
+    def __contains__(self, imdb_id):
+        return imdb_id in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def load(self, conn):
+        """
+        (Re)load all records from the log table
+        """
+        self.records = dict()
+        cols = ", ".join(log_hdrs)
+        for row in conn.execute(f"SELECT imdb_id, {cols} FROM log"):
+            if row[0] not in self.records: # first record wins
+                self.records[row[0]] = userLogRecord(*row[1:])
+
+    def get(self, imdb_id, hdr):
+        """
+        Get a log value, or its default if not logged
+        """
+        record = self.records.get(imdb_id)
+        value  = None if record is None else getattr(record, hdr)
+        return def_values[hdr] if value is None else value
+
+    def set(self, imdb_id, hdr, value):
+        """
+        Set a log value; None clears it
+        """
+        record = self.records.get(imdb_id)
+        if record is None:
+            record = self.records[imdb_id] = userLogRecord()
+        setattr(record, hdr, value)
+
+def checkLog(conn):
+    """
+    Make sure a database holds a user log, before it replaces user.db
+
+    Raises ValueError if it is damaged or has no usable log table.
+    """
+    if conn.execute("PRAGMA integrity_check").fetchone()[0] != "ok":
+        raise ValueError("the user log is damaged")
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(log)")}
+    if not cols:
+        raise ValueError("the file holds no user log")
+    missing = ({"imdb_id"} | set(log_hdrs)) - cols
+    if missing:
+        raise ValueError(f"the user log lacks {', '.join(sorted(missing))}")
+
+def prepareLog(conn):
+    """
+    Make sure the log table holds one row per imdb_id
+
+    Older logs have no unique index on imdb_id, which UPSERTs need. Any
+    duplicate rows are dropped, keeping the first one as the store does.
+    """
+    conn.execute("DELETE FROM log WHERE rowid NOT IN " +
+                 "(SELECT MIN(rowid) FROM log GROUP BY imdb_id)")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS log_imdb_id ON log (imdb_id)")
+    for sql in history_sql:
+        conn.execute(sql)
+    conn.commit()
+
+def watchEvents(imdb_ids, keys, ts=None):
+    """
+    Watch event rows for imdb_ids watched at `ts` (now, by default)
+
+    `keys` gives {imdb_id: (series_abb, season, mins)}, as read from the
+    catalog by `catalog.watchKeys`.
+    """
+    ts = ts or datetime.now().isoformat(timespec="seconds")
+    return [(imdb_id, ts, ts[:10]) + tuple(keys.get(imdb_id, (None, None, None)))
+            for imdb_id in imdb_ids]
+
+def needsBackfill(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0] < history_version
+
+def backfillHistory(conn, keys):
+    """
+    Give every watched log row without watch events one, dated by its
+    last_watched, and mark the log as backfilled. Commits.
+
+    Rows without a last_watched are stamped with the time of the
+    backfill but given no day, so they count towards the totals and
+    watch counts, but towards no day.
+
+    `keys` is a function giving {imdb_id: (series_abb, season, mins)}
+    for a list of imdb_ids.
+
+    Returns
+    -------
+    n_events : int
+    """
+    rows = conn.execute("SELECT imdb_id, last_watched FROM log l WHERE watched " +
+                        "AND NOT EXISTS (SELECT 1 FROM watch_events e " +
+                        "WHERE e.imdb_id = l.imdb_id)").fetchall()
+    info = keys([imdb_id for imdb_id, _ in rows])
+    now  = datetime.now().isoformat(timespec="seconds")
+    with conn:
+        conn.executemany("INSERT INTO watch_events VALUES (?, ?, ?, ?, ?, ?)",
+            [(imdb_id, day or now, day) + tuple(info.get(imdb_id, (None, None, None)))
+             for imdb_id, day in rows])
+        conn.execute(f"PRAGMA user_version = {history_version}")
+    return len(rows)
+
+def watchTotals(conn, since=None):
+    """
+    Watches and minutes per series, from the rollups, optionally only
+    from day `since` (ISO date) on
+
+    Returns
+    -------
+    totals : {series_abb: (n_watches, mins)}
+    """
+    where, params = ("WHERE day >= ?", [since]) if since else ("", [])
+    return {abb: (n, mins) for abb, n, mins in conn.execute(
+        "SELECT series_abb, SUM(n_watches), SUM(mins) FROM watch_days " +
+        f"{where} GROUP BY series_abb", params)}
+
+def mostWatched(conn, n=10):
+    """
+    The `n` most watched episodes and movies, from the rollups
+
+    Returns
+    -------
+    rows : list of (imdb_id, n_watches, last_ts)
+    """
+    return conn.execute("SELECT imdb_id, n_watches, last_ts FROM watch_counts " +
+                        "ORDER BY n_watches DESC LIMIT ?", (n,)).fetchall()
+
+def upsertLog(conn, edits, events=()):
+    """
+    Write {imdb_id: {hdr: value}} edits to the log, and append watch
+    `events`, in one transaction
+
+    Edits are grouped by the set of columns they touch, so each group
+    is a single executemany UPSERT that leaves other columns alone.
+    """
+    groups = dict()
+    for imdb_id, fields in edits.items():
+        hdrs = tuple(sorted(fields))
+        for hdr in hdrs:
+            if hdr not in log_hdrs:
+                raise ValueError(f"unknown log column: {hdr}")
+        groups.setdefault(hdrs, []).append([imdb_id] + [fields[h] for h in hdrs])
+    with conn:
+        for hdrs, rows in groups.items():
+            cols  = ", ".join(hdrs)
+            marks = ", ".join("?" * (len(hdrs) + 1))
+            sets  = ", ".join(f"{hdr} = excluded.{hdr}" for hdr in hdrs)
+            conn.executemany(f"INSERT INTO log (imdb_id, {cols}) VALUES ({marks}) " +
+                             f"ON CONFLICT (imdb_id) DO UPDATE SET {sets}", rows)
+        conn.executemany("INSERT INTO watch_events VALUES (?, ?, ?, ?, ?, ?)", events)
+
+class userLogWriter:
+    """
+    User Log Writer
+
+    Write-behind queue for the log table and its watch history. Edits
+    are coalesced per imdb_id and written, with any watch events, by a
+    worker thread every `interval` seconds, as soon as `max_pending`
+    imdb_ids are waiting, or on `flush`/`close`.
+    """
+    def __init__(self, filename, interval=2.0, max_pending=500):
+        self.interval    = interval
+        self.max_pending = max_pending
+        self.pending     = dict()  # imdb_id: {hdr: value}
+        self.events      = []      # watch event rows
+        self.closing     = False
+        self.urgent      = False   # flush without waiting for the timer
+        self.n_written   = 0       # records written
+        self.n_flushes   = 0       # transactions committed
+        self.flush_time  = 0.      # seconds spent writing
+
+        # the connection is only used under io_lock
+        self.conn    = openLog(filename, check_same_thread=False)
+        self.lock    = threading.Lock()
+        self.io_lock = threading.Lock()
+        self.wake    = threading.Condition(self.lock)
+        self.thread  = threading.Thread(target=self.run, name="userLogWriter",
+                                        daemon=True)
+        self.thread.start()
+
+    def put(self, imdb_id, **fields):
+        """
+        Queue log values for an imdb_id
+        """
+        with self.lock:
+            if self.closing:
+                raise RuntimeError("user log writer is closed")
+            self.pending.setdefault(imdb_id, dict()).update(fields)
+            if len(self.pending) >= self.max_pending:
+                self.urgent = True
+                self.wake.notify()
+
+    def putMany(self, edits):
+        """
+        Queue {imdb_id: {hdr: value}} edits and write them right away
+
+        The edits are handed to the worker together, so they are
+        committed in a single transaction.
+        """
+        with self.lock:
+            if self.closing:
+                raise RuntimeError("user log writer is closed")
+            for imdb_id, fields in edits.items():
+                self.pending.setdefault(imdb_id, dict()).update(fields)
+            self.urgent = True
+            self.wake.notify()
+
+    def putEvents(self, events):
+        """
+        Queue watch event rows, written with the next edits
+        """
+        with self.lock:
+            if self.closing:
+                raise RuntimeError("user log writer is closed")
+            self.events.extend(events)
+
+    def hasPending(self):
+        with self.lock:
+            return bool(self.pending)
+
+    def flush(self):
+        """
+        Write all pending edits and wait until they are committed
+        """
+        with self.io_lock:
+            with self.lock:
+                edits, self.pending = self.pending, dict()
+                events, self.events = self.events, []
+            if not edits and not events:
+                return
+            t0 = time.perf_counter()
+            try:
+                upsertLog(self.conn, edits, events)
+            except sqlite3.Error:
+                # requeue, without clobbering anything newer
+                with self.lock:
+                    for imdb_id, fields in edits.items():
+                        fields.update(self.pending.get(imdb_id, dict()))
+                        self.pending[imdb_id] = fields
+                    self.events[:0] = events
+                raise
+            self.flush_time += time.perf_counter() - t0
+            self.n_written  += len(edits)
+            self.n_flushes  += 1
+
+    def run(self):
+        """
+        Worker thread loop
+        """
+        while True:
+            with self.lock:
+                if not self.closing and not self.urgent:
+                    self.wake.wait(self.interval)
+                closing     = self.closing
+                self.urgent = False
+            if closing:
+                return
+            try:
+                self.flush()
+            except sqlite3.Error as err: # retried on the next pass
+                print(f"TrekList: could not write user log: {err}",
+                      file=sys.stderr)
+
+    def close(self):
+        """
+        Stop the worker and write everything still pending
+        """
+        with self.lock:
+            if self.closing:
+                return
+            self.closing = True
+            self.wake.notify()
+        self.thread.join()
+        self.flush()
+        self.conn.close()
+
+def backupPages(src, dst, progress=None, pages=256):
+    """
+    Copy database `src` into `dst` with the SQLite backup API, `pages`
+    pages per step, calling `progress(done, total)` after each step
+
+    Writes to the source by other connections make the copy start over,
+    so the result is always a consistent snapshot.
+    """
+    def step(status, remaining, total):
+        if progress is not None:
+            progress(total - remaining, total)
+    src.backup(dst, pages=pages, progress=step)
+
+def compactRows(conn, progress=None):
+    """
+    Iterate over the log rows with any non-default value, as
+    (imdb_id, {hdr: value}) without the default values
+    """
+    terms = [f"COALESCE({hdr}, 0)" if def_values[hdr] is False else
+             f"{hdr} IS NOT NULL" for hdr in log_hdrs]
+    total = conn.execute("SELECT COUNT(*) FROM log").fetchone()[0]
+    rows  = conn.execute(f"SELECT imdb_id, {', '.join(log_hdrs)} FROM log " +
+                         f"WHERE {' OR '.join(terms)} ORDER BY imdb_id")
+    for i, row in enumerate(rows):
+        yield row[0], {hdr: value for hdr, value in zip(log_hdrs, row[1:])
+                       if value is not None and value != def_values[hdr]}
+        if progress is not None and i % 1000 == 999:
+            progress(i + 1, total)
+    if progress is not None:
+        progress(total, total)
+
+def exportLog(filename, dest, progress=None):
+    """
+    Export the log in user log `filename` to `dest`
+
+    A `dest` ending in .json or .csv gets only the rows that differ from
+    the defaults, and only their non-default values in JSON; anything
+    else gets a full copy of the database. The export is written next to
+    `dest` and moved into place once complete.
+    """
+    ext  = os.path.splitext(dest)[1].lower()
+    part = dest + ".part"
+    src  = sqlite3.connect(filename)
+    try:
+        if ext == ".json":
+            log = dict(compactRows(src, progress))
+            with open(part, "w") as f:
+                json.dump({"log": log}, f, separators=(",", ":"))
+        elif ext == ".csv":
+            with open(part, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["imdb_id"] + log_hdrs)
+                for imdb_id, fields in compactRows(src, progress):
+                    writer.writerow([imdb_id] + [fields.get(hdr, "")
+                                                 for hdr in log_hdrs])
+        else:
+            if os.path.exists(part):
+                os.remove(part)
+            dst = sqlite3.connect(part)
+            try:
+                backupPages(src, dst, progress)
+            finally:
+                dst.close()
+    finally:
+        src.close()
+    os.replace(part, dest)
+
+def readLog(filename, progress=None):
+    """
+    Read a user log from a database, JSON or CSV export into memory
+
+    The log is checked and prepared, ready to be copied over user.db.
+    Compact exports list only non-default values; everything else gets
+    its default.
+
+    Returns
+    -------
+    conn : in-memory sqlite3 connection, usable from any thread
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    mem = sqlite3.connect(":memory:", check_same_thread=False)
+    try:
+        if ext in compact_fmts:
+            if ext == ".json":
+                with open(filename) as f:
+                    log = json.load(f)["log"]
+                rows = [[imdb_id] + [fields.get(hdr) for hdr in log_hdrs]
+                        for imdb_id, fields in log.items()]
+            else:
+                with open(filename, newline="") as f:
+                    rows = [[rec["imdb_id"]] + [readCsvValue(hdr, rec.get(hdr))
+                                                for hdr in log_hdrs]
+                            for rec in csv.DictReader(f)]
+            marks = ", ".join("?" * (len(log_hdrs) + 1))
+            mem.execute(f"CREATE TABLE log ({log_cols})")
+            mem.executemany(f"INSERT INTO log VALUES ({marks})", rows)
+            mem.commit()
+            if progress is not None:
+                progress(len(rows), len(rows))
+        else:
+            uri = Path(os.path.abspath(filename)).as_uri() + "?mode=ro"
+            src = sqlite3.connect(uri, uri=True)
+            try:
+                backupPages(src, mem, progress)
+            finally:
+                src.close()
+        checkLog(mem)
+        prepareLog(mem)
+    except (KeyError, TypeError, AttributeError, json.JSONDecodeError) as err:
+        mem.close()
+        raise ValueError(f"not a user log export ({err!r})")
+    except Exception:
+        mem.close()
+        raise
+    return mem
+
+def resizePages(conn, page_size):
+    """
+    An in-memory copy of an in-memory database with pages of
+    `page_size` bytes, or the database itself if they already are
+
+    A backup into a WAL database cannot change its page size.
+    """
+    if conn.execute("PRAGMA page_size").fetchone()[0] == page_size:
+        return conn
+    mem = sqlite3.connect(":memory:", check_same_thread=False)
+    mem.execute(f"PRAGMA page_size = {int(page_size)}")
+    mem.executescript("\n".join(conn.iterdump()))
+    conn.close()
+    return mem
+
+def readCsvValue(hdr, value):
+    """
+    A log value as read back from a CSV export; blanks are NULL
+    """
+    if value is None or value == "":
+        return None
+    return int(value) if hdr in int_hdrs else value